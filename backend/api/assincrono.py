@@ -0,0 +1,162 @@
+"""
+Versões assíncronas das leituras mais usadas (dashboard e listas/detalhes de pedidos e
+produtos), em /api/async/. Sob um servidor ASGI (veja backend/asgi.py), enquanto uma
+requisição espera o banco o mesmo processo continua atendendo as outras.
+
+As respostas têm o mesmo formato das views síncronas: as consultas vêm dos mesmos
+viewsets, as linhas são montadas por api.leitura e valem a paginação por cursor,
+?search, ?fields/?expand, ETag e 304. Só o cache de respostas não é usado.
+
+O ORM assíncrono do Django ainda executa as consultas em uma thread única. Por isso as
+consultas independentes do dashboard rodam em em_paralelo(), cada uma em uma thread do
+pool com conexão própria; com o SQLite em WAL (api.banco) elas leem o banco ao mesmo tempo.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.request import Request
+
+from . import leitura
+from .pagination import KeysetPagination
+from .renderers import JSONRapidoRenderer
+from .utils import get_cotacao_dolar_com_encargos
+from .versoes import aget_versoes, montar_etag
+from .views import DashboardView, PedidoViewSet, ProdutoViewSet
+
+
+async def em_paralelo(consultas):
+    """
+    Executa ao mesmo tempo as funções síncronas de `consultas` ({nome: função}) e devolve
+    {nome: resultado}. Cada uma roda em uma thread do pool, com a própria conexão, que
+    segue as mesmas regras de CONN_MAX_AGE das conexões das requisições.
+    """
+    def isolar(consulta):
+        def executar():
+            close_old_connections()
+            try:
+                return consulta()
+            finally:
+                close_old_connections()
+        return sync_to_async(executar, thread_sensitive=False)()
+
+    resultados = await asyncio.gather(*(isolar(consulta) for consulta in consultas.values()))
+    return dict(zip(consultas, resultados))
+
+
+def resposta_json(dados, status=status.HTTP_200_OK):
+    return HttpResponse(JSONRapidoRenderer().render(dados), content_type='application/json', status=status)
+
+
+class LeituraAsyncView(View):
+    """
+    GET assíncrono com ETag/Last-Modified a partir de `recursos_versao`, como o
+    GetCondicionalMixin. As subclasses implementam get_dados() e devolvem os dados
+    da resposta; exceções do DRF viram a mesma resposta de erro das views síncronas.
+    """
+    recursos_versao = []
+    # View síncrona equivalente, que decide quando o GET condicional vale (usa_get_condicional)
+    view_sincrona = None
+
+    async def get_etag_extra(self, request):
+        return ''
+
+    async def get_dados(self, request, **kwargs):
+        raise NotImplementedError
+
+    def usa_get_condicional(self, request):
+        return self.view_sincrona is None or self.view_sincrona().usa_get_condicional(request)
+
+    async def get(self, request, **kwargs):
+        requisicao = Request(request)
+        try:
+            if not self.usa_get_condicional(requisicao):
+                # Resposta que muda sem escritas (?periodo=): sem ETag nem 304, como na view síncrona
+                return resposta_json(await self.get_dados(requisicao, **kwargs))
+            versoes, ultima_alteracao = await aget_versoes(self.recursos_versao)
+            etag = montar_etag(versoes, 'json', await self.get_etag_extra(requisicao))
+            segundos = int(ultima_alteracao.timestamp())
+            resposta = get_conditional_response(request, etag=etag, last_modified=segundos)
+            if resposta is None:
+                resposta = resposta_json(await self.get_dados(requisicao, **kwargs))
+        except APIException as erro:
+            # Mesmo formato do exception_handler do DRF
+            detalhe = erro.detail if isinstance(erro.detail, (list, dict)) else {'detail': erro.detail}
+            return resposta_json(detalhe, status=erro.status_code)
+
+        resposta['ETag'] = etag
+        resposta['Last-Modified'] = http_date(segundos)
+        resposta['Cache-Control'] = 'no-cache'
+        return resposta
+
+    def get_viewset(self, classe, request, action):
+        # O viewset síncrono monta os querysets (filtros, busca, ?top, ?periodo); nada é consultado aqui
+        return classe(request=request, action=action, format_kwarg=None, args=(), kwargs={})
+
+    async def get_linha(self, linhas, pk):
+        try:
+            return await linhas.aget(pk=pk)
+        except linhas.model.DoesNotExist:
+            raise NotFound()
+
+
+class DashboardAsyncView(LeituraAsyncView):
+    recursos_versao = DashboardView.recursos_versao
+    view_sincrona = DashboardView
+
+    async def get_etag_extra(self, request):
+        return str(await sync_to_async(get_cotacao_dolar_com_encargos)())
+
+    async def get_dados(self, request):
+        dashboard = DashboardView()
+        agrupar = request.query_params.get('agrupar')
+        if agrupar and agrupar not in dashboard.AGRUPAMENTOS:
+            raise ValidationError({"detail": f"Agrupamento inválido. Use um de: {', '.join(dashboard.AGRUPAMENTOS)}."})
+
+        resultados = await em_paralelo(dashboard.get_consultas(request.query_params))
+        cotacao = await sync_to_async(get_cotacao_dolar_com_encargos)()
+        return dashboard.montar_dashboard(cotacao, resultados)
+
+
+class PedidosAsyncView(LeituraAsyncView):
+    recursos_versao = PedidoViewSet.recursos_versao
+    view_sincrona = PedidoViewSet
+
+    async def get_dados(self, request, pk=None):
+        viewset = self.get_viewset(PedidoViewSet, request, 'list' if pk is None else 'retrieve')
+        linhas = viewset.get_linhas()
+        if pk is not None:
+            pagina = [await self.get_linha(linhas, pk)]
+        else:
+            paginacao = KeysetPagination()
+            pagina = await paginacao.apaginate_queryset(linhas, request)
+        # Itens e produtos da página: duas consultas, pelo mesmo caminho da view síncrona
+        pedidos = await sync_to_async(leitura.listar_pedidos)(pagina, viewset.get_selecao())
+        if pk is not None:
+            return pedidos[0]
+        return {'next': paginacao.get_next_link(), 'results': pedidos}
+
+
+class ProdutosAsyncView(LeituraAsyncView):
+    recursos_versao = ProdutoViewSet.recursos_versao
+    view_sincrona = ProdutoViewSet
+
+    async def get_dados(self, request, pk=None):
+        viewset = self.get_viewset(ProdutoViewSet, request, 'list' if pk is None else 'retrieve')
+        linhas = viewset.get_linhas()
+        # Fora do loop de eventos: o custo em reais pode consultar a cotação (calcular_custo_real)
+        listar_produtos = sync_to_async(leitura.listar_produtos)
+        if pk is not None:
+            return (await listar_produtos([await self.get_linha(linhas, pk)], viewset.get_selecao()))[0]
+        if request.query_params.get('top'):
+            # O ranking por categoria não é paginado (veja ProdutoViewSet.paginate_queryset)
+            return await listar_produtos([linha async for linha in linhas], viewset.get_selecao())
+        paginacao = KeysetPagination()
+        pagina = await paginacao.apaginate_queryset(linhas, request)
+        return {'next': paginacao.get_next_link(), 'results': await listar_produtos(pagina, viewset.get_selecao())}
@@ -0,0 +1,64 @@
+"""
+Configuração do SQLite para produção e repetição das transações de escrita bloqueadas.
+
+Cada conexão nova recebe os PRAGMAs de settings.SQLITE_PRAGMAS (WAL, synchronous,
+cache, mmap, busy_timeout) pelo sinal connection_created. Com WAL as leituras não
+esperam as escritas; as escritas continuam uma de cada vez, e quem encontra o banco
+ocupado espera até busy_timeout. Se mesmo assim o SQLite responder "database is
+locked", transacao_com_repeticao refaz a transação inteira depois de uma pausa.
+"""
+import functools
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+TENTATIVAS = 5
+ESPERA_INICIAL = 0.05
+
+
+def configurar_sqlite(sender, connection, **kwargs):
+    """Receiver de connection_created: aplica settings.SQLITE_PRAGMAS às conexões SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, valor in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {pragma} = {valor}')
+
+
+def banco_bloqueado(erro):
+    # "database is locked" (SQLITE_BUSY) ou "database table is locked" (SQLITE_LOCKED)
+    return 'locked' in str(erro)
+
+
+def transacao_com_repeticao(funcao=None, *, tentativas=TENTATIVAS, espera_inicial=ESPERA_INICIAL):
+    """
+    Executa a função em transaction.atomic() e, se o banco estiver bloqueado, desfaz e
+    tenta de novo, com espera exponencial e aleatória entre as tentativas. A função
+    precisa poder ser repetida: não pode alterar os argumentos recebidos.
+
+    Dentro de uma transação já aberta não há repetição (o bloqueio é de quem a abriu).
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def executar(*args, **kwargs):
+            if connection.in_atomic_block:
+                with transaction.atomic():
+                    return funcao(*args, **kwargs)
+            for tentativa in range(tentativas):
+                try:
+                    with transaction.atomic():
+                        return funcao(*args, **kwargs)
+                except OperationalError as erro:
+                    if not banco_bloqueado(erro) or tentativa == tentativas - 1:
+                        raise
+                    espera = espera_inicial * 2 ** tentativa * (1 + random.random())
+                    logger.info("Banco bloqueado em %s; nova tentativa em %.0f ms.", funcao.__qualname__, espera * 1000)
+                    time.sleep(espera)
+        return executar
+
+    return decorador(funcao) if funcao is not None else decorador
@@ -0,0 +1,52 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+# Palavras do termo buscado; aspas, parênteses e operadores do FTS5 são descartados
+PALAVRA = re.compile(r'\w+')
+
+
+def montar_consulta_fts(termo):
+    """
+    Converte o texto digitado em uma consulta FTS5 em que todas as palavras precisam
+    aparecer, cada uma como prefixo ("perf chan" encontra "Perfume Chanel").
+    """
+    return ' '.join(f'"{palavra}"*' for palavra in PALAVRA.findall(termo))
+
+
+class BuscaTextoFilter(SearchFilter):
+    """
+    Busca pelo parâmetro `search` usando os índices FTS5 criados na migração 0009,
+    com prefixo, sem diferenciar acentos e com os resultados ordenados por relevância.
+
+    A view informa `busca_tabela` (tabela FTS) e, opcionalmente, `busca_coluna`, a coluna
+    do model cujo valor é o rowid no índice (o id, por padrão; em pedidos, o cliente_id).
+    Fora do SQLite cai no SearchFilter do DRF, com os `search_fields` da view.
+    A ordenação por relevância só é aplicada quando o cliente não pede ?ordering=.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        termo = request.query_params.get(self.search_param, '')
+        tabela = getattr(view, 'busca_tabela', None)
+        if connection.vendor != 'sqlite' or tabela is None:
+            return super().filter_queryset(request, queryset, view)
+
+        consulta = montar_consulta_fts(termo)
+        if not consulta:
+            return queryset
+
+        coluna = getattr(view, 'busca_coluna', 'id')
+        referencia = f'"{queryset.model._meta.db_table}"."{queryset.model._meta.get_field(coluna).column}"'
+        # bm25 é menor quanto mais relevante o resultado, então a ordenação é crescente
+        relevancia = RawSQL(
+            f'SELECT bm25({tabela}) FROM {tabela} WHERE {tabela} MATCH %s AND rowid = {referencia}',
+            [consulta]
+        )
+        queryset = queryset.filter(**{
+            f'{coluna}__in': RawSQL(f'SELECT rowid FROM {tabela} WHERE {tabela} MATCH %s', [consulta])
+        }).annotate(relevancia=relevancia)
+        if request.query_params.get('ordering'):
+            return queryset
+        return queryset.order_by('relevancia', *queryset.query.order_by)
@@ -0,0 +1,215 @@
+import logging
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections
+from django.core.signals import setting_changed
+from django.dispatch import Signal, receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Enviado quando uma atualização traz uma cotação diferente da anterior (kwargs: valor, anterior)
+cotacao_alterada = Signal()
+
+CONFIGURACAO_PADRAO = {
+    'PROVEDOR': 'api.cambio.ProvedorFixo',
+    'OPCOES': {},
+    # Segundos em que a cotação é considerada atual; depois disso ela continua sendo
+    # servida enquanto uma nova é buscada em segundo plano
+    'TTL': 600,
+    'TIMEOUT': 3,
+    # Segundos até tentar de novo depois de uma falha do provedor
+    'ESPERA_APOS_FALHA': 60,
+    # Cotação usada quando o provedor falha e não há nenhuma obtida nem gravada
+    'RESERVA': '5.90',
+}
+
+
+class ProvedorCotacao:
+    """
+    Origem da cotação do dólar já com encargos. `registrar_historico` indica se os
+    valores obtidos devem ser gravados em CotacaoDolar.
+    """
+    nome = 'base'
+    registrar_historico = True
+
+    def __init__(self, timeout=None, **opcoes):
+        self.timeout = timeout
+
+    def obter(self):
+        raise NotImplementedError
+
+
+class ProvedorFixo(ProvedorCotacao):
+    """Cotação fixa definida na configuração (comportamento original do sistema)."""
+    nome = 'fixo'
+    registrar_historico = False
+
+    def __init__(self, valor='5.90', **opcoes):
+        super().__init__(**opcoes)
+        self.valor = Decimal(str(valor))
+
+    def obter(self):
+        return self.valor
+
+
+class ProvedorHTTP(ProvedorCotacao):
+    """
+    Busca a cotação em uma API JSON. `campo` é o caminho até o valor separado por pontos
+    (ex.: 'USDBRL.ask') e `fator_encargos` multiplica a cotação pelos encargos (IOF, spread).
+    """
+    nome = 'http'
+
+    def __init__(self, url, campo, fator_encargos='1', **opcoes):
+        super().__init__(**opcoes)
+        self.url = url
+        self.campo = campo
+        self.fator_encargos = Decimal(str(fator_encargos))
+
+    def obter(self):
+        resposta = requests.get(self.url, timeout=self.timeout)
+        resposta.raise_for_status()
+        valor = resposta.json()
+        for chave in self.campo.split('.'):
+            valor = valor[chave]
+        return (Decimal(str(valor)) * self.fator_encargos).quantize(Decimal('0.0001'))
+
+
+class ProvedorArquivo(ProvedorCotacao):
+    """Lê a cotação de um arquivo local de texto; útil em desenvolvimento e testes."""
+    nome = 'arquivo'
+
+    def __init__(self, caminho, **opcoes):
+        super().__init__(**opcoes)
+        self.caminho = caminho
+
+    def obter(self):
+        with open(self.caminho, encoding='utf-8') as arquivo:
+            return Decimal(arquivo.read().strip().replace(',', '.'))
+
+
+class CacheCotacao:
+    """
+    Cache da cotação compartilhado pelo processo inteiro.
+
+    Dentro do TTL a cotação vem da memória. Vencido o TTL, o valor antigo continua sendo
+    devolvido enquanto uma thread busca o novo (stale-while-revalidate), então nenhuma
+    requisição espera pela rede, a não ser a primeira de um processo sem histórico gravado.
+    Se o provedor falhar ou estourar o timeout, a última cotação conhecida é mantida e a
+    próxima tentativa só acontece depois de `espera` segundos.
+    """
+
+    def __init__(self, provedor, ttl, reserva=CONFIGURACAO_PADRAO['RESERVA'], espera=CONFIGURACAO_PADRAO['ESPERA_APOS_FALHA']):
+        self.provedor = provedor
+        self.ttl = ttl
+        self.reserva = Decimal(str(reserva))
+        self.espera = espera
+        self.valor = None
+        self.obtida_em = None
+        self.falhou_em = None
+        self._lock = threading.RLock()
+        self._atualizando = False
+
+    def get(self):
+        if self.valor is None:
+            with self._lock:
+                if self.valor is None:
+                    self._carregar_inicial()
+        elif self._vencida():
+            self._agendar_atualizacao()
+        return self.valor
+
+    def _vencida(self):
+        agora = time.monotonic()
+        if self.falhou_em is not None and agora - self.falhou_em < self.espera:
+            return False
+        return agora - self.obtida_em > self.ttl
+
+    def _carregar_inicial(self):
+        # Um processo novo começa pela última cotação gravada e atualiza em segundo plano
+        ultima = self._ultima_registrada()
+        if ultima is not None:
+            self.valor, self.obtida_em = ultima, time.monotonic()
+            self._agendar_atualizacao()
+            return
+        if not self.atualizar():
+            # Sem cotação alguma: recorre à reserva configurada em COTACAO_DOLAR
+            self.valor, self.obtida_em = self.reserva, time.monotonic()
+
+    def _ultima_registrada(self):
+        if not self.provedor.registrar_historico:
+            return None
+        from .models import CotacaoDolar
+        return CotacaoDolar.objects.order_by('-obtida_em').values_list('valor', flat=True).first()
+
+    def _agendar_atualizacao(self):
+        with self._lock:
+            if self._atualizando:
+                return
+            self._atualizando = True
+        threading.Thread(target=self._atualizar_em_segundo_plano, daemon=True).start()
+
+    def _atualizar_em_segundo_plano(self):
+        try:
+            self.atualizar()
+        finally:
+            self._atualizando = False
+            close_old_connections()
+
+    def atualizar(self):
+        """
+        Busca a cotação no provedor. Devolve True se conseguiu; em caso de erro mantém
+        a última cotação conhecida, registra o horário da falha e devolve False.
+        """
+        try:
+            valor = Decimal(self.provedor.obter())
+        except (requests.RequestException, OSError, KeyError, TypeError, ValueError, InvalidOperation):
+            logger.warning("Falha ao obter a cotação do dólar (%s); mantendo a última conhecida.",
+                           self.provedor.nome, exc_info=True)
+            self.falhou_em = time.monotonic()
+            return False
+
+        anterior, self.valor, self.obtida_em = self.valor, valor, time.monotonic()
+        self.falhou_em = None
+        if valor != anterior:
+            if self.provedor.registrar_historico:
+                from .models import CotacaoDolar
+                CotacaoDolar.objects.create(valor=valor, fonte=self.provedor.nome)
+            if anterior is not None:
+                cotacao_alterada.send(sender=self.__class__, valor=valor, anterior=anterior)
+        return True
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                configuracao = {**CONFIGURACAO_PADRAO, **getattr(settings, 'COTACAO_DOLAR', {})}
+                provedor = import_string(configuracao['PROVEDOR'])(
+                    timeout=configuracao['TIMEOUT'], **configuracao['OPCOES']
+                )
+                _cache = CacheCotacao(
+                    provedor, configuracao['TTL'], configuracao['RESERVA'], configuracao['ESPERA_APOS_FALHA']
+                )
+    return _cache
+
+
+def redefinir_cache():
+    # Descarta o cache (e o provedor) para que a configuração seja relida no próximo uso
+    global _cache
+    _cache = None
+
+
+@receiver(setting_changed)
+def _redefinir_ao_mudar_configuracao(setting, **kwargs):
+    if setting == 'COTACAO_DOLAR':
+        redefinir_cache()
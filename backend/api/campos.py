@@ -0,0 +1,128 @@
+"""
+Seleção de campos (`?fields=`) e expansão de objetos aninhados (`?expand=`) nas leituras.
+
+Sem nenhum dos dois parâmetros as respostas mantêm o formato completo de sempre. Com
+qualquer um deles a resposta passa a ser enxuta:
+
+- `fields=id,cliente,itens.quantidade` limita os campos de cada nível; caminhos com ponto
+  escolhem campos dos objetos aninhados. Um nível sem nenhum campo pedido vem completo.
+- objetos aninhados (itens do pedido, produto do item, pedidos do cliente) vêm apenas
+  como ids, a não ser que sejam expandidos com `expand=itens,itens.produto` ou que
+  `fields` peça algum campo de dentro deles.
+
+Campos desconhecidos são ignorados.
+"""
+from rest_framework import serializers
+
+
+def _lista(valor):
+    return {parte.strip() for parte in valor.split(',') if parte.strip()} if valor else set()
+
+
+class Selecao:
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields or set()
+        self.expand = expand or set()
+
+    @classmethod
+    def da_requisicao(cls, request):
+        # None quando a requisição não pede seleção: formato completo
+        params = request.query_params
+        if request.method != 'GET' or not (params.get('fields') or params.get('expand')):
+            return None
+        return cls(_lista(params.get('fields')), _lista(params.get('expand')))
+
+    def campos(self, caminho, disponiveis):
+        """Nomes de `disponiveis` pedidos no nível `caminho` ('' é a raiz), na ordem original."""
+        prefixo = caminho + '.' if caminho else ''
+        pedidos = {campo[len(prefixo):].split('.')[0] for campo in self.fields if campo.startswith(prefixo)}
+        if not pedidos:
+            return list(disponiveis)
+        return [nome for nome in disponiveis if nome in pedidos]
+
+    def expandir(self, caminho):
+        prefixo = caminho + '.'
+        return caminho in self.expand or any(
+            campo.startswith(prefixo) for campo in self.expand | self.fields
+        )
+
+    def pede(self, caminho, campo):
+        # Se `campo` aparece no nível `caminho`; usado para enxugar as consultas
+        return bool(self.campos(caminho, [campo]))
+
+    def filtrar(self, caminho, linha):
+        return {nome: linha[nome] for nome in self.campos(caminho, linha)}
+
+
+def get_selecao(contexto):
+    return contexto.get('selecao')
+
+
+def carregamento_pedidos(selecao, caminho=''):
+    """
+    Partes aninhadas dos pedidos em `caminho` que a resposta usa, como argumentos de
+    PedidoQuerySet.com_itens(): o que não aparece na resposta não é consultado.
+    """
+    if selecao is None:
+        return {'itens': True, 'produtos': True, 'vendas': True}
+    itens = f'{caminho}.itens' if caminho else 'itens'
+    produto = f'{itens}.produto'
+    com_itens = selecao.pede(caminho, 'itens')
+    com_produtos = (
+        com_itens and selecao.expandir(itens) and selecao.pede(itens, 'produto') and selecao.expandir(produto)
+    )
+    return {
+        'itens': com_itens,
+        'produtos': com_produtos,
+        'vendas': com_produtos and selecao.pede(produto, 'quantidade_vendas'),
+    }
+
+
+class CamposSelecionaveisMixin:
+    """
+    Aplica a Selecao do contexto (`context['selecao']`) aos campos do serializer.
+    Serializers aninhados não expandidos viram PrimaryKeyRelatedField.
+    """
+
+    def get_fields(self):
+        campos = super().get_fields()
+        selecao = get_selecao(self.context)
+        if selecao is None:
+            return campos
+
+        caminho = self.get_caminho()
+        selecionados = {}
+        for nome in selecao.campos(caminho, campos):
+            campo = campos[nome]
+            lista = isinstance(campo, serializers.ListSerializer)
+            filho = campo.child if lista else campo
+            subcaminho = f'{caminho}.{nome}' if caminho else nome
+            if isinstance(filho, serializers.BaseSerializer) and not selecao.expandir(subcaminho):
+                opcoes = {'source': campo.source} if campo.source else {}
+                campo = serializers.PrimaryKeyRelatedField(read_only=True, many=lista, **opcoes)
+            selecionados[nome] = campo
+        return selecionados
+
+    def get_caminho(self):
+        # Caminho do serializer a partir da raiz, ex.: 'itens.produto' (listas não contam)
+        partes = []
+        no = self
+        while no.parent is not None:
+            if no.field_name:
+                partes.append(no.field_name)
+            no = no.parent
+        return '.'.join(reversed(partes))
+
+
+class CamposSelecionaveisViewMixin:
+    """Passa a Selecao da requisição para os serializers da view."""
+
+    def get_selecao(self):
+        if not hasattr(self, '_selecao'):
+            self._selecao = Selecao.da_requisicao(self.request)
+        return self._selecao
+
+    def get_serializer_context(self):
+        contexto = super().get_serializer_context()
+        contexto['selecao'] = self.get_selecao()
+        return contexto
@@ -0,0 +1,126 @@
+"""
+Histórico do estoque: um razão de movimentos mais snapshots periódicos.
+
+Toda alteração de Produto.quantidade_estoque grava um MovimentoEstoque na mesma
+transação:
+- entrada: reposição e estoque inicial;
+- venda: itens de pedido, com quantidade negativa;
+- estorno: itens de um pedido apagado, que voltam ao estoque;
+- ajuste: correções, como as da conciliação.
+
+`python manage.py snapshot_estoque` grava periodicamente um SnapshotEstoque por
+produto. O estoque em uma data é o último snapshot até ela mais os movimentos
+entre os dois, sem percorrer o histórico inteiro.
+"""
+import datetime
+
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .banco import transacao_com_repeticao
+
+# Limite inferior da cauda do razão para produtos ainda sem snapshot
+INICIO = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+TAMANHO_LOTE = 2000
+
+
+def registrar_movimentos(movimentos):
+    """Grava instâncias de MovimentoEstoque já aplicadas ao estoque pelo chamador."""
+    from .models import MovimentoEstoque
+
+    MovimentoEstoque.objects.bulk_create([m for m in movimentos if m.quantidade], batch_size=TAMANHO_LOTE)
+
+
+def registrar_estoque_inicial(produtos):
+    # Produtos recém-criados, inclusive por bulk_create (importação, popular_dados)
+    from .models import MovimentoEstoque
+
+    registrar_movimentos(
+        MovimentoEstoque(produto_id=produto.pk, tipo='entrada', quantidade=produto.quantidade_estoque, observacao='Estoque inicial')
+        for produto in produtos
+    )
+
+
+def movimentar(quantidades, tipo, pedido=None, observacao=''):
+    """
+    Soma as variações de `quantidades` ({produto_id: variação}) ao estoque em um único
+    UPDATE e grava os movimentos. Precisa rodar dentro de uma transação.
+    """
+    from .models import MovimentoEstoque, Produto
+
+    quantidades = {produto_id: quantidade for produto_id, quantidade in quantidades.items() if quantidade}
+    if not quantidades:
+        return
+    Produto.objects.filter(id__in=quantidades).update(quantidade_estoque=Case(
+        *[When(id=produto_id, then=F('quantidade_estoque') + quantidade) for produto_id, quantidade in quantidades.items()],
+        default=F('quantidade_estoque')
+    ))
+    registrar_movimentos(
+        MovimentoEstoque(produto_id=produto_id, tipo=tipo, quantidade=quantidade, pedido=pedido, observacao=observacao)
+        for produto_id, quantidade in quantidades.items()
+    )
+
+
+def estornar_pedido(pedido):
+    """Devolve ao estoque os itens de um pedido que está sendo apagado."""
+    quantidades = {}
+    for produto_id, quantidade in pedido.itens.values_list('produto_id', 'quantidade'):
+        quantidades[produto_id] = quantidades.get(produto_id, 0) + quantidade
+    movimentar(quantidades, 'estorno', pedido=pedido, observacao=f'Pedido {pedido.pk} apagado')
+
+
+def estoque_em(data, produtos=None):
+    """
+    Estoque de cada produto no instante `data`, como {produto_id: quantidade}: o último
+    snapshot até a data mais a soma dos movimentos posteriores a ele, em uma consulta.
+    """
+    from .models import MovimentoEstoque, Produto, SnapshotEstoque
+
+    snapshot = SnapshotEstoque.objects.filter(produto=OuterRef('pk'), data__lte=data).order_by('-data')
+    cauda = MovimentoEstoque.objects.filter(
+        produto=OuterRef('pk'), criado_em__gt=OuterRef('data_snapshot'), criado_em__lte=data
+    ).order_by().values('produto').annotate(total=Sum('quantidade')).values('total')
+
+    queryset = Produto.objects.all() if produtos is None else Produto.objects.filter(id__in=produtos)
+    queryset = queryset.annotate(
+        data_snapshot=Coalesce(Subquery(snapshot.values('data')[:1]), Value(INICIO)),
+    ).annotate(
+        estoque=Coalesce(Subquery(snapshot.values('quantidade')[:1]), 0)
+        + Coalesce(Subquery(cauda, output_field=IntegerField()), 0),
+    )
+    return dict(queryset.values_list('id', 'estoque'))
+
+
+@transacao_com_repeticao
+def gravar_snapshots():
+    """
+    Grava um SnapshotEstoque por produto com o estoque atual e devolve as divergências
+    entre o razão e quantidade_estoque ({produto_id: (no razão, no produto)}), causadas
+    por alterações feitas por fora (um UPDATE manual, por exemplo). Cada divergência é
+    registrada como ajuste antes do snapshot, então o razão volta a explicar o estoque.
+    """
+    from .models import MovimentoEstoque, Produto, SnapshotEstoque
+
+    # A transação bloqueia as escritas (transaction_mode IMMEDIATE): nenhum movimento
+    # fica entre a leitura do estoque e o instante do snapshot
+    agora = timezone.now()
+    no_razao = estoque_em(agora)
+    atual = dict(Produto.objects.values_list('id', 'quantidade_estoque'))
+    divergencias = {
+        produto_id: (no_razao.get(produto_id, 0), quantidade)
+        for produto_id, quantidade in atual.items()
+        if no_razao.get(produto_id, 0) != quantidade
+    }
+    registrar_movimentos(
+        MovimentoEstoque(
+            produto_id=produto_id, tipo='ajuste', quantidade=quantidade - razao,
+            observacao='Conciliação', criado_em=agora
+        )
+        for produto_id, (razao, quantidade) in divergencias.items()
+    )
+    SnapshotEstoque.objects.bulk_create(
+        [SnapshotEstoque(produto_id=produto_id, data=agora, quantidade=quantidade) for produto_id, quantidade in atual.items()],
+        batch_size=TAMANHO_LOTE
+    )
+    return divergencias
@@ -0,0 +1,109 @@
+import csv
+import json
+from decimal import Decimal
+
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Pedido, PedidoProduto, SUBTOTAL_ITEM, LUCRO_ITEM
+from .utils import get_intervalo_datas
+
+# Linhas lidas do banco por vez; a memória usada não depende do tamanho do histórico
+TAMANHO_LOTE = 2000
+
+# Colunas exportadas (uma linha por item de pedido) e o campo de onde cada uma vem
+COLUNAS = [
+    ('pedido_id', 'pedido_id'),
+    ('data_pedido', 'pedido__data_pedido'),
+    ('cliente_id', 'pedido__cliente_id'),
+    ('cliente', 'pedido__cliente__nome_completo'),
+    ('metodo_pagamento', 'pedido__metodo_pagamento'),
+    ('quantidade_parcelas', 'pedido__quantidade_parcelas'),
+    ('status_pagamento', 'pedido__status_pagamento'),
+    ('status_entrega', 'pedido__status_entrega'),
+    ('valor_servico', 'pedido__valor_servico'),
+    ('valor_total_venda', 'pedido__valor_total_venda'),
+    ('lucro_final', 'pedido__lucro_final'),
+    ('item_id', 'id'),
+    ('produto_id', 'produto_id'),
+    ('produto', 'produto__nome'),
+    ('marca', 'produto__marca'),
+    ('categoria', 'produto__categoria__nome'),
+    ('quantidade', 'quantidade'),
+    ('custo_real_item_unidade', 'custo_real_item_unidade'),
+    ('margem_venda_unitaria', 'margem_venda_unitaria'),
+    ('subtotal_item', 'subtotal_item_exportado'),
+    ('lucro_item', 'lucro_item_exportado'),
+]
+
+FORMATOS = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+
+def filtrar_itens(params):
+    """
+    Monta o queryset dos itens a exportar a partir dos parâmetros `inicio`, `fim`,
+    `status_pagamento` e `status_entrega`. Parâmetros inválidos geram ValidationError
+    antes de qualquer linha ser lida.
+    """
+    itens = PedidoProduto.objects.all()
+    inicio, fim = get_intervalo_datas(params)
+    if inicio:
+        itens = itens.filter(pedido__data_pedido__gte=inicio)
+    if fim:
+        itens = itens.filter(pedido__data_pedido__lt=fim)
+
+    for nome, choices in (('status_pagamento', Pedido.STATUS_PAGAMENTO_CHOICES),
+                          ('status_entrega', Pedido.STATUS_ENTREGA_CHOICES)):
+        valor = params.get(nome)
+        if not valor:
+            continue
+        validos = [c[0] for c in choices]
+        valores = valor.split(',')
+        invalidos = [v for v in valores if v not in validos]
+        if invalidos:
+            raise ValidationError({nome: f"Valor inválido: '{invalidos[0]}'. Use um de: {', '.join(validos)}."})
+        itens = itens.filter(**{f'pedido__{nome}__in': valores})
+
+    return itens.annotate(
+        subtotal_item_exportado=SUBTOTAL_ITEM, lucro_item_exportado=LUCRO_ITEM
+    ).order_by('pedido_id', 'id')
+
+
+def iterar_linhas(itens):
+    # values_list + iterator: nenhuma instância de modelo é criada e o cursor é lido em lotes
+    campos = [campo for _, campo in COLUNAS]
+    return itens.values_list(*campos).iterator(chunk_size=TAMANHO_LOTE)
+
+
+def formatar_valor(valor):
+    if isinstance(valor, Decimal):
+        # Todos os valores exportados são em centavos; as expressões calculadas no
+        # SQLite voltam com casas decimais a mais
+        return str(valor.quantize(Decimal('0.01')))
+    if hasattr(valor, 'isoformat'):
+        return timezone.localtime(valor).isoformat()
+    return valor
+
+
+class _Eco:
+    # "Arquivo" cujo write devolve o texto, para o csv.writer gerar linha a linha
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(itens):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([nome for nome, _ in COLUNAS])
+    for linha in iterar_linhas(itens):
+        yield escritor.writerow([formatar_valor(valor) for valor in linha])
+
+
+def gerar_ndjson(itens):
+    nomes = [nome for nome, _ in COLUNAS]
+    for linha in iterar_linhas(itens):
+        registro = {nome: formatar_valor(valor) for nome, valor in zip(nomes, linha)}
+        yield json.dumps(registro, ensure_ascii=False) + '\n'
+
+
+def gerar_exportacao(itens, formato):
+    return gerar_csv(itens) if formato == 'csv' else gerar_ndjson(itens)
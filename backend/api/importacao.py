@@ -0,0 +1,273 @@
+import codecs
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from . import estoque
+from .models import Categoria, Produto, Cliente
+from .precificacao import calcular_custo_real
+from .utils import get_cotacao_dolar_com_encargos
+from .versoes import RECURSOS_POR_MODEL, registrar_escrita
+
+# Quantidade de linhas validadas e gravadas por vez
+TAMANHO_LOTE = 1000
+# Limite de erros detalhados na resposta (o total é sempre informado)
+MAXIMO_ERROS_DETALHADOS = 1000
+
+
+def ler_linhas(arquivo, formato):
+    """
+    Lê o arquivo enviado linha a linha, sem carregá-lo inteiro na memória.
+    Gera tuplas (número da linha, dados, erro), onde só um de dados/erro é preenchido.
+    """
+    texto = codecs.iterdecode(arquivo, 'utf-8-sig')
+    if formato == 'csv':
+        # A linha 1 é o cabeçalho
+        for numero, linha in enumerate(csv.DictReader(texto), start=2):
+            yield numero, {chave: valor for chave, valor in linha.items() if chave and valor != ''}, None
+        return
+
+    for numero, linha in enumerate(texto, start=1):
+        if not linha.strip():
+            continue
+        try:
+            dados = json.loads(linha)
+        except ValueError:
+            yield numero, None, {'linha': ["JSON inválido."]}
+            continue
+        if not isinstance(dados, dict):
+            yield numero, None, {'linha': ["Cada linha deve ser um objeto JSON."]}
+            continue
+        yield numero, dados, None
+
+
+class Coluna:
+    """
+    Validação enxuta de uma coluna importada. Os serializers do DRF custam dezenas de
+    microssegundos por campo, o que domina o tempo de uma importação de 100 mil linhas.
+    """
+    def __init__(self, nome, converter, obrigatoria=True, padrao=None):
+        self.nome = nome
+        self.converter = converter
+        self.obrigatoria = obrigatoria
+        self.padrao = padrao
+
+    def validar(self, dados, validados, erros):
+        valor = dados.get(self.nome)
+        if isinstance(valor, str):
+            valor = valor.strip()
+        if valor is None or valor == '':
+            if self.obrigatoria:
+                erros[self.nome] = ["Este campo é obrigatório."]
+            elif self.padrao is not None:
+                validados[self.nome] = self.padrao
+            return
+        try:
+            validados[self.nome] = self.converter(valor)
+        except (TypeError, ValueError, ArithmeticError) as erro:
+            erros[self.nome] = [str(erro) or "Valor inválido."]
+
+
+def texto(max_length):
+    def converter(valor):
+        valor = str(valor)
+        if len(valor) > max_length:
+            raise ValueError(f"Use no máximo {max_length} caracteres.")
+        return valor
+    return converter
+
+
+def inteiro(min_value=None):
+    def converter(valor):
+        if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+            raise ValueError("Informe um número inteiro.")
+        try:
+            valor = int(valor)
+        except ValueError:
+            raise ValueError("Informe um número inteiro.")
+        if min_value is not None and valor < min_value:
+            raise ValueError(f"O valor mínimo é {min_value}.")
+        return valor
+    return converter
+
+
+def decimal(max_digits, decimal_places, min_value=None):
+    limite = Decimal(10) ** (max_digits - decimal_places)
+    def converter(valor):
+        if isinstance(valor, bool):
+            raise ValueError("Informe um número válido.")
+        try:
+            valor = Decimal(str(valor))
+        except InvalidOperation:
+            raise ValueError("Informe um número válido.")
+        if not valor.is_finite() or abs(valor) >= limite:
+            raise ValueError("Informe um número válido.")
+        if valor.as_tuple().exponent < -decimal_places:
+            raise ValueError(f"Use no máximo {decimal_places} casas decimais.")
+        if min_value is not None and valor < min_value:
+            raise ValueError(f"O valor mínimo é {min_value}.")
+        return valor
+    return converter
+
+
+COLUNAS_PRODUTO = [
+    Coluna('id', inteiro(min_value=1), obrigatoria=False),
+    Coluna('nome', texto(200)),
+    Coluna('marca', texto(100)),
+    Coluna('preco_dolar', decimal(10, 2, min_value=0)),
+    Coluna('categoria', texto(100)),
+    # Usado apenas na criação; o estoque de produtos existentes muda por adicionar_estoque
+    Coluna('quantidade_estoque', inteiro(min_value=0), obrigatoria=False, padrao=0),
+]
+
+COLUNAS_CLIENTE = [
+    Coluna('id', inteiro(min_value=1), obrigatoria=False),
+    Coluna('nome_completo', texto(255)),
+    Coluna('telefone', texto(20)),
+    Coluna('endereco', texto(255)),
+]
+
+
+class Importador:
+    """
+    Importa linhas em lotes: valida cada lote de uma vez, cria as linhas novas com
+    bulk_create e atualiza as que trazem um `id` existente com bulk_update.
+    Linhas inválidas não interrompem a importação e aparecem no relatório de erros.
+    """
+    model = None
+    colunas = []
+    campos_atualizaveis = []
+
+    def __init__(self):
+        self.criados = 0
+        self.atualizados = 0
+        self.total_erros = 0
+        self.erros = []
+
+    def importar(self, arquivo, formato):
+        lote = []
+        for numero, dados, erro in ler_linhas(arquivo, formato):
+            if erro:
+                self.registrar_erro(numero, erro)
+                continue
+            lote.append((numero, dados))
+            if len(lote) >= TAMANHO_LOTE:
+                self.processar_lote(lote)
+                lote = []
+        if lote:
+            self.processar_lote(lote)
+        return self.get_relatorio()
+
+    def processar_lote(self, lote):
+        linhas = []
+        for numero, dados in lote:
+            validados, erros = {}, {}
+            for coluna in self.colunas:
+                coluna.validar(dados, validados, erros)
+            if erros:
+                self.registrar_erro(numero, erros)
+            else:
+                linhas.append((numero, validados))
+
+        ids = [dados['id'] for _, dados in linhas if 'id' in dados]
+        encontrados = self.model.objects.in_bulk(ids) if ids else {}
+        novos, existentes = [], []
+        for numero, dados in linhas:
+            instancia = self.montar_instancia(numero, dados, encontrados)
+            if instancia is None:
+                continue
+            (existentes if instancia.pk else novos).append(instancia)
+
+        with transaction.atomic():
+            self.model.objects.bulk_create(novos, batch_size=TAMANHO_LOTE)
+            self.registrar_criados(novos)
+            if existentes:
+                self.model.objects.bulk_update(existentes, self.campos_atualizaveis, batch_size=TAMANHO_LOTE)
+            # bulk_create/bulk_update não enviam post_save
+            registrar_escrita(*RECURSOS_POR_MODEL[self.model.__name__])
+        self.criados += len(novos)
+        self.atualizados += len(existentes)
+
+    def montar_instancia(self, numero, dados, encontrados):
+        id_existente = dados.pop('id', None)
+        if id_existente is None:
+            return self.model(**dados)
+        instancia = encontrados.get(id_existente)
+        if instancia is None:
+            self.registrar_erro(numero, {'id': [f"Registro com ID {id_existente} não encontrado."]})
+            return None
+        for campo in self.campos_atualizaveis:
+            setattr(instancia, campo, dados[campo])
+        return instancia
+
+    def registrar_criados(self, novos):
+        """Chamado na transação do lote, depois do bulk_create (já com os ids)."""
+
+    def registrar_erro(self, numero, erros):
+        self.total_erros += 1
+        if len(self.erros) < MAXIMO_ERROS_DETALHADOS:
+            self.erros.append({'linha': numero, 'erros': erros})
+
+    def get_relatorio(self):
+        return {
+            'criados': self.criados,
+            'atualizados': self.atualizados,
+            'total_erros': self.total_erros,
+            'erros': self.erros,
+        }
+
+
+class ImportadorProdutos(Importador):
+    model = Produto
+    colunas = COLUNAS_PRODUTO
+    campos_atualizaveis = ['nome', 'marca', 'preco_dolar', 'categoria_id', 'preco_real_custo']
+
+    def __init__(self, criar_categorias=False):
+        super().__init__()
+        self.criar_categorias = criar_categorias
+        # Todas as categorias ficam em memória: a resolução por nome não consulta o banco
+        self.categorias = {nome.casefold(): id for id, nome in Categoria.objects.values_list('id', 'nome')}
+        # bulk_create/bulk_update não passam por Produto.save, então o custo em reais é calculado aqui
+        self.cotacao = get_cotacao_dolar_com_encargos()
+
+    def processar_lote(self, lote):
+        if self.criar_categorias:
+            self.criar_categorias_novas(lote)
+        super().processar_lote(lote)
+
+    def registrar_criados(self, novos):
+        # O estoque da importação abre o histórico de cada produto novo
+        estoque.registrar_estoque_inicial(novos)
+
+    def criar_categorias_novas(self, lote):
+        novas = {}
+        for _, dados in lote:
+            nome = str(dados.get('categoria', '')).strip()
+            if nome and nome.casefold() not in self.categorias:
+                novas.setdefault(nome.casefold(), nome)
+        if novas:
+            Categoria.objects.bulk_create([Categoria(nome=nome) for nome in novas.values()], ignore_conflicts=True)
+            self.categorias.update({
+                nome.casefold(): id
+                for id, nome in Categoria.objects.filter(nome__in=novas.values()).values_list('id', 'nome')
+            })
+
+    def montar_instancia(self, numero, dados, encontrados):
+        nome_categoria = dados.pop('categoria')
+        categoria_id = self.categorias.get(nome_categoria.casefold())
+        if categoria_id is None:
+            self.registrar_erro(numero, {'categoria': [f"Categoria '{nome_categoria}' não existe."]})
+            return None
+        dados['categoria_id'] = categoria_id
+        dados['preco_real_custo'] = calcular_custo_real(dados['preco_dolar'], self.cotacao)
+        if 'id' in dados:
+            dados.pop('quantidade_estoque', None)
+        return super().montar_instancia(numero, dados, encontrados)
+
+
+class ImportadorClientes(Importador):
+    model = Cliente
+    colunas = COLUNAS_CLIENTE
+    campos_atualizaveis = ['nome_completo', 'telefone', 'endereco']
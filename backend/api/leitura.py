@@ -0,0 +1,149 @@
+"""
+Caminho de leitura rápido das listagens de pedidos e produtos.
+
+Monta as linhas como dicionários a partir de consultas values(), sem instanciar models
+nem passar pelos campos do DRF, e devolve exatamente o mesmo formato que
+PedidoSerializer e ProdutoSerializer (decimais como texto com duas casas, datas em
+ISO 8601 com 'Z' em UTC, campos ausentes omitidos). Os testes comparam as duas saídas.
+"""
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .campos import carregamento_pedidos
+from .metricas import medir_serializacao
+from .models import Produto, PedidoProduto, valores_item
+from .precificacao import calcular_custo_real
+
+CENTAVOS = Decimal('0.01')
+
+CAMPOS_PEDIDO = [
+    'id', 'cliente__nome_completo', 'data_pedido', 'metodo_pagamento', 'quantidade_parcelas',
+    'dia_vencimento_parcela', 'status_pagamento', 'status_entrega', 'em_aberto',
+    'subtotal_itens', 'valor_servico', 'valor_total_venda', 'lucro_final',
+]
+CAMPOS_PRODUTO = [
+    'id', 'nome', 'categoria_id', 'categoria__nome', 'marca', 'preco_dolar',
+    'quantidade_vendas', 'quantidade_estoque', 'preco_real_custo',
+]
+
+
+def decimal(valor):
+    # Equivale a serializers.DecimalField(decimal_places=2) com COERCE_DECIMAL_TO_STRING
+    return None if valor is None else f'{valor.quantize(CENTAVOS):f}'
+
+
+def data_hora(valor):
+    # Equivale a serializers.DateTimeField: fuso atual e 'Z' no lugar de +00:00
+    if valor is None:
+        return None
+    texto = timezone.localtime(valor).isoformat()
+    return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+
+
+def montar_produto(linha):
+    produto = {'id': linha['id'], 'nome': linha['nome']}
+    # Como no serializer, `categoria` é omitida quando o produto não tem categoria.
+    # Colunas fora de values() (puladas por ?fields=, api.campos) também ficam de fora
+    if linha['categoria_id'] is not None and 'categoria__nome' in linha:
+        produto['categoria'] = linha['categoria__nome']
+    produto['marca'] = linha['marca']
+    produto['preco_dolar'] = decimal(linha['preco_dolar'])
+    if 'quantidade_vendas' in linha:
+        produto['quantidade_vendas'] = linha['quantidade_vendas']
+    if 'posicao_categoria' in linha:
+        produto['posicao_categoria'] = linha['posicao_categoria']
+    produto['quantidade_estoque'] = linha['quantidade_estoque']
+    custo = linha['preco_real_custo']
+    # Decimal (e não texto), como o SerializerMethodField; o renderer o converte em número
+    produto['preco_real_custo_atual'] = custo if custo is not None else calcular_custo_real(linha['preco_dolar'])
+    return produto
+
+
+@medir_serializacao()
+def listar_produtos(linhas, selecao=None):
+    """Produtos de uma página de `queryset.values(*CAMPOS_PRODUTO)`, com os campos de `selecao`."""
+    produtos = [montar_produto(linha) for linha in linhas]
+    if selecao is None:
+        return produtos
+    return [selecao.filtrar('', produto) for produto in produtos]
+
+
+@medir_serializacao()
+def listar_pedidos(linhas, selecao=None):
+    """
+    Pedidos de uma página de `queryset.values(*CAMPOS_PEDIDO)`, com os itens e produtos
+    buscados em duas consultas para a página inteira. Com `selecao` (api.campos), itens e
+    produtos que não aparecem na resposta não são consultados.
+    """
+    carregar = carregamento_pedidos(selecao)
+    ids = [linha['id'] for linha in linhas]
+    itens_por_pedido = {pedido_id: [] for pedido_id in ids}
+
+    if not carregar['itens']:
+        itens = []
+    elif not (selecao is None or selecao.expandir('itens')):
+        # Itens não expandidos: apenas os ids, como o PrimaryKeyRelatedField
+        for pedido_id, item_id in PedidoProduto.objects.filter(pedido_id__in=ids).order_by('id').values_list('pedido_id', 'id'):
+            itens_por_pedido[pedido_id].append(item_id)
+        itens = []
+    else:
+        itens = PedidoProduto.objects.filter(pedido_id__in=ids).order_by('id').values(
+            'id', 'pedido_id', 'produto_id', 'quantidade', 'margem_venda_unitaria',
+            'custo_real_item_unidade', 'produto__preco_dolar'
+        )
+
+    itens = list(itens)
+    produtos = {}
+    if itens and carregar['produtos']:
+        consulta = Produto.objects.filter(id__in={item['produto_id'] for item in itens})
+        campos = CAMPOS_PRODUTO
+        if carregar['vendas']:
+            consulta = consulta.com_vendas()
+        else:
+            campos = [campo for campo in CAMPOS_PRODUTO if campo != 'quantidade_vendas']
+        produtos = {linha['id']: montar_produto(linha) for linha in consulta.values(*campos)}
+        if selecao is not None:
+            produtos = {id: selecao.filtrar('itens.produto', produto) for id, produto in produtos.items()}
+
+    for item in itens:
+        margem = item['margem_venda_unitaria']
+        custo = item['custo_real_item_unidade']
+        valores = valores_item(item['quantidade'], margem, custo, item['produto__preco_dolar'])
+        item_montado = {
+            'id': item['id'],
+            'produto': produtos[item['produto_id']] if carregar['produtos'] else item['produto_id'],
+            'quantidade': item['quantidade'],
+            'margem_venda_unitaria': decimal(margem),
+            'lucro_item': decimal(valores['lucro_item']),
+            'subtotal_item': decimal(valores['subtotal_item']),
+            'custo_real_item_unidade': decimal(custo),
+            'custo_dolar_item_total': decimal(valores['custo_dolar_item_total']),
+            'lucro_dolar_item_total': decimal(valores['lucro_dolar_item_total']),
+        }
+        if selecao is not None:
+            item_montado = selecao.filtrar('itens', item_montado)
+        itens_por_pedido[item['pedido_id']].append(item_montado)
+
+    pedidos = [
+        {
+            'id': linha['id'],
+            'cliente': linha['cliente__nome_completo'],
+            'data_pedido': data_hora(linha['data_pedido']),
+            'metodo_pagamento': linha['metodo_pagamento'],
+            'quantidade_parcelas': linha['quantidade_parcelas'],
+            'dia_vencimento_parcela': linha['dia_vencimento_parcela'],
+            'status_pagamento': linha['status_pagamento'],
+            'status_entrega': linha['status_entrega'],
+            'status_pedido': 'em_aberto' if linha['em_aberto'] else 'fechado',
+            'subtotal_itens': decimal(linha['subtotal_itens']),
+            'valor_servico': decimal(linha['valor_servico']),
+            'valor_total_venda': decimal(linha['valor_total_venda']),
+            'lucro_final': decimal(linha['lucro_final']),
+            'itens': itens_por_pedido[linha['id']],
+        }
+        for linha in linhas
+    ]
+    if selecao is None:
+        return pedidos
+    return [selecao.filtrar('', pedido) for pedido in pedidos]
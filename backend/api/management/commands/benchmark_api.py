@@ -0,0 +1,213 @@
+import json
+import time
+import tracemalloc
+
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import Categoria, Produto, Cliente, Pedido
+from api.versoes import CACHE_RESPOSTAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede as rotas de api/urls.py (listas, detalhes, criação de pedido, atualizar-status, "
+        "dashboard, leituras assíncronas...) contra o banco atual: percentis de latência, consultas e pico de memória. "
+        "Pode salvar o resultado como referência e comparar uma execução com ela."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=20, help="Requisições medidas por rota.")
+        parser.add_argument('--rotas', help="Apenas estas rotas, separadas por vírgula.")
+        parser.add_argument('--salvar', help="Grava o resultado em JSON, para servir de referência.")
+        parser.add_argument('--comparar', help="Compara com uma referência gravada por --salvar.")
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.2,
+            help="Aumento aceito na mediana de latência em relação à referência (padrão: 0.2 = 20%%)."
+        )
+        parser.add_argument(
+            '--com-cache', action='store_true',
+            help="Mantém o cache de respostas entre as repetições (por padrão ele é limpo a cada requisição)."
+        )
+
+    def handle(self, *args, **options):
+        self.cliente = APIClient(SERVER_NAME='127.0.0.1')
+        self.com_cache = options['com_cache']
+        rotas = self.get_rotas()
+        if options['rotas']:
+            nomes = options['rotas'].split(',')
+            desconhecidas = [nome for nome in nomes if nome not in rotas]
+            if desconhecidas:
+                raise CommandError(f"Rotas desconhecidas: {', '.join(desconhecidas)}. Use: {', '.join(rotas)}.")
+            rotas = {nome: rotas[nome] for nome in nomes}
+
+        resultados = {}
+        # As rotas que gravam (criação, atualizar-status, importação) são desfeitas no final
+        with transaction.atomic():
+            for nome, requisicao in rotas.items():
+                resultados[nome] = self.medir(requisicao, options['repeticoes'])
+                self.stdout.write(self.formatar(nome, resultados[nome]))
+            transaction.set_rollback(True)
+
+        if options['salvar']:
+            with open(options['salvar'], 'w', encoding='utf-8') as arquivo:
+                json.dump(resultados, arquivo, indent=2)
+            self.stdout.write(f"Referência gravada em {options['salvar']}.")
+        if options['comparar']:
+            self.comparar(resultados, options['comparar'], options['tolerancia'])
+
+    def get_rotas(self):
+        """Rota -> função que faz a requisição, com ids reais do banco atual."""
+        categoria = Categoria.objects.order_by('id').first()
+        produto = Produto.objects.order_by('-quantidade_estoque', 'id').first()
+        cliente = Cliente.objects.order_by('id').first()
+        pedido = Pedido.objects.order_by('-id').first()
+        if None in (categoria, produto, cliente, pedido):
+            raise CommandError("O banco está vazio; rode `python manage.py popular_dados` antes.")
+        ultimo = Pedido.objects.aggregate(data=Max('data_pedido'))['data'].date().isoformat()
+        ids_em_massa = list(Pedido.objects.order_by('-id').values_list('id', flat=True)[:100])
+        get = self.cliente.get
+
+        def criar_pedido():
+            return self.cliente.post('/api/pedidos/', {
+                'cliente_id': cliente.id, 'metodo_pagamento': 'a_vista', 'status_pagamento': 'pago',
+                'itens': [{'produto_id': produto.id, 'quantidade': 1, 'margem_venda_unitaria': '10.00'}],
+            }, format='json')
+
+        def atualizar_status():
+            # Alterna o status para que cada requisição grave de fato
+            atual = Pedido.objects.values_list('status_entrega', flat=True).get(id=pedido.id)
+            novo = 'nao_entregue' if atual == 'entregue' else 'entregue'
+            return self.cliente.patch(f'/api/pedidos/{pedido.id}/atualizar-status/', {'status_entrega': novo}, format='json')
+
+        def atualizar_status_em_massa():
+            # Os mesmos pedidos alternam entre os dois status, então cada requisição grava
+            atual = Pedido.objects.values_list('status_entrega', flat=True).get(id=pedido.id)
+            return self.cliente.patch('/api/pedidos/atualizar-status/', {
+                'ids': ids_em_massa, 'status_entrega': 'nao_entregue' if atual == 'entregue' else 'entregue',
+            }, format='json')
+
+        def importar_clientes():
+            arquivo = SimpleUploadedFile('clientes.csv', b'nome_completo,telefone,endereco\nBenchmark,11999999999,Rua A\n')
+            return self.cliente.post('/api/importacao/clientes/', {'arquivo': arquivo}, format='multipart')
+
+        def importar_produtos():
+            conteudo = f'nome,marca,preco_dolar,categoria,quantidade_estoque\nBenchmark,Marca,10.00,{categoria.nome},1\n'
+            arquivo = SimpleUploadedFile('produtos.csv', conteudo.encode())
+            return self.cliente.post('/api/importacao/produtos/', {'arquivo': arquivo}, format='multipart')
+
+        return {
+            'categorias-lista': lambda: get('/api/categorias/'),
+            'categorias-detalhe': lambda: get(f'/api/categorias/{categoria.id}/'),
+            'produtos-lista': lambda: get('/api/produtos/'),
+            'produtos-top': lambda: get('/api/produtos/?top=3'),
+            'produtos-periodo': lambda: get('/api/produtos/?periodo=30d'),
+            'produtos-busca': lambda: get(f'/api/produtos/?search={produto.nome.split()[0]}'),
+            'produtos-detalhe': lambda: get(f'/api/produtos/{produto.id}/'),
+            'produtos-estoque': lambda: get(f'/api/produtos/{produto.id}/estoque/?data={ultimo}'),
+            'produtos-movimentos-estoque': lambda: get(f'/api/produtos/{produto.id}/movimentos-estoque/'),
+            'clientes-lista': lambda: get('/api/clientes/'),
+            'clientes-busca': lambda: get(f'/api/clientes/?search={cliente.nome_completo.split()[0]}'),
+            'clientes-detalhe': lambda: get(f'/api/clientes/{cliente.id}/'),
+            'pedidos-lista': lambda: get('/api/pedidos/'),
+            'pedidos-enxuta': lambda: get('/api/pedidos/?fields=id,cliente,status_pedido,valor_total_venda'),
+            'pedidos-detalhe': lambda: get(f'/api/pedidos/{pedido.id}/'),
+            'pedidos-criar': criar_pedido,
+            'pedidos-atualizar-status': atualizar_status,
+            'pedidos-atualizar-status-em-massa': atualizar_status_em_massa,
+            'pedidos-exportar': lambda: get(f'/api/pedidos/exportar/?inicio={ultimo}&fim={ultimo}'),
+            'cotacoes-lista': lambda: get('/api/cotacoes/'),
+            'dashboard': lambda: get('/api/dashboard/'),
+            'dashboard-por-mes': lambda: get('/api/dashboard/?agrupar=mes'),
+            'relatorios': lambda: get('/api/relatorios/?por=categoria'),
+            'importacao-clientes': importar_clientes,
+            'importacao-produtos': importar_produtos,
+            'parcelas-lista': lambda: get('/api/parcelas/'),
+            'parcelas-em-atraso': lambda: get('/api/parcelas/?em_atraso=true'),
+            'async-dashboard': lambda: get('/api/async/dashboard/'),
+            'async-pedidos-lista': lambda: get('/api/async/pedidos/'),
+            'async-pedidos-detalhe': lambda: get(f'/api/async/pedidos/{pedido.id}/'),
+            'async-produtos-lista': lambda: get('/api/async/produtos/'),
+            'async-produtos-detalhe': lambda: get(f'/api/async/produtos/{produto.id}/'),
+            'cache': lambda: get('/api/cache/'),
+            'metrics': lambda: get('/api/metrics/'),
+        }
+
+    def executar(self, requisicao):
+        if not self.com_cache:
+            caches[CACHE_RESPOSTAS].clear()
+        resposta = requisicao()
+        if resposta.streaming:
+            # A exportação só é gerada enquanto o conteúdo é consumido
+            for _ in resposta.streaming_content:
+                pass
+        if resposta.status_code >= 400:
+            raise CommandError(f"{resposta.status_code} em {resposta.wsgi_request.get_full_path()}")
+        return resposta
+
+    def medir(self, requisicao, repeticoes):
+        self.executar(requisicao)  # aquecimento
+
+        tempos, consultas = [], []
+        for _ in range(repeticoes):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                self.executar(requisicao)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(len(capturadas))
+
+        # O tracemalloc deixa tudo mais lento, então a memória é medida em uma execução à parte
+        tracemalloc.start()
+        try:
+            self.executar(requisicao)
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        tempos.sort()
+        return {
+            'p50_ms': round(percentil(tempos, 50), 2),
+            'p95_ms': round(percentil(tempos, 95), 2),
+            'p99_ms': round(percentil(tempos, 99), 2),
+            'max_ms': round(tempos[-1], 2),
+            'consultas': max(consultas),
+            'memoria_kb': round(pico / 1024),
+        }
+
+    def formatar(self, nome, resultado):
+        return (
+            f"{nome:<26} p50 {resultado['p50_ms']:>8.1f} ms  p95 {resultado['p95_ms']:>8.1f} ms  "
+            f"p99 {resultado['p99_ms']:>8.1f} ms  {resultado['consultas']:>3} consultas  "
+            f"{resultado['memoria_kb']:>7} KB"
+        )
+
+    def comparar(self, resultados, caminho, tolerancia):
+        with open(caminho, encoding='utf-8') as arquivo:
+            referencia = json.load(arquivo)
+
+        regressoes = []
+        for nome, resultado in resultados.items():
+            base = referencia.get(nome)
+            if base is None:
+                continue
+            if resultado['p50_ms'] > base['p50_ms'] * (1 + tolerancia):
+                regressoes.append(f"{nome}: p50 {base['p50_ms']:.1f} -> {resultado['p50_ms']:.1f} ms")
+            if resultado['consultas'] > base['consultas']:
+                regressoes.append(f"{nome}: consultas {base['consultas']} -> {resultado['consultas']}")
+
+        if regressoes:
+            for regressao in regressoes:
+                self.stdout.write(self.style.ERROR(regressao))
+            raise CommandError(f"{len(regressoes)} regressão(ões) em relação a {caminho}.")
+        self.stdout.write(self.style.SUCCESS(f"Nenhuma regressão em relação a {caminho}."))
+
+
+def percentil(valores_ordenados, p):
+    # Percentil pelo posto mais próximo
+    indice = max(0, -(-len(valores_ordenados) * p // 100) - 1)
+    return valores_ordenados[int(indice)]
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api import leitura
+from api.models import Pedido, Produto
+from api.renderers import JSONRapidoRenderer, orjson
+from api.serializers import PedidoSerializer, ProdutoSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o tempo de montar e renderizar uma página de pedidos e de produtos pelos "
+        "serializers do DRF e pelo caminho rápido de api.leitura, com os dados do banco atual."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanho', type=int, default=100, help="Itens por página (padrão: 100).")
+        parser.add_argument('--repeticoes', type=int, default=20, help="Quantas vezes cada caminho é medido.")
+
+    def handle(self, *args, **options):
+        tamanho, repeticoes = options['tamanho'], options['repeticoes']
+        if not Pedido.objects.exists():
+            raise CommandError("Não há pedidos no banco; popule-o antes de rodar o benchmark.")
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson não está instalado: o renderer rápido usa o json do DRF."))
+
+        pedidos = Pedido.objects.order_by('-em_aberto', '-id')
+        produtos = Produto.objects.select_related('categoria').com_vendas().order_by('-quantidade_vendas', 'id')
+        casos = [
+            (
+                'pedidos',
+                lambda: JSONRenderer().render(PedidoSerializer(pedidos.com_itens()[:tamanho], many=True).data),
+                lambda: JSONRapidoRenderer().render(
+                    leitura.listar_pedidos(list(pedidos.values(*leitura.CAMPOS_PEDIDO)[:tamanho]))
+                ),
+            ),
+            (
+                'produtos',
+                lambda: JSONRenderer().render(ProdutoSerializer(produtos[:tamanho], many=True).data),
+                lambda: JSONRapidoRenderer().render(
+                    leitura.listar_produtos(list(produtos.values(*leitura.CAMPOS_PRODUTO)[:tamanho]))
+                ),
+            ),
+        ]
+
+        for nome, serializers, rapido in casos:
+            tempo_serializers = self.medir(serializers, repeticoes)
+            tempo_rapido = self.medir(rapido, repeticoes)
+            self.stdout.write(
+                f"{nome}: serializers {tempo_serializers:.1f} ms, caminho rápido {tempo_rapido:.1f} ms "
+                f"por página de {tamanho} ({tempo_serializers / tempo_rapido:.1f}x)"
+            )
+
+    def medir(self, funcao, repeticoes):
+        # Uma execução de aquecimento e a mediana das seguintes, em milissegundos
+        funcao()
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return sorted(tempos)[len(tempos) // 2]
@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from api.exportacao import FORMATOS, filtrar_itens, gerar_exportacao
+
+
+class Command(BaseCommand):
+    help = "Exporta os itens de pedido em CSV ou NDJSON, uma linha por item, para a contabilidade."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=list(FORMATOS), default='csv')
+        parser.add_argument('--inicio', help="Data inicial (AAAA-MM-DD), inclusiva.")
+        parser.add_argument('--fim', help="Data final (AAAA-MM-DD), inclusiva.")
+        parser.add_argument('--status-pagamento', help="Um ou mais status separados por vírgula.")
+        parser.add_argument('--status-entrega', help="Um ou mais status separados por vírgula.")
+        parser.add_argument('--saida', help="Arquivo de destino; sem ele a exportação vai para a saída padrão.")
+
+    def handle(self, *args, **options):
+        params = {
+            'inicio': options['inicio'],
+            'fim': options['fim'],
+            'status_pagamento': options['status_pagamento'],
+            'status_entrega': options['status_entrega'],
+        }
+        try:
+            itens = filtrar_itens(params)
+        except ValidationError as erro:
+            mensagens = [m if isinstance(m, str) else ' '.join(m) for m in erro.detail.values()]
+            raise CommandError(' '.join(mensagens))
+
+        # newline='' evita que o Windows duplique o \r\n das linhas do CSV
+        destino = open(options['saida'], 'w', encoding='utf-8', newline='') if options['saida'] else sys.stdout
+        try:
+            for trecho in gerar_exportacao(itens, options['formato']):
+                destino.write(trecho)
+        finally:
+            if destino is not sys.stdout:
+                destino.close()
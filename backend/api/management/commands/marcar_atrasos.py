@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.parcelas import marcar_atrasos
+
+
+class Command(BaseCommand):
+    help = (
+        "Marca as parcelas vencidas e em aberto como em atraso e passa os pedidos com alguma delas "
+        "para 'em_atraso'. Feito para rodar uma vez por dia (cron ou outro agendador)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', help="Considera vencidas as parcelas anteriores a esta data (AAAA-MM-DD). Padrão: hoje.")
+
+    def handle(self, *args, **options):
+        hoje = None
+        if options['data']:
+            hoje = parse_date(options['data'])
+            if hoje is None:
+                raise CommandError(f"Data inválida: '{options['data']}'. Use o formato AAAA-MM-DD.")
+        parcelas, pedidos = marcar_atrasos(hoje)
+        self.stdout.write(self.style.SUCCESS(
+            f"{parcelas} parcela(s) marcada(s) em atraso; {pedidos} pedido(s) passaram para 'em_atraso'."
+        ))
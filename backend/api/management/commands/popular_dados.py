@@ -0,0 +1,157 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.estoque import registrar_estoque_inicial
+from api.models import Categoria, Produto, Cliente, Pedido, PedidoProduto
+from api.parcelas import criar_parcelas
+from api.precificacao import calcular_custo_real, get_fator_florida
+from api.resumos import reconstruir_resumos
+from api.utils import get_cotacao_dolar_com_encargos
+from api.versoes import RECURSOS_POR_MODEL, registrar_escrita
+
+CATEGORIAS = ['Perfumes', 'Eletrônicos', 'Relógios', 'Bolsas', 'Maquiagem', 'Tênis', 'Óculos', 'Suplementos']
+MARCAS = ['Chanel', 'Dior', 'Apple', 'Samsung', 'Nike', 'Adidas', 'Lacoste', 'Calvin Klein', 'Ray-Ban', 'Garmin']
+TIPOS = ['Eau de Parfum', 'Fone', 'Relógio', 'Bolsa', 'Batom', 'Tênis', 'Óculos', 'Whey', 'Carregador', 'Mochila']
+NOMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe', 'Gabriela', 'Heitor', 'Isabela', 'João', 'Larissa', 'Marcos']
+SOBRENOMES = ['Silva', 'Souza', 'Oliveira', 'Santos', 'Pereira', 'Costa', 'Almeida', 'Ferreira', 'Ribeiro', 'Gomes']
+RUAS = ['Rua das Flores', 'Avenida Brasil', 'Rua São João', 'Rua XV de Novembro', 'Avenida Paulista']
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula um banco vazio com um conjunto de dados sintético e reprodutível (mesma semente, "
+        "mesmos dados) no tamanho pedido, para testes de carga e benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categorias', type=int, default=50)
+        parser.add_argument('--produtos', type=int, default=20000)
+        parser.add_argument('--clientes', type=int, default=10000)
+        parser.add_argument('--pedidos', type=int, default=200000)
+        parser.add_argument('--itens-por-pedido', type=int, default=5, help="Máximo de itens em cada pedido.")
+        parser.add_argument('--dias', type=int, default=365, help="Os pedidos são distribuídos pelos últimos N dias.")
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--lote', type=int, default=2000, help="Registros gravados por vez.")
+
+    def handle(self, *args, **options):
+        if Produto.objects.exists() or Cliente.objects.exists() or Pedido.objects.exists():
+            raise CommandError("O banco já tem dados; rode `python manage.py flush` antes de popular.")
+        if min(options['categorias'], options['produtos'], options['clientes'], options['itens_por_pedido']) < 1:
+            raise CommandError("Categorias, produtos, clientes e itens por pedido precisam ser pelo menos 1.")
+
+        self.aleatorio = random.Random(options['semente'])
+        self.lote = options['lote']
+        inicio = time.perf_counter()
+
+        categorias = self.criar_categorias(options['categorias'])
+        produtos = self.criar_produtos(options['produtos'], categorias)
+        clientes = self.criar_clientes(options['clientes'])
+        itens = self.criar_pedidos(options['pedidos'], produtos, clientes, options['itens_por_pedido'], options['dias'])
+
+        # Todas as gravações foram em massa, sem passar por save(): resumos e versões são refeitos aqui
+        reconstruir_resumos()
+        registrar_escrita(*{recurso for recursos in RECURSOS_POR_MODEL.values() for recurso in recursos})
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(categorias)} categoria(s), {len(produtos)} produto(s), {len(clientes)} cliente(s), "
+            f"{options['pedidos']} pedido(s) e {itens} item(ns) criados em {time.perf_counter() - inicio:.1f} s."
+        ))
+
+    def criar_categorias(self, quantidade):
+        nomes = [
+            CATEGORIAS[i % len(CATEGORIAS)] + (f' {i // len(CATEGORIAS) + 1}' if i >= len(CATEGORIAS) else '')
+            for i in range(quantidade)
+        ]
+        return Categoria.objects.bulk_create([Categoria(nome=nome) for nome in nomes])
+
+    def criar_produtos(self, quantidade, categorias):
+        aleatorio = self.aleatorio
+        cotacao, fator_florida = get_cotacao_dolar_com_encargos(), get_fator_florida()
+        produtos = []
+        for i in range(quantidade):
+            preco = Decimal(aleatorio.randint(500, 50000)) / 100
+            produtos.append(Produto(
+                nome=f'{aleatorio.choice(TIPOS)} {aleatorio.choice(MARCAS)} {i + 1}',
+                categoria=aleatorio.choice(categorias),
+                marca=aleatorio.choice(MARCAS),
+                preco_dolar=preco,
+                quantidade_estoque=aleatorio.randint(0, 500),
+                preco_real_custo=calcular_custo_real(preco, cotacao, fator_florida),
+            ))
+        with transaction.atomic():
+            produtos = Produto.objects.bulk_create(produtos, batch_size=self.lote)
+            registrar_estoque_inicial(produtos)
+        return produtos
+
+    def criar_clientes(self, quantidade):
+        aleatorio = self.aleatorio
+        clientes = [
+            Cliente(
+                nome_completo=f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}',
+                telefone=f'11 9{aleatorio.randint(0, 99999999):08d}',
+                endereco=f'{aleatorio.choice(RUAS)}, {aleatorio.randint(1, 3000)}',
+            )
+            for _ in range(quantidade)
+        ]
+        with transaction.atomic():
+            return Cliente.objects.bulk_create(clientes, batch_size=self.lote)
+
+    def criar_pedidos(self, quantidade, produtos, clientes, maximo_itens, dias):
+        """Cria os pedidos em lotes, com os itens e os totais já calculados. Devolve o total de itens."""
+        aleatorio = self.aleatorio
+        inicio = timezone.now() - timedelta(days=dias)
+        status_pagamento = [codigo for codigo, _ in Pedido.STATUS_PAGAMENTO_CHOICES]
+        status_entrega = [codigo for codigo, _ in Pedido.STATUS_ENTREGA_CHOICES]
+        total_itens = 0
+
+        for inicio_lote in range(0, quantidade, self.lote):
+            pedidos, itens = [], []
+            for indice in range(inicio_lote, min(inicio_lote + self.lote, quantidade)):
+                parcelado = aleatorio.random() < 0.3
+                pedido = Pedido(
+                    cliente=aleatorio.choice(clientes),
+                    metodo_pagamento='parcelado' if parcelado else 'a_vista',
+                    quantidade_parcelas=aleatorio.randint(2, 10) if parcelado else 1,
+                    dia_vencimento_parcela=aleatorio.randint(1, 28) if parcelado else None,
+                    status_pagamento=aleatorio.choice(status_pagamento),
+                    status_entrega=aleatorio.choice(status_entrega),
+                    valor_servico=Decimal(aleatorio.choice([0, 0, 0, 1500, 3000])) / 100,
+                    # Datas crescentes com o id, como em produção, espalhadas pelos últimos `dias`
+                    data_pedido=inicio + timedelta(seconds=dias * 86400 * (indice + aleatorio.random()) / quantidade),
+                )
+
+                subtotal = lucro = Decimal('0.00')
+                for produto in aleatorio.sample(produtos, min(aleatorio.randint(1, maximo_itens), len(produtos))):
+                    item = PedidoProduto(
+                        pedido=pedido, produto=produto, quantidade=aleatorio.randint(1, 5),
+                        margem_venda_unitaria=Decimal(aleatorio.randint(500, 20000)) / 100,
+                        custo_real_item_unidade=produto.preco_real_custo,
+                    )
+                    subtotal += item.subtotal_item
+                    lucro += item.lucro_item
+                    itens.append(item)
+                pedido.subtotal_itens, pedido.lucro_itens = subtotal, lucro
+                pedido.valor_total_venda = subtotal + pedido.valor_servico
+                pedido.lucro_final = lucro + pedido.valor_servico
+                pedidos.append(pedido)
+
+            with transaction.atomic():
+                # O auto_now_add de Pedido.data_pedido troca a data simulada pelo instante atual
+                # no bulk_create; a data é regravada logo depois, na mesma transação
+                datas = [pedido.data_pedido for pedido in pedidos]
+                Pedido.objects.bulk_create(pedidos)
+                for pedido, data in zip(pedidos, datas):
+                    pedido.data_pedido = data
+                Pedido.objects.bulk_update(pedidos, ['data_pedido'])
+                PedidoProduto.objects.bulk_create(itens)
+                criar_parcelas(pedidos)
+            total_itens += len(itens)
+            self.stdout.write(f"{inicio_lote + len(pedidos)}/{quantidade} pedidos...", ending='\r')
+        self.stdout.write('')
+        return total_itens
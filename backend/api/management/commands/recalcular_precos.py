@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.precificacao import recalcular_custos_catalogo
+
+
+class Command(BaseCommand):
+    help = "Recalcula o custo em reais (preco_real_custo) de todo o catálogo com a cotação e a taxa atuais."
+
+    def handle(self, *args, **options):
+        alterados = recalcular_custos_catalogo()
+        self.stdout.write(self.style.SUCCESS(f"{alterados} produto(s) com custo atualizado."))
@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from api.models import Pedido, PedidoProduto, SUBTOTAL_ITEM, LUCRO_ITEM
+from api.resumos import reconstruir_resumos
+from api.versoes import RECURSOS_POR_MODEL, registrar_escrita
+
+
+class Command(BaseCommand):
+    help = "Recalcula (ou apenas verifica) os totais gravados em cada pedido a partir dos seus itens."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help="Apenas lista os pedidos com totais divergentes, sem gravar nada."
+        )
+        parser.add_argument('--lote', type=int, default=1000, help="Quantidade de pedidos gravados por vez.")
+
+    def handle(self, *args, **options):
+        # Uma única consulta agrupada traz os totais corretos de todos os pedidos
+        totais_por_pedido = {
+            linha['pedido_id']: linha
+            for linha in PedidoProduto.objects.values('pedido_id').order_by().annotate(
+                subtotal=Sum(SUBTOTAL_ITEM), lucro=Sum(LUCRO_ITEM)
+            )
+        }
+
+        divergentes = []
+        pedidos = Pedido.objects.only('id', 'valor_servico', *Pedido.CAMPOS_TOTAIS).order_by('id')
+        for pedido in pedidos.iterator(chunk_size=options['lote']):
+            totais = totais_por_pedido.get(pedido.id, {})
+            subtotal = totais.get('subtotal') or Decimal('0.00')
+            lucro = totais.get('lucro') or Decimal('0.00')
+            esperado = {
+                'subtotal_itens': subtotal,
+                'lucro_itens': lucro,
+                'valor_total_venda': subtotal + pedido.valor_servico,
+                'lucro_final': lucro + pedido.valor_servico,
+            }
+            if any(getattr(pedido, campo) != valor for campo, valor in esperado.items()):
+                for campo, valor in esperado.items():
+                    setattr(pedido, campo, valor)
+                divergentes.append(pedido)
+
+        if options['verificar']:
+            for pedido in divergentes:
+                self.stdout.write(f"Pedido {pedido.id}: totais divergentes.")
+            if divergentes:
+                raise CommandError(f"{len(divergentes)} pedido(s) com totais divergentes.")
+            self.stdout.write(self.style.SUCCESS("Todos os pedidos estão com os totais corretos."))
+            return
+
+        with transaction.atomic():
+            Pedido.objects.bulk_update(divergentes, Pedido.CAMPOS_TOTAIS, batch_size=options['lote'])
+            # bulk_update não passa por Pedido.save, então os resumos diários são refeitos
+            if divergentes:
+                reconstruir_resumos()
+                registrar_escrita(*RECURSOS_POR_MODEL['Pedido'])
+        self.stdout.write(self.style.SUCCESS(f"{len(divergentes)} pedido(s) recalculado(s)."))
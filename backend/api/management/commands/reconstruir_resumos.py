@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.models import ResumoVendas, ResumoPedidosDia
+from api.resumos import reconstruir_resumos
+
+
+class Command(BaseCommand):
+    help = "Recalcula do zero os resumos de vendas (ResumoVendas e ResumoPedidosDia) a partir dos pedidos."
+
+    def handle(self, *args, **options):
+        reconstruir_resumos()
+        self.stdout.write(self.style.SUCCESS(
+            f"{ResumoVendas.objects.count()} linha(s) de vendas e "
+            f"{ResumoPedidosDia.objects.count()} dia(s) de pedidos recalculados."
+        ))
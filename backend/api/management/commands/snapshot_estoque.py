@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.estoque import gravar_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Grava o estoque atual de cada produto (SnapshotEstoque) e o confere com o razão de "
+        "movimentos; divergências viram ajustes. Rode periodicamente (por exemplo, uma vez por dia)."
+    )
+
+    def handle(self, *args, **options):
+        divergencias = gravar_snapshots()
+        for produto_id, (no_razao, no_produto) in sorted(divergencias.items()):
+            self.stdout.write(self.style.WARNING(
+                f"Produto {produto_id}: {no_razao} no razão, {no_produto} em estoque; ajuste de {no_produto - no_razao:+d}."
+            ))
+        self.stdout.write(self.style.SUCCESS(f"Snapshot gravado; {len(divergencias)} divergência(s) ajustada(s)."))
@@ -0,0 +1,254 @@
+"""
+Medição por requisição: consultas SQL, tempo no banco, tempo de serialização, tempo de
+renderização e tempo total.
+
+O MetricasMiddleware mede cada requisição e:
+- devolve as medidas no cabeçalho Server-Timing (aparece na aba Network do navegador);
+- registra no log 'api.metricas' as requisições acima dos limites de settings.METRICAS,
+  com as consultas repetidas (o sintoma de N+1);
+- acumula histogramas por view, expostos em /api/metrics/ no formato texto do Prometheus.
+
+Os histogramas ficam na memória do processo: com vários workers, cada um expõe os seus.
+Em respostas em streaming (exportação) o que roda durante o envio não entra nas medidas.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LIMITES_PADRAO = {'TEMPO_MS': 500, 'CONSULTAS': 30}
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_medicao_atual = ContextVar('medicao_atual', default=None)
+_serializando = ContextVar('serializando', default=False)
+
+
+class Medicao:
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_sql = 0.0
+        self.tempo_serializacao = 0.0
+        self.tempo_render = 0.0
+        self.sqls = Counter()
+        # Views assíncronas podem consultar o banco em várias threads ao mesmo tempo
+        self.trava = threading.Lock()
+
+    def registrar_consulta(self, sql, duracao):
+        with self.trava:
+            self.tempo_sql += duracao
+            self.consultas += 1
+            self.sqls[sql] += 1
+
+    def repetidas(self, limite=5):
+        return [(sql, vezes) for sql, vezes in self.sqls.most_common(limite) if vezes > 1]
+
+
+def medir_consulta(execute, sql, params, many, context):
+    """
+    Wrapper de execução instalado em toda conexão nova (instalar_medicao). A medição
+    vem de uma ContextVar, que o sync_to_async copia para as threads do ORM assíncrono.
+    """
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.registrar_consulta(sql, time.perf_counter() - inicio)
+
+
+def instalar_medicao(sender, connection, **kwargs):
+    """Receiver de connection_created."""
+    if medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(medir_consulta)
+
+
+@contextmanager
+def medir_render():
+    """Soma o tempo do bloco ao de renderização da requisição atual, se houver uma."""
+    medicao = _medicao_atual.get()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if medicao is not None:
+            medicao.tempo_render += time.perf_counter() - inicio
+
+
+@contextmanager
+def medir_serializacao():
+    """
+    Soma o tempo do bloco ao de serialização da requisição atual, descontando as consultas
+    feitas dentro dele (um N+1 nos campos aninhados continua aparecendo no banco). Blocos
+    aninhados, como os serializers dos campos, são medidos só pelo mais externo.
+    """
+    medicao = _medicao_atual.get()
+    if medicao is None or _serializando.get():
+        yield
+        return
+    token = _serializando.set(True)
+    sql_antes = medicao.tempo_sql
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _serializando.reset(token)
+        duracao = time.perf_counter() - inicio - (medicao.tempo_sql - sql_antes)
+        with medicao.trava:
+            medicao.tempo_serializacao += max(duracao, 0)
+
+
+class SerializacaoMedidaMixin:
+    """Mede o to_representation do serializer (e, numa lista, o de cada item) na requisição."""
+
+    def to_representation(self, instance):
+        with medir_serializacao():
+            return super().to_representation(instance)
+
+
+class Histograma:
+    def __init__(self, nome, ajuda, buckets):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.buckets = buckets
+        # rótulos -> [contagem por bucket, soma, total de observações]
+        self.series = {}
+
+    def observar(self, rotulos, valor):
+        serie = self.series.setdefault(rotulos, [[0] * len(self.buckets), 0.0, 0])
+        for indice, limite in enumerate(self.buckets):
+            if valor <= limite:
+                serie[0][indice] += 1
+        serie[1] += valor
+        serie[2] += 1
+
+    def exportar(self):
+        linhas = [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} histogram']
+        for rotulos, (contagens, soma, total) in sorted(self.series.items()):
+            base = _rotulos(rotulos)
+            for limite, contagem in zip(self.buckets, contagens):
+                linhas.append(f'{self.nome}_bucket{{{base},le="{limite}"}} {contagem}')
+            linhas.append(f'{self.nome}_bucket{{{base},le="+Inf"}} {total}')
+            linhas.append(f'{self.nome}_sum{{{base}}} {soma:.6f}')
+            linhas.append(f'{self.nome}_count{{{base}}} {total}')
+        return linhas
+
+
+def _rotulos(rotulos):
+    # Valores entre aspas, com barras e aspas escapadas, como pede o formato texto
+    return ','.join(
+        '{}="{}"'.format(nome, str(valor).replace('\\', '\\\\').replace('"', '\\"'))
+        for nome, valor in rotulos
+    )
+
+
+class Registro:
+    """Métricas acumuladas do processo."""
+
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        self.requisicoes = Counter()
+        self.histogramas = [
+            Histograma('sistemaloja_requisicao_segundos', 'Tempo total da requisição.', BUCKETS_SEGUNDOS),
+            Histograma('sistemaloja_sql_segundos', 'Tempo gasto em consultas SQL por requisição.', BUCKETS_SEGUNDOS),
+            Histograma('sistemaloja_serializacao_segundos', 'Tempo dos serializers, sem as consultas feitas por eles.', BUCKETS_SEGUNDOS),
+            Histograma('sistemaloja_render_segundos', 'Tempo de renderização da resposta.', BUCKETS_SEGUNDOS),
+            Histograma('sistemaloja_consultas', 'Consultas SQL por requisição.', BUCKETS_CONSULTAS),
+        ]
+
+    def registrar(self, view, metodo, status, medicao, total):
+        rotulos = (('view', view), ('metodo', metodo))
+        valores = (total, medicao.tempo_sql, medicao.tempo_serializacao, medicao.tempo_render, medicao.consultas)
+        with self.trava:
+            self.requisicoes[rotulos + (('status', status),)] += 1
+            for histograma, valor in zip(self.histogramas, valores):
+                histograma.observar(rotulos, valor)
+
+    def exportar(self):
+        with self.trava:
+            linhas = ['# HELP sistemaloja_requisicoes_total Requisições atendidas.',
+                      '# TYPE sistemaloja_requisicoes_total counter']
+            linhas += [
+                f'sistemaloja_requisicoes_total{{{_rotulos(rotulos)}}} {total}'
+                for rotulos, total in sorted(self.requisicoes.items())
+            ]
+            for histograma in self.histogramas:
+                linhas += histograma.exportar()
+        return '\n'.join(linhas) + '\n'
+
+
+registro = Registro()
+
+
+def get_limites():
+    return {**LIMITES_PADRAO, **getattr(settings, 'METRICAS', {})}
+
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Sob ASGI com views assíncronas, o middleware também precisa ser assíncrono
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        inicio = time.perf_counter()
+        try:
+            resposta = self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        return self.finalizar(request, resposta, medicao, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        inicio = time.perf_counter()
+        try:
+            resposta = await self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        return self.finalizar(request, resposta, medicao, time.perf_counter() - inicio)
+
+    def finalizar(self, request, resposta, medicao, total):
+        correspondencia = request.resolver_match
+        view = correspondencia.view_name if correspondencia else 'nao_encontrada'
+        registro.registrar(view, request.method, resposta.status_code, medicao, total)
+
+        aplicacao = max(total - medicao.tempo_sql - medicao.tempo_serializacao - medicao.tempo_render, 0)
+        resposta['Server-Timing'] = ', '.join([
+            f'db;dur={medicao.tempo_sql * 1000:.1f};desc="{medicao.consultas} consultas"',
+            f'app;dur={aplicacao * 1000:.1f}',
+            f'serializer;dur={medicao.tempo_serializacao * 1000:.1f}',
+            f'render;dur={medicao.tempo_render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        limites = get_limites()
+        if total * 1000 > limites['TEMPO_MS'] or medicao.consultas > limites['CONSULTAS']:
+            repetidas = ''.join(f'\n  {vezes}x {sql}' for sql, vezes in medicao.repetidas())
+            logger.warning(
+                "%s %s (%s) acima do limite: %.0f ms, %d consultas (%.0f ms no banco).%s",
+                request.method, request.get_full_path(), view, total * 1000,
+                medicao.consultas, medicao.tempo_sql * 1000, repetidas
+            )
+        return resposta
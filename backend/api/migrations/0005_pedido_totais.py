@@ -0,0 +1,61 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:29
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_totais(apps, schema_editor):
+    Pedido = apps.get_model('api', 'Pedido')
+    PedidoProduto = apps.get_model('api', 'PedidoProduto')
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+
+    itens = PedidoProduto.objects.filter(pedido=OuterRef('pk')).order_by().values('pedido')
+    subtotal = itens.annotate(total=Sum(ExpressionWrapper(
+        (Coalesce(F('custo_real_item_unidade'), Value(Decimal('0.00'))) + F('margem_venda_unitaria')) * F('quantidade'),
+        output_field=decimal
+    ))).values('total')
+    lucro = itens.annotate(total=Sum(ExpressionWrapper(
+        F('margem_venda_unitaria') * F('quantidade'), output_field=decimal
+    ))).values('total')
+
+    Pedido.objects.update(
+        subtotal_itens=Coalesce(Subquery(subtotal, output_field=decimal), Value(Decimal('0.00'))),
+        lucro_itens=Coalesce(Subquery(lucro, output_field=decimal), Value(Decimal('0.00'))),
+    )
+    Pedido.objects.update(
+        valor_total_venda=F('subtotal_itens') + F('valor_servico'),
+        lucro_final=F('lucro_itens') + F('valor_servico'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_remove_pedidoproduto_preco_venda_unitario_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='lucro_final',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='lucro_itens',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='subtotal_itens',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='valor_total_venda',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.RunPython(preencher_totais, migrations.RunPython.noop),
+    ]
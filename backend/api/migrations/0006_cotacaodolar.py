@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_pedido_totais'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CotacaoDolar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('fonte', models.CharField(max_length=50)),
+                ('obtida_em', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:44
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def cotacao_para_migracao(apps):
+    # Só dados já gravados ou configurados, sem o cache nem o provedor de api.cambio: a última
+    # cotação do histórico ou, sem histórico, o valor do provedor fixo configurado
+    CotacaoDolar = apps.get_model('api', 'CotacaoDolar')
+    ultima = CotacaoDolar.objects.order_by('-obtida_em').values_list('valor', flat=True).first()
+    if ultima is not None:
+        return ultima
+    valor = getattr(settings, 'COTACAO_DOLAR', {}).get('OPCOES', {}).get('valor')
+    return Decimal(str(valor)) if valor is not None else None
+
+
+def preencher_custos(apps, schema_editor):
+    # Fórmula de calcular_custo_real congelada nesta migração: dólar x cotação x imposto da Flórida.
+    # Sem cotação conhecida a coluna fica vazia; `python manage.py recalcular_precos` a preenche
+    cotacao = cotacao_para_migracao(apps)
+    if cotacao is None:
+        return
+    fator_florida = 1 + Decimal(str(getattr(settings, 'TAXA_FLORIDA_PERCENTUAL', '0.065')))
+    Produto = apps.get_model('api', 'Produto')
+    produtos = list(Produto.objects.only('id', 'preco_dolar'))
+    for produto in produtos:
+        produto.preco_real_custo = (produto.preco_dolar * cotacao * fator_florida).quantize(Decimal('0.01'))
+    Produto.objects.bulk_update(produtos, ['preco_real_custo'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_cotacaodolar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='preco_real_custo',
+            field=models.DecimalField(decimal_places=2, editable=False, help_text='Custo atual em R$ com encargos, mantido por api.precificacao', max_digits=12, null=True),
+        ),
+        migrations.RunPython(preencher_custos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:49
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def preencher_resumos(apps, schema_editor):
+    PedidoProduto = apps.get_model('api', 'PedidoProduto')
+    Pedido = apps.get_model('api', 'Pedido')
+    ResumoVendas = apps.get_model('api', 'ResumoVendas')
+    ResumoPedidosDia = apps.get_model('api', 'ResumoPedidosDia')
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+
+    vendas = PedidoProduto.objects.annotate(dia=TruncDate('pedido__data_pedido')).values(
+        'dia', categoria_id=F('produto__categoria_id'), marca=F('produto__marca')
+    ).order_by().annotate(
+        unidades=Sum('quantidade'),
+        receita=Sum(ExpressionWrapper(
+            (Coalesce(F('custo_real_item_unidade'), Value(Decimal('0.00'))) + F('margem_venda_unitaria')) * F('quantidade'),
+            output_field=decimal
+        )),
+        lucro=Sum(ExpressionWrapper(F('margem_venda_unitaria') * F('quantidade'), output_field=decimal)),
+    )
+    ResumoVendas.objects.bulk_create([ResumoVendas(**linha) for linha in vendas], batch_size=1000)
+
+    pedidos = Pedido.objects.annotate(dia=TruncDate('data_pedido')).values('dia').order_by().annotate(
+        quantidade_pedidos=Count('id'),
+        pedidos_pagos=Count('id', filter=Q(status_pagamento='pago')),
+        pedidos_entregues=Count('id', filter=Q(status_entrega='entregue')),
+        pedidos_fechados=Count('id', filter=Q(status_entrega='entregue', status_pagamento__in=['pago', 'em_dia'])),
+        valor_total_venda=Sum('valor_total_venda'),
+        lucro_final=Sum('lucro_final'),
+    )
+    ResumoPedidosDia.objects.bulk_create([ResumoPedidosDia(**linha) for linha in pedidos], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_produto_preco_real_custo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoPedidosDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(unique=True)),
+                ('quantidade_pedidos', models.IntegerField(default=0)),
+                ('pedidos_pagos', models.IntegerField(default=0)),
+                ('pedidos_entregues', models.IntegerField(default=0)),
+                ('pedidos_fechados', models.IntegerField(default=0)),
+                ('valor_total_venda', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('lucro_final', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumoVendas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('marca', models.CharField(max_length=100)),
+                ('unidades', models.IntegerField(default=0)),
+                ('receita', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('lucro', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('categoria', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.categoria')),
+            ],
+            options={
+                'unique_together': {('dia', 'categoria', 'marca')},
+            },
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
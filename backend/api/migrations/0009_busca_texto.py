@@ -0,0 +1,97 @@
+# Índices de busca textual (SQLite FTS5) usados por api.busca.BuscaTextoFilter.
+# As tabelas são mantidas por triggers, então também acompanham bulk_create/bulk_update
+# e UPDATEs em massa. Em outros bancos a migração não faz nada e a busca usa LIKE.
+
+from django.db import migrations
+
+# remove_diacritics 2: "jose" encontra "José", "acucar" encontra "Açúcar"
+TOKENIZADOR = "tokenize = 'unicode61 remove_diacritics 2'"
+
+CRIAR = [
+    f"CREATE VIRTUAL TABLE api_busca_produto USING fts5(nome, marca, categoria, {TOKENIZADOR})",
+    """
+    INSERT INTO api_busca_produto (rowid, nome, marca, categoria)
+    SELECT p.id, p.nome, p.marca, c.nome FROM api_produto p LEFT JOIN api_categoria c ON c.id = p.categoria_id
+    """,
+    """
+    CREATE TRIGGER api_busca_produto_ai AFTER INSERT ON api_produto BEGIN
+        INSERT INTO api_busca_produto (rowid, nome, marca, categoria)
+        VALUES (new.id, new.nome, new.marca, (SELECT nome FROM api_categoria WHERE id = new.categoria_id));
+    END
+    """,
+    # Só os campos indexados disparam a atualização: a baixa de estoque de cada pedido não toca no índice
+    """
+    CREATE TRIGGER api_busca_produto_au AFTER UPDATE OF nome, marca, categoria_id ON api_produto BEGIN
+        UPDATE api_busca_produto
+        SET nome = new.nome, marca = new.marca,
+            categoria = (SELECT nome FROM api_categoria WHERE id = new.categoria_id)
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER api_busca_produto_ad AFTER DELETE ON api_produto BEGIN
+        DELETE FROM api_busca_produto WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER api_busca_categoria_au AFTER UPDATE OF nome ON api_categoria BEGIN
+        UPDATE api_busca_produto SET categoria = new.nome
+        WHERE rowid IN (SELECT id FROM api_produto WHERE categoria_id = new.id);
+    END
+    """,
+    f"CREATE VIRTUAL TABLE api_busca_cliente USING fts5(nome_completo, telefone, endereco, {TOKENIZADOR})",
+    """
+    INSERT INTO api_busca_cliente (rowid, nome_completo, telefone, endereco)
+    SELECT id, nome_completo, telefone, endereco FROM api_cliente
+    """,
+    """
+    CREATE TRIGGER api_busca_cliente_ai AFTER INSERT ON api_cliente BEGIN
+        INSERT INTO api_busca_cliente (rowid, nome_completo, telefone, endereco)
+        VALUES (new.id, new.nome_completo, new.telefone, new.endereco);
+    END
+    """,
+    """
+    CREATE TRIGGER api_busca_cliente_au AFTER UPDATE OF nome_completo, telefone, endereco ON api_cliente BEGIN
+        UPDATE api_busca_cliente
+        SET nome_completo = new.nome_completo, telefone = new.telefone, endereco = new.endereco
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER api_busca_cliente_ad AFTER DELETE ON api_cliente BEGIN
+        DELETE FROM api_busca_cliente WHERE rowid = old.id;
+    END
+    """,
+]
+
+APAGAR = [
+    "DROP TRIGGER IF EXISTS api_busca_produto_ai",
+    "DROP TRIGGER IF EXISTS api_busca_produto_au",
+    "DROP TRIGGER IF EXISTS api_busca_produto_ad",
+    "DROP TRIGGER IF EXISTS api_busca_categoria_au",
+    "DROP TABLE IF EXISTS api_busca_produto",
+    "DROP TRIGGER IF EXISTS api_busca_cliente_ai",
+    "DROP TRIGGER IF EXISTS api_busca_cliente_au",
+    "DROP TRIGGER IF EXISTS api_busca_cliente_ad",
+    "DROP TABLE IF EXISTS api_busca_cliente",
+]
+
+
+def executar(comandos):
+    def operacao(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for comando in comandos:
+            schema_editor.execute(comando)
+    return operacao
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_resumos_vendas'),
+    ]
+
+    operations = [
+        migrations.RunPython(executar(CRIAR), executar(APAGAR)),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_busca_texto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='em_aberto',
+            field=models.GeneratedField(db_persist=True, expression=models.ExpressionWrapper(models.Q(('status_entrega', 'entregue'), ('status_pagamento__in', ['pago', 'em_dia']), _negated=True), output_field=models.BooleanField()), output_field=models.BooleanField()),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['-em_aberto', '-id'], name='pedido_aberto_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['cliente', 'em_aberto'], name='pedido_cliente_aberto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['data_pedido'], name='pedido_data_idx'),
+        ),
+    ]
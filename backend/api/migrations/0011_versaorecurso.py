@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_pedido_em_aberto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoRecurso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recurso', models.CharField(max_length=50, unique=True)),
+                ('versao', models.PositiveBigIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def abrir_historico(apps, schema_editor):
+    # O estoque atual de cada produto é o ponto de partida do razão
+    Produto = apps.get_model('api', 'Produto')
+    MovimentoEstoque = apps.get_model('api', 'MovimentoEstoque')
+    MovimentoEstoque.objects.bulk_create([
+        MovimentoEstoque(produto_id=id, tipo='ajuste', quantidade=quantidade, observacao='Saldo inicial do histórico')
+        for id, quantidade in Produto.objects.exclude(quantidade_estoque=0).values_list('id', 'quantidade_estoque')
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_versaorecurso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimentoEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('entrada', 'Entrada'), ('venda', 'Venda'), ('ajuste', 'Ajuste'), ('estorno', 'Estorno')], max_length=20)),
+                ('quantidade', models.IntegerField(help_text='Variação do estoque: positiva nas entradas e estornos, negativa nas vendas')),
+                ('observacao', models.CharField(blank=True, max_length=255)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('pedido', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.pedido')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimentos_estoque', to='api.produto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['produto', 'criado_em'], name='movimento_produto_data_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateTimeField()),
+                ('quantidade', models.IntegerField()),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.produto')),
+            ],
+            options={
+                'unique_together': {('produto', 'data')},
+            },
+        ),
+        migrations.RunPython(abrir_historico, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_estoque'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Parcela',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveSmallIntegerField()),
+                ('vencimento', models.DateField()),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('paga', models.BooleanField(default=False)),
+                ('paga_em', models.DateField(blank=True, null=True)),
+                ('em_atraso', models.BooleanField(default=False)),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parcelas', to='api.pedido')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('paga', False)), fields=['vencimento'], name='parcela_aberta_venc_idx')],
+                'unique_together': {('pedido', 'numero')},
+            },
+        ),
+    ]
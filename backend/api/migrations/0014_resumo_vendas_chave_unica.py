@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:38
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def juntar_linhas_sem_categoria(apps, schema_editor):
+    # Categorias apagadas deixaram várias linhas (dia, NULL, marca); soma cada grupo em uma
+    ResumoVendas = apps.get_model('api', 'ResumoVendas')
+    repetidas = ResumoVendas.objects.filter(categoria__isnull=True).values('dia', 'marca').order_by().annotate(
+        linhas=Count('id'), soma_unidades=Sum('unidades'), soma_receita=Sum('receita'), soma_lucro=Sum('lucro')
+    ).filter(linhas__gt=1)
+    for grupo in list(repetidas):
+        linhas = ResumoVendas.objects.filter(categoria__isnull=True, dia=grupo['dia'], marca=grupo['marca'])
+        primeira = linhas.order_by('id').first()
+        linhas.exclude(pk=primeira.pk).delete()
+        primeira.unidades, primeira.receita, primeira.lucro = grupo['soma_unidades'], grupo['soma_receita'], grupo['soma_lucro']
+        primeira.save(update_fields=['unidades', 'receita', 'lucro'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_parcelas'),
+    ]
+
+    operations = [
+        migrations.RunPython(juntar_linhas_sem_categoria, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='resumovendas',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='resumovendas',
+            name='categoria',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.categoria'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumovendas',
+            constraint=models.UniqueConstraint(models.F('dia'), django.db.models.functions.comparison.Coalesce('categoria', models.Value(0)), models.F('marca'), name='resumo_vendas_chave_unica'),
+        ),
+    ]
@@ -1,46 +1,181 @@
-from django.db import models
-from django.db.models import Sum, F
+from django.db import models, transaction
+from django.db.models import Sum, Count, Max, F, Q, Value, ExpressionWrapper, Prefetch, Window
 from django.db.models.fields import DecimalField
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
 from decimal import Decimal
 
+from . import estoque, parcelas, resumos
+from .precificacao import calcular_custo_real
+from .versoes import RECURSOS_POR_MODEL, registrar_escrita
+
+# Cotação fixa com que a margem dos itens (em reais) é convertida para dólar
+COTACAO_BASE_REVERSA = Decimal('5.30')
+
 class Categoria(models.Model):
     nome = models.CharField(max_length=100, unique=True)
 
     def __str__(self):
         return self.nome
 
+class ProdutoQuerySet(models.QuerySet):
+    def com_vendas(self, desde=None):
+        """
+        Preenche Produto.quantidade_vendas (unidades vendidas) na mesma consulta, em vez
+        de um aggregate por produto. Com `desde`, conta apenas pedidos a partir dessa data.
+        """
+        filtro = Q(itens_pedido__pedido__data_pedido__gte=desde) if desde else None
+        return self.annotate(quantidade_vendas=Coalesce(Sum('itens_pedido__quantidade', filter=filtro), 0))
+
+    def com_ranking_por_categoria(self):
+        # Posição de cada produto dentro da sua categoria, pelas unidades vendidas (requer com_vendas)
+        return self.annotate(posicao_categoria=Window(
+            RowNumber(), partition_by=F('categoria'), order_by=[F('quantidade_vendas').desc(), F('id').asc()]
+        ))
+
 class Produto(models.Model):
     nome = models.CharField(max_length=200)
     categoria = models.ForeignKey('Categoria', related_name='produtos', on_delete=models.SET_NULL, null=True)
     marca = models.CharField(max_length=100)
     preco_dolar = models.DecimalField(max_digits=10, decimal_places=2, help_text="Preço de custo em Dólar (U$)")
     quantidade_estoque = models.IntegerField(default=0, help_text="Quantidade disponível em estoque")
+    preco_real_custo = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, editable=False,
+        help_text="Custo atual em R$ com encargos, mantido por api.precificacao"
+    )
+
+    objects = ProdutoQuerySet.as_manager()
 
     @property
     def quantidade_vendas(self):
+        if hasattr(self, '_quantidade_vendas'):
+            return self._quantidade_vendas
         total_vendido = self.itens_pedido.aggregate(total=Sum('quantidade'))['total']
         return total_vendido or 0
 
+    @quantidade_vendas.setter
+    def quantidade_vendas(self, valor):
+        # Recebe o valor anotado por ProdutoQuerySet.com_vendas()
+        self._quantidade_vendas = valor
+
+    def save(self, *args, **kwargs):
+        self.preco_real_custo = calcular_custo_real(Decimal(str(self.preco_dolar)))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'preco_dolar' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'preco_real_custo'}
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # O estoque com que o produto é cadastrado abre o seu histórico (api.estoque)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            estoque.registrar_estoque_inicial([self])
+
+    def delete(self, *args, **kwargs):
+        # Os itens de pedido deste produto são apagados em cascata, então os totais
+        # gravados nos pedidos afetados precisam ser recalculados em seguida
+        pedido_ids = list(self.itens_pedido.values_list('pedido_id', flat=True))
+        resumos.remover_itens_do_banco(self.itens_pedido.all())
+        resultado = super().delete(*args, **kwargs)
+        for pedido in Pedido.objects.filter(id__in=pedido_ids):
+            pedido.atualizar_totais()
+        return resultado
+
     def __str__(self):
         return self.nome
 
+class ClienteQuerySet(models.QuerySet):
+    def com_totais(self):
+        """
+        Anota os totais de pedidos de cada cliente em uma única consulta agrupada.
+        Todas as anotações usam o mesmo JOIN com pedidos, então não há duplicação de linhas.
+        """
+        decimal = DecimalField(max_digits=14, decimal_places=2)
+        return self.annotate(
+            pedidos_em_aberto=Count('pedidos', filter=Q(pedidos__em_aberto=True)),
+            quantidade_pedidos=Count('pedidos'),
+            ultimo_pedido=Max('pedidos__data_pedido'),
+            total_gasto=Coalesce(Sum('pedidos__valor_total_venda'), Value(Decimal('0.00')), output_field=decimal),
+            saldo_em_aberto=Coalesce(
+                Sum('pedidos__valor_total_venda', filter=~Q(pedidos__status_pagamento='pago')),
+                Value(Decimal('0.00')), output_field=decimal
+            ),
+        )
+
 class Cliente(models.Model):
     nome_completo = models.CharField(max_length=255)
     telefone = models.CharField(max_length=20)
     endereco = models.CharField(max_length=255)
 
+    objects = ClienteQuerySet.as_manager()
+
     @property
     def total_gasto(self):
-        total_pago = sum(pedido.valor_total_venda for pedido in self.pedidos.all())
+        if hasattr(self, '_total_gasto'):
+            return self._total_gasto
+        total_pago = self.pedidos.aggregate(total=Sum('valor_total_venda'))['total']
         return total_pago or Decimal('0.00')
 
+    @total_gasto.setter
+    def total_gasto(self, valor):
+        # Recebe o valor anotado por ClienteQuerySet.com_totais()
+        self._total_gasto = valor
+
     def __str__(self):
         return self.nome_completo
 
+class PedidoQuerySet(models.QuerySet):
+    def com_itens(self, itens=True, produtos=True, vendas=True):
+        """
+        Carrega cliente, itens e produtos (já com as vendas anotadas) em um número fixo
+        de consultas, como exigido pelo PedidoSerializer aninhado. Com ?fields/?expand
+        (api.campos) as partes que não aparecem na resposta podem ser puladas.
+        """
+        queryset = self.select_related('cliente')
+        if itens:
+            queryset = queryset.prefetch_related('itens')
+        if itens and produtos:
+            produtos = Produto.objects.select_related('categoria')
+            queryset = queryset.prefetch_related(
+                Prefetch('itens__produto', queryset=produtos.com_vendas() if vendas else produtos)
+            )
+        return queryset
+
+    def abertos(self, em_aberto=True):
+        # No SQLite `filter(em_aberto=True)` vira `WHERE em_aberto`, que não usa índice;
+        # a comparação com IN vira uma busca em pedido_aberto_id_idx
+        return self.filter(em_aberto__in=[em_aberto])
+
+    def atualizar_status(self, status_pagamento=None, status_entrega=None):
+        """
+        Muda o status_pagamento e/ou o status_entrega dos pedidos com um único UPDATE, sem
+        passar por Pedido.save, e corrige ResumoPedidosDia com os mesmos pedidos agrupados
+        por dia no banco. Pedidos que passam para 'pago' têm as parcelas em aberto quitadas.
+        Precisa rodar dentro de uma transação. Devolve quantos mudaram.
+        """
+        novos = {'status_pagamento': status_pagamento, 'status_entrega': status_entrega}
+        novos = {campo: valor for campo, valor in novos.items() if valor is not None}
+        diferentes = Q()
+        for campo, valor in novos.items():
+            diferentes |= ~Q(**{campo: valor})
+        pedidos = self.filter(diferentes)
+        por_dia = resumos.status_por_dia(pedidos)
+        if status_pagamento == 'pago':
+            parcelas.quitar_parcelas(pedidos)
+        alterados = pedidos.update(**novos)
+        if alterados:
+            resumos.registrar_status(por_dia, status_pagamento, status_entrega)
+            registrar_escrita(*RECURSOS_POR_MODEL['Pedido'])
+        return alterados
+
 class Pedido(models.Model):
     STATUS_PAGAMENTO_CHOICES = [('pago', 'Pago'), ('nao_pago', 'Não Pago'), ('em_atraso', 'Em Atraso'), ('em_dia', 'Em Dia')]
     STATUS_ENTREGA_CHOICES = [('entregue', 'Entregue'), ('nao_entregue', 'Não Entregue')]
     METODO_PAGAMENTO_CHOICES = [('a_vista', 'À Vista'), ('parcelado', 'Parcelado')]
+    # Situações de pagamento que, com o pedido entregue, o tornam fechado
+    PAGAMENTOS_FINALIZADOS = ['pago', 'em_dia']
+    # Códigos aceitos, montados uma vez para validar as atualizações de status
+    CODIGOS_STATUS_PAGAMENTO = frozenset(codigo for codigo, _ in STATUS_PAGAMENTO_CHOICES)
+    CODIGOS_STATUS_ENTREGA = frozenset(codigo for codigo, _ in STATUS_ENTREGA_CHOICES)
     
     cliente = models.ForeignKey(Cliente, related_name='pedidos', on_delete=models.CASCADE)
     data_pedido = models.DateTimeField(auto_now_add=True)
@@ -52,25 +187,107 @@ class Pedido(models.Model):
     valor_servico = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, help_text="Taxa de serviço adicional para o pedido")
     produtos = models.ManyToManyField(Produto, through='PedidoProduto', related_name='pedidos')
 
+    objects = PedidoQuerySet.as_manager()
+
+    # Totais desnormalizados: mantidos por atualizar_totais() e save(), nunca editados diretamente
+    subtotal_itens = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+    lucro_itens = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+    valor_total_venda = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False, db_index=True)
+    lucro_final = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+
+    # Definição única de pedido em aberto (o oposto de status_pedido == 'fechado'), calculada
+    # pelo próprio banco a cada gravação e indexada para listagens e contagens
+    em_aberto = models.GeneratedField(
+        expression=ExpressionWrapper(
+            ~(Q(status_entrega='entregue') & Q(status_pagamento__in=PAGAMENTOS_FINALIZADOS)),
+            output_field=models.BooleanField()
+        ),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            # Listagem de pedidos: abertos primeiro, mais recentes antes
+            models.Index(fields=['-em_aberto', '-id'], name='pedido_aberto_id_idx'),
+            # Pedidos em aberto por cliente (ClienteQuerySet.com_totais)
+            models.Index(fields=['cliente', 'em_aberto'], name='pedido_cliente_aberto_idx'),
+            # Filtros por intervalo de datas (dashboard, relatórios, exportação)
+            models.Index(fields=['data_pedido'], name='pedido_data_idx'),
+        ]
+
     @property
     def status_pedido(self):
-        pagamento_finalizado = self.status_pagamento in ['pago', 'em_dia']
+        pagamento_finalizado = self.status_pagamento in self.PAGAMENTOS_FINALIZADOS
         if self.status_entrega == 'entregue' and pagamento_finalizado:
             return 'fechado'
         return 'em_aberto'
 
-    @property
-    def subtotal_itens(self):
-        return sum(item.subtotal_item for item in self.itens.all())
+    CAMPOS_TOTAIS = ['subtotal_itens', 'lucro_itens', 'valor_total_venda', 'lucro_final']
+    # Campos que determinam a contribuição do pedido em ResumoPedidosDia
+    CAMPOS_RESUMO = ['data_pedido', 'status_pagamento', 'status_entrega', 'valor_total_venda', 'lucro_final']
 
-    @property
-    def valor_total_venda(self):
-        return self.subtotal_itens + self.valor_servico
-    
-    @property
-    def lucro_final(self):
-        lucro_dos_itens = sum(item.lucro_item for item in self.itens.all())
-        return lucro_dos_itens + self.valor_servico
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Guarda o que já está somado nos resumos, para que save() grave só a diferença
+        if all(campo in instancia.__dict__ for campo in cls.CAMPOS_RESUMO):
+            instancia._resumo_gravado = resumos.contribuicao_pedido(instancia)
+        return instancia
+
+    def save(self, *args, **kwargs):
+        # Os totais finais dependem da taxa de serviço, então são sempre derivados antes de gravar
+        valor_servico = Decimal(str(self.valor_servico))
+        self.valor_total_venda = self.subtotal_itens + valor_servico
+        self.lucro_final = self.lucro_itens + valor_servico
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'valor_servico' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | set(self.CAMPOS_TOTAIS)
+
+        anterior = None
+        if not self._state.adding:
+            anterior = getattr(self, '_resumo_gravado', None) or resumos.contribuicao_gravada(self)
+        super().save(*args, **kwargs)
+        self._resumo_gravado = resumos.registrar_pedido(self, anterior)
+        if anterior is not None and not anterior[1]['pedidos_pagos'] and self.status_pagamento == 'pago':
+            # Pedido quitado: as parcelas que ainda estavam em aberto ficam pagas
+            parcelas.quitar_parcelas(Pedido.objects.filter(pk=self.pk))
+
+    def atualizar_totais(self):
+        """
+        Recalcula os totais dos itens com uma única consulta agregada e grava no pedido.
+        """
+        totais = self.itens.aggregate(subtotal=Sum(SUBTOTAL_ITEM), lucro=Sum(LUCRO_ITEM))
+        self.subtotal_itens = totais['subtotal'] or Decimal('0.00')
+        self.lucro_itens = totais['lucro'] or Decimal('0.00')
+        self.save(update_fields=self.CAMPOS_TOTAIS)
+
+# Expressões equivalentes a PedidoProduto.subtotal_item e PedidoProduto.lucro_item,
+# para que os totais possam ser somados diretamente no banco de dados.
+SUBTOTAL_ITEM = ExpressionWrapper(
+    (Coalesce(F('custo_real_item_unidade'), Value(Decimal('0.00'))) + F('margem_venda_unitaria')) * F('quantidade'),
+    output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+LUCRO_ITEM = ExpressionWrapper(
+    F('margem_venda_unitaria') * F('quantidade'),
+    output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+
+def valores_item(quantidade, margem, custo, preco_dolar=None):
+    """
+    Valores calculados de um item de pedido, usados pelas properties de PedidoProduto e
+    pelo caminho de leitura rápido (api.leitura). custo_dolar_item_total só entra quando
+    `preco_dolar` é informado.
+    """
+    valores = {
+        'subtotal_item': ((custo or Decimal('0.00')) + margem) * quantidade,
+        'lucro_item': margem * quantidade,
+        'lucro_dolar_item_total': margem / COTACAO_BASE_REVERSA * quantidade,
+    }
+    if preco_dolar is not None:
+        valores['custo_dolar_item_total'] = preco_dolar * quantidade
+    return valores
 
 class PedidoProduto(models.Model):
     pedido = models.ForeignKey('Pedido', related_name='itens', on_delete=models.CASCADE)
@@ -79,27 +296,155 @@ class PedidoProduto(models.Model):
     margem_venda_unitaria = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, help_text="Valor adicionado ao custo do produto (lucro por unidade)")
     custo_real_item_unidade = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
+    def valores(self, preco_dolar=None):
+        return valores_item(self.quantidade, self.margem_venda_unitaria, self.custo_real_item_unidade, preco_dolar)
+
     @property
     def subtotal_item(self):
-        custo_historico = self.custo_real_item_unidade or Decimal('0.00')
-        preco_final_unitario = custo_historico + self.margem_venda_unitaria
-        return preco_final_unitario * self.quantidade
+        return self.valores()['subtotal_item']
 
     @property
     def lucro_item(self):
-        return self.margem_venda_unitaria * self.quantidade
+        return self.valores()['lucro_item']
 
     @property
     def custo_dolar_item_total(self):
-        return self.produto.preco_dolar * self.quantidade
+        return self.valores(self.produto.preco_dolar)['custo_dolar_item_total']
 
     @property
     def lucro_dolar_item_total(self):
-        COTACAO_BASE_REVERSA = Decimal('5.30')
-        if COTACAO_BASE_REVERSA > 0:
-            margem_em_dolar = self.margem_venda_unitaria / COTACAO_BASE_REVERSA
-            return margem_em_dolar * self.quantidade
-        return Decimal('0.00')
+        return self.valores()['lucro_dolar_item_total']
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        campos = ('produto_id', 'quantidade', 'margem_venda_unitaria', 'custo_real_item_unidade')
+        if all(campo in instancia.__dict__ for campo in campos):
+            instancia._resumo_gravado = resumos.contribuicao_item(instancia)
+        return instancia
+
+    def save(self, *args, **kwargs):
+        anterior = None
+        if not self._state.adding:
+            anterior = getattr(self, '_resumo_gravado', None) or resumos.contribuicao_item(PedidoProduto.objects.get(pk=self.pk))
+        super().save(*args, **kwargs)
+        self._resumo_gravado = resumos.registrar_item(self, anterior)
+        self.pedido.atualizar_totais()
+
+    def delete(self, *args, **kwargs):
+        resumos.remover_itens_do_banco(PedidoProduto.objects.filter(pk=self.pk))
+        resultado = super().delete(*args, **kwargs)
+        self.pedido.atualizar_totais()
+        return resultado
+
+    class Meta:
+        unique_together = ('pedido', 'produto')
+
+class CotacaoDolar(models.Model):
+    """Histórico das cotações do dólar (com encargos) obtidas pelos provedores de api.cambio."""
+    valor = models.DecimalField(max_digits=10, decimal_places=4)
+    fonte = models.CharField(max_length=50)
+    obtida_em = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.valor} ({self.fonte})"
+
+
+class ResumoVendas(models.Model):
+    """
+    Vendas somadas por dia, categoria e marca, mantidas por api.resumos a cada gravação
+    de item. Relatórios de período leem estas linhas em vez de todo o histórico de itens.
+    """
+    dia = models.DateField()
+    # Sem categoria (produto sem categoria ou categoria apagada) é NULL. Ao apagar uma categoria
+    # as suas linhas são somadas às sem categoria (api.signals), e não apenas anuladas
+    categoria = models.ForeignKey(
+        Categoria, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False, null=True
+    )
+    marca = models.CharField(max_length=100)
+    unidades = models.IntegerField(default=0)
+    receita = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    lucro = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            # No SQLite NULLs nunca são iguais em uma restrição única; com o Coalesce a chave
+            # sem categoria também é única
+            models.UniqueConstraint(
+                F('dia'), Coalesce('categoria', Value(0)), F('marca'), name='resumo_vendas_chave_unica'
+            ),
+        ]
+
+class ResumoPedidosDia(models.Model):
+    """Quantidade de pedidos por situação e totais por dia, mantidos por api.resumos."""
+    dia = models.DateField(unique=True)
+    quantidade_pedidos = models.IntegerField(default=0)
+    pedidos_pagos = models.IntegerField(default=0)
+    pedidos_entregues = models.IntegerField(default=0)
+    pedidos_fechados = models.IntegerField(default=0)
+    valor_total_venda = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    lucro_final = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+class Parcela(models.Model):
+    """
+    Parcela de um pedido parcelado, gerada na criação do pedido (api.parcelas).
+    `em_atraso` é marcado pela varredura de `python manage.py marcar_atrasos`.
+    """
+    pedido = models.ForeignKey(Pedido, related_name='parcelas', on_delete=models.CASCADE)
+    numero = models.PositiveSmallIntegerField()
+    vencimento = models.DateField()
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    paga = models.BooleanField(default=False)
+    paga_em = models.DateField(null=True, blank=True)
+    em_atraso = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('pedido', 'numero')
+        indexes = [
+            # Só as parcelas em aberto, por vencimento: contas a receber e a varredura de atrasos
+            models.Index(fields=['vencimento'], condition=Q(paga=False), name='parcela_aberta_venc_idx'),
+        ]
+
+class MovimentoEstoque(models.Model):
+    """
+    Cada alteração de Produto.quantidade_estoque, gravada por api.estoque na mesma
+    transação. Somente inclusão: correções entram como novos movimentos de ajuste.
+    """
+    TIPO_CHOICES = [('entrada', 'Entrada'), ('venda', 'Venda'), ('ajuste', 'Ajuste'), ('estorno', 'Estorno')]
+
+    produto = models.ForeignKey(Produto, related_name='movimentos_estoque', on_delete=models.CASCADE)
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    quantidade = models.IntegerField(help_text="Variação do estoque: positiva nas entradas e estornos, negativa nas vendas")
+    # Sem restrição no banco: o movimento continua apontando para o pedido mesmo depois de ele ser apagado
+    pedido = models.ForeignKey(
+        Pedido, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True
+    )
+    observacao = models.CharField(max_length=255, blank=True)
+    criado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Cauda do razão depois de um snapshot (api.estoque.estoque_em)
+            models.Index(fields=['produto', 'criado_em'], name='movimento_produto_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.quantidade:+d} ({self.produto_id})"
+
+class SnapshotEstoque(models.Model):
+    """Estoque de cada produto em um instante, gravado por `python manage.py snapshot_estoque`."""
+    produto = models.ForeignKey(Produto, related_name='+', on_delete=models.CASCADE)
+    data = models.DateTimeField()
+    quantidade = models.IntegerField()
 
     class Meta:
-        unique_together = ('pedido', 'produto')
\ No newline at end of file
+        unique_together = ('produto', 'data')
+
+class VersaoRecurso(models.Model):
+    """Versão de cada recurso da API, incrementada a cada escrita (ver api.versoes)."""
+    recurso = models.CharField(max_length=50, unique=True)
+    versao = models.PositiveBigIntegerField(default=0)
+    atualizado_em = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.recurso} v{self.versao}"
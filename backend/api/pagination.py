@@ -0,0 +1,151 @@
+import base64
+import binascii
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) sobre a ordenação do próprio queryset.
+
+    O cursor guarda os valores de todos os campos de ordenação do último item da
+    página, e a página seguinte é buscada com um filtro "depois destes valores"
+    em vez de OFFSET, então a página N custa o mesmo que a primeira. O `id` é
+    sempre acrescentado como desempate para que a ordenação seja estável.
+    A navegação é apenas para frente, seguindo o link `next`.
+    """
+    page_size = 100
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        resultados = list(self.get_consulta_pagina(queryset, request))
+        return self.separar_pagina(resultados)
+
+    async def apaginate_queryset(self, queryset, request):
+        # Versão para as views assíncronas (api.assincrono), com o ORM assíncrono
+        resultados = [linha async for linha in self.get_consulta_pagina(queryset, request)]
+        return self.separar_pagina(resultados)
+
+    def get_consulta_pagina(self, queryset, request):
+        """O queryset da página pedida, com um item a mais para saber se há próxima."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        queryset = queryset.order_by(*[
+            F(campo).desc(nulls_last=True) if decrescente else F(campo).asc(nulls_last=True)
+            for campo, decrescente in self.ordering
+        ])
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_filtro_apos(cursor))
+        return queryset[:self.page_size + 1]
+
+    def separar_pagina(self, resultados):
+        self.has_next = len(resultados) > self.page_size
+        self.page = resultados[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        valor = request.query_params.get(self.page_size_query_param)
+        if valor and valor.isdigit() and int(valor) > 0:
+            return min(int(valor), self.max_page_size)
+        return self.page_size
+
+    def get_ordering(self, queryset):
+        """
+        Lê a ordenação do queryset (definida em get_queryset ou pelo OrderingFilter)
+        como uma lista de pares (campo, decrescente), terminando sempre no id.
+        """
+        ordering = []
+        for campo in queryset.query.order_by or queryset.model._meta.ordering:
+            if not isinstance(campo, str):
+                raise ImproperlyConfigured("KeysetPagination só aceita ordenação por nome de campo ou anotação.")
+            decrescente = campo.startswith('-')
+            campo = campo.lstrip('-')
+            ordering.append(('id' if campo == 'pk' else campo, decrescente))
+        if not any(campo == 'id' for campo, _ in ordering):
+            ordering.append(('id', False))
+        return ordering
+
+    def get_filtro_apos(self, cursor):
+        """
+        Monta a comparação lexicográfica (a, b, id) > (x, y, z) como uma combinação
+        de Q, respeitando a direção de cada campo e os nulos ordenados por último.
+        """
+        filtro = Q(pk__in=[])
+        iguais = Q()
+        for (campo, decrescente), valor in zip(self.ordering, cursor):
+            if valor is None:
+                # Nulos vêm por último: depois de um nulo só existem outros nulos
+                depois = Q(pk__in=[])
+                igual = Q(**{f'{campo}__isnull': True})
+            else:
+                depois = Q(**{f'{campo}__{"lt" if decrescente else "gt"}': valor}) | Q(**{f'{campo}__isnull': True})
+                igual = Q(**{campo: valor})
+            filtro |= iguais & depois
+            iguais &= igual
+        return filtro
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        ultimo = self.page[-1]
+        valores = [self.get_valor(ultimo, campo) for campo, _ in self.ordering]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(valores))
+
+    def get_valor(self, instancia, campo):
+        # Linhas de values() (api.leitura) trazem os campos de ordenação pelo nome
+        if isinstance(instancia, dict):
+            return instancia.get(campo)
+        for parte in campo.split('__'):
+            instancia = getattr(instancia, parte, None) if instancia is not None else None
+        return instancia
+
+    def encode_cursor(self, valores):
+        texto = json.dumps(valores, default=self.serializar_valor, separators=(',', ':'))
+        return base64.urlsafe_b64encode(texto.encode()).decode()
+
+    def serializar_valor(self, valor):
+        # Datas mantêm os microssegundos, senão a comparação no filtro do cursor não avança
+        if isinstance(valor, (datetime.datetime, datetime.date)):
+            return valor.isoformat()
+        if isinstance(valor, decimal.Decimal):
+            return str(valor)
+        raise TypeError(f"Valor não serializável no cursor: {valor!r}")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            valores = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound("Cursor inválido.")
+        if not isinstance(valores, list) or len(valores) != len(self.ordering):
+            raise NotFound("Cursor inválido.")
+        return valores
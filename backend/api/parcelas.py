@@ -0,0 +1,120 @@
+"""
+Parcelas dos pedidos parcelados e a varredura de atrasos.
+
+Cada pedido parcelado recebe, na criação, uma Parcela por mês a partir do mês
+seguinte ao pedido, no dia `dia_vencimento_parcela` (ou no dia do pedido). O valor
+total é dividido igualmente e os centavos que sobram vão para a primeira parcela.
+
+`python manage.py marcar_atrasos` (uma vez por dia) marca as parcelas vencidas e
+passa os pedidos para 'em_atraso' com UPDATEs sobre o índice das parcelas em aberto,
+sem carregar pedidos nem parcelas na memória.
+"""
+import calendar
+import datetime
+from decimal import ROUND_DOWN, Decimal
+
+from django.utils import timezone
+
+from .banco import transacao_com_repeticao
+from .versoes import registrar_escrita
+
+CENTAVO = Decimal('0.01')
+TAMANHO_LOTE = 2000
+
+
+def calcular_vencimentos(data_pedido, quantidade, dia=None):
+    dia = dia or data_pedido.day
+    vencimentos = []
+    for numero in range(1, quantidade + 1):
+        ano, mes = divmod(data_pedido.month - 1 + numero, 12)
+        ano, mes = data_pedido.year + ano, mes + 1
+        # Em meses mais curtos a parcela vence no último dia
+        vencimentos.append(datetime.date(ano, mes, min(dia, calendar.monthrange(ano, mes)[1])))
+    return vencimentos
+
+
+def gerar_parcelas(pedido):
+    """As parcelas (ainda não gravadas) de um pedido parcelado, com os totais já calculados."""
+    from .models import Parcela
+
+    quantidade = max(pedido.quantidade_parcelas, 1)
+    total = pedido.valor_total_venda
+    valor = (total / quantidade).quantize(CENTAVO, rounding=ROUND_DOWN)
+    # Pedidos já quitados têm as parcelas pagas
+    paga = pedido.status_pagamento == 'pago'
+    data = timezone.localdate(pedido.data_pedido)
+    return [
+        Parcela(
+            pedido=pedido, numero=numero, vencimento=vencimento,
+            valor=total - valor * (quantidade - 1) if numero == 1 else valor,
+            paga=paga, paga_em=data if paga else None,
+        )
+        for numero, vencimento in enumerate(calcular_vencimentos(data, quantidade, pedido.dia_vencimento_parcela), 1)
+    ]
+
+
+def criar_parcelas(pedidos):
+    """Grava as parcelas dos pedidos parcelados da lista (já salvos)."""
+    from .models import Parcela
+
+    parcelas = [parcela for pedido in pedidos if pedido.metodo_pagamento == 'parcelado' for parcela in gerar_parcelas(pedido)]
+    if parcelas:
+        Parcela.objects.bulk_create(parcelas, batch_size=TAMANHO_LOTE)
+        registrar_escrita('parcelas')
+
+
+def quitar_parcelas(pedidos, data=None):
+    """
+    Marca como pagas as parcelas em aberto de um queryset de pedidos que está passando para
+    'pago', para que a varredura não as marque em atraso. Precisa rodar na mesma transação
+    da mudança de status.
+    """
+    from .models import Parcela
+
+    quitadas = Parcela.objects.filter(pedido__in=pedidos, paga=False).update(
+        paga=True, paga_em=data or timezone.localdate(), em_atraso=False
+    )
+    if quitadas:
+        registrar_escrita('parcelas')
+    return quitadas
+
+
+@transacao_com_repeticao
+def marcar_atrasos(hoje=None):
+    """
+    Marca como em atraso as parcelas em aberto vencidas antes de `hoje` e passa para
+    'em_atraso' os pedidos com alguma delas. Pedidos já pagos ficam de fora, com as suas
+    parcelas. Devolve a quantidade de parcelas marcadas e de pedidos alterados.
+    """
+    from .models import Parcela, Pedido
+
+    hoje = hoje or timezone.localdate()
+    vencidas = Parcela.objects.filter(paga=False, vencimento__lt=hoje).exclude(pedido__status_pagamento='pago')
+    parcelas = vencidas.filter(em_atraso=False).update(em_atraso=True)
+    pedidos = Pedido.objects.filter(id__in=vencidas.values('pedido_id'))
+    alterados = pedidos.atualizar_status(status_pagamento='em_atraso')
+    if parcelas:
+        registrar_escrita('parcelas')
+    return parcelas, alterados
+
+
+@transacao_com_repeticao
+def pagar_parcela(parcela, data=None):
+    """
+    Registra o pagamento da parcela e atualiza o status do pedido: 'pago' sem parcelas em
+    aberto, 'em_atraso' se ainda houver alguma vencida e 'em_dia' nos outros casos.
+    """
+    from .models import Pedido
+
+    hoje = timezone.localdate()
+    parcela.paga, parcela.paga_em, parcela.em_atraso = True, data or hoje, False
+    parcela.save(update_fields=['paga', 'paga_em', 'em_atraso'])
+
+    abertas = parcela.pedido.parcelas.filter(paga=False)
+    if not abertas.exists():
+        status = 'pago'
+    elif abertas.filter(vencimento__lt=hoje).exists():
+        status = 'em_atraso'
+    else:
+        status = 'em_dia'
+    Pedido.objects.filter(pk=parcela.pedido_id).atualizar_status(status_pagamento=status)
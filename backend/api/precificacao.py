@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from .utils import get_cotacao_dolar_com_encargos
+from .versoes import RECURSOS_POR_MODEL, registrar_escrita
+
+# Quantidade de produtos gravados por UPDATE no recálculo do catálogo
+TAMANHO_LOTE = 500
+
+
+def get_fator_florida():
+    # Imposto da Flórida aplicado sobre o custo em reais (6,5% por padrão)
+    return 1 + Decimal(str(getattr(settings, 'TAXA_FLORIDA_PERCENTUAL', '0.065')))
+
+
+def calcular_custo_real(preco_dolar, cotacao=None, fator_florida=None):
+    """
+    Custo unitário em reais de um produto: preço em dólar x cotação com encargos x
+    imposto da Flórida, arredondado em centavos. É a única implementação da fórmula.
+    """
+    if cotacao is None:
+        cotacao = get_cotacao_dolar_com_encargos()
+    if fator_florida is None:
+        fator_florida = get_fator_florida()
+    custo_base_reais = preco_dolar * cotacao
+    return (custo_base_reais * fator_florida).quantize(Decimal('0.01'))
+
+
+def recalcular_custos_catalogo(cotacao=None):
+    """
+    Regrava Produto.preco_real_custo de todo o catálogo com a cotação informada (ou a atual).
+    O arredondamento é feito em Decimal, como em calcular_custo_real, e as gravações são
+    agrupadas em bulk_update dentro de uma única transação. Devolve a quantidade alterada.
+    """
+    from .models import Produto
+
+    if cotacao is None:
+        cotacao = get_cotacao_dolar_com_encargos()
+    fator_florida = get_fator_florida()
+
+    # Produtos com o mesmo preço em dólar compartilham o mesmo custo calculado
+    custos = {}
+    alterados = []
+    for produto in Produto.objects.only('id', 'preco_dolar', 'preco_real_custo').iterator(chunk_size=2000):
+        if produto.preco_dolar not in custos:
+            custos[produto.preco_dolar] = calcular_custo_real(produto.preco_dolar, cotacao, fator_florida)
+        if produto.preco_real_custo != custos[produto.preco_dolar]:
+            produto.preco_real_custo = custos[produto.preco_dolar]
+            alterados.append(produto)
+
+    with transaction.atomic():
+        Produto.objects.bulk_update(alterados, ['preco_real_custo'], batch_size=TAMANHO_LOTE)
+        if alterados:
+            registrar_escrita(*RECURSOS_POR_MODEL['Produto'])
+    return len(alterados)
@@ -0,0 +1,45 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metricas import medir_render
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele o renderer se comporta como o do DRF
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """
+    JSONRenderer que serializa com orjson quando ele está instalado.
+
+    Datas e decimais passam pelo mesmo encoder do DRF (datas com 'Z', Decimal como
+    número), então a saída é a mesma do JSONRenderer, só que gerada bem mais rápido.
+    Respostas indentadas (API navegável, ?indent) continuam com o renderer do DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with medir_render():
+            return self.gerar(data, accepted_media_type, renderer_context)
+
+    def gerar(self, data, accepted_media_type, renderer_context):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        conteudo = orjson.dumps(data, default=_encoder.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        # Como o DRF, escapa os separadores de linha U+2028/U+2029, inválidos em JavaScript
+        if b'\xe2\x80\xa8' in conteudo or b'\xe2\x80\xa9' in conteudo:
+            conteudo = conteudo.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return conteudo
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Texto já montado no formato de exposição do Prometheus (api.metricas)."""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data.encode(self.charset)
@@ -0,0 +1,244 @@
+"""
+Manutenção incremental dos resumos de vendas (ResumoVendas e ResumoPedidosDia).
+
+Cada gravação de pedido ou item soma nos resumos apenas a diferença entre o que já
+estava contabilizado e o novo estado, com UPDATEs do tipo `campo = campo + delta`.
+Mudanças de status em massa (PedidoQuerySet.atualizar_status) corrigem os resumos
+com status_por_dia/registrar_status. Outros caminhos que gravam em massa sem passar
+por save()/delete() (queryset.update, bulk_update, alterar a categoria ou a marca de um produto já vendido) deixam os
+resumos desatualizados; nesses casos rode `python manage.py reconstruir_resumos`.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .versoes import registrar_escrita
+
+CAMPOS_ITEM = ['unidades', 'receita', 'lucro']
+CAMPOS_PEDIDO = [
+    'quantidade_pedidos', 'pedidos_pagos', 'pedidos_entregues', 'pedidos_fechados',
+    'valor_total_venda', 'lucro_final',
+]
+
+
+def dia_do_pedido(pedido):
+    return timezone.localdate(pedido.data_pedido)
+
+
+def _acumular(model, chaves, deltas):
+    # Soma os deltas na linha da chave, criando-a zerada na primeira venda. O ignore_conflicts
+    # cobre a corrida em que outra transação cria a mesma linha entre os dois comandos; isso
+    # depende de uma restrição única que valha também para chaves NULL (veja ResumoVendas).
+    deltas = {campo: valor for campo, valor in deltas.items() if valor}
+    if not deltas:
+        return
+    atualizacao = {campo: F(campo) + valor for campo, valor in deltas.items()}
+    if model.objects.filter(**chaves).update(**atualizacao):
+        return
+    model.objects.bulk_create([model(**chaves)], ignore_conflicts=True)
+    model.objects.filter(**chaves).update(**atualizacao)
+
+
+def contribuicao_pedido(pedido):
+    """O que um pedido soma em ResumoPedidosDia, no estado atual da instância."""
+    return dia_do_pedido(pedido), {
+        'quantidade_pedidos': 1,
+        'pedidos_pagos': int(pedido.status_pagamento == 'pago'),
+        'pedidos_entregues': int(pedido.status_entrega == 'entregue'),
+        'pedidos_fechados': int(pedido.status_pedido == 'fechado'),
+        'valor_total_venda': pedido.valor_total_venda,
+        'lucro_final': pedido.lucro_final,
+    }
+
+
+def registrar_pedido(pedido, anterior=None, sinal=1):
+    """
+    Soma em ResumoPedidosDia a diferença entre a contribuição `anterior` (None para um
+    pedido novo) e a atual. Com sinal=-1 remove a contribuição atual. Devolve a atual.
+    """
+    from .models import ResumoPedidosDia
+
+    dia, atual = contribuicao_pedido(pedido)
+    deltas = {campo: sinal * valor for campo, valor in atual.items()}
+    if anterior is not None:
+        for campo, valor in anterior[1].items():
+            deltas[campo] -= valor
+    _acumular(ResumoPedidosDia, {'dia': dia}, deltas)
+    return dia, atual
+
+
+def status_por_dia(pedidos):
+    """
+    Conta os pedidos do queryset por dia e por situação, no estado atual. Deve ser lido
+    antes de um UPDATE de status e passado depois para registrar_status.
+    """
+    from .models import Pedido
+
+    finalizados = Q(status_pagamento__in=Pedido.PAGAMENTOS_FINALIZADOS)
+    return list(pedidos.annotate(dia=TruncDate('data_pedido')).values('dia').order_by().annotate(
+        quantidade=Count('id'),
+        pagos=Count('id', filter=Q(status_pagamento='pago')),
+        entregues=Count('id', filter=Q(status_entrega='entregue')),
+        finalizados=Count('id', filter=finalizados),
+        fechados=Count('id', filter=Q(em_aberto=False)),
+    ))
+
+
+def registrar_status(por_dia, status_pagamento=None, status_entrega=None):
+    """
+    Corrige ResumoPedidosDia depois que os pedidos contados em `por_dia` (status_por_dia)
+    passaram para os novos status com um UPDATE, sem passar por Pedido.save. Todos os
+    dias são corrigidos em um único UPDATE; as linhas já existem, porque cada um desses
+    pedidos foi somado em quantidade_pedidos quando foi criado.
+    """
+    from .models import Pedido, ResumoPedidosDia
+
+    pagamento_finalizado = status_pagamento in Pedido.PAGAMENTOS_FINALIZADOS
+    deltas = {'pedidos_pagos': {}, 'pedidos_entregues': {}, 'pedidos_fechados': {}}
+    for linha in por_dia:
+        quantidade = linha['quantidade']
+        pagos, entregues = linha['pagos'], linha['entregues']
+        if status_pagamento is not None:
+            pagos = quantidade if status_pagamento == 'pago' else 0
+        if status_entrega is not None:
+            entregues = quantidade if status_entrega == 'entregue' else 0
+        # Fechado é entregue e com o pagamento finalizado (Pedido.em_aberto)
+        if status_pagamento is not None and status_entrega is not None:
+            fechados = quantidade if pagamento_finalizado and status_entrega == 'entregue' else 0
+        elif status_pagamento is not None:
+            fechados = linha['entregues'] if pagamento_finalizado else 0
+        else:
+            fechados = linha['finalizados'] if status_entrega == 'entregue' else 0
+        for campo, valor in [('pedidos_pagos', pagos - linha['pagos']),
+                             ('pedidos_entregues', entregues - linha['entregues']),
+                             ('pedidos_fechados', fechados - linha['fechados'])]:
+            if valor:
+                deltas[campo][linha['dia']] = valor
+
+    atualizacao = {
+        campo: Case(*[When(dia=dia, then=F(campo) + valor) for dia, valor in por_dia_campo.items()], default=F(campo))
+        for campo, por_dia_campo in deltas.items() if por_dia_campo
+    }
+    if atualizacao:
+        dias = {dia for por_dia_campo in deltas.values() for dia in por_dia_campo}
+        ResumoPedidosDia.objects.filter(dia__in=dias).update(**atualizacao)
+
+
+def contribuicao_gravada(pedido):
+    # Usada quando a instância foi carregada sem os campos do resumo (only/defer)
+    from .models import Pedido
+
+    gravado = Pedido.objects.only(*Pedido.CAMPOS_RESUMO).get(pk=pedido.pk)
+    return contribuicao_pedido(gravado)
+
+
+def _aplicar_itens(linhas):
+    """
+    Agrupa linhas (dia, categoria_id, marca, unidades, receita, lucro) por chave e soma
+    cada grupo em ResumoVendas com um UPDATE por chave.
+    """
+    from .models import ResumoVendas
+
+    deltas = defaultdict(lambda: [0, Decimal('0.00'), Decimal('0.00')])
+    for dia, categoria_id, marca, unidades, receita, lucro in linhas:
+        soma = deltas[(dia, categoria_id, marca)]
+        soma[0] += unidades
+        soma[1] += receita
+        soma[2] += lucro
+    for (dia, categoria_id, marca), valores in deltas.items():
+        _acumular(
+            ResumoVendas, {'dia': dia, 'categoria_id': categoria_id, 'marca': marca},
+            dict(zip(CAMPOS_ITEM, valores))
+        )
+
+
+def contribuicao_item(item):
+    return item.produto_id, item.quantidade, item.subtotal_item, item.lucro_item
+
+
+def registrar_itens(pedido, itens, sinal=1):
+    """Soma (ou remove, com sinal=-1) itens em memória, com os produtos já carregados."""
+    dia = dia_do_pedido(pedido)
+    _aplicar_itens(
+        (dia, item.produto.categoria_id, item.produto.marca,
+         sinal * item.quantidade, sinal * item.subtotal_item, sinal * item.lucro_item)
+        for item in itens
+    )
+
+
+def registrar_item(item, anterior=None):
+    """
+    Soma em ResumoVendas a diferença entre a contribuição `anterior` do item (None para
+    um item novo) e a atual. Devolve a atual, para a próxima gravação.
+    """
+    linhas = []
+    dia = dia_do_pedido(item.pedido)
+    if anterior is not None:
+        produto_id, quantidade, subtotal, lucro = anterior
+        if produto_id == item.produto_id:
+            categoria_id, marca = item.produto.categoria_id, item.produto.marca
+        else:
+            from .models import Produto
+            categoria_id, marca = Produto.objects.values_list('categoria_id', 'marca').get(pk=produto_id)
+        linhas.append((dia, categoria_id, marca, -quantidade, -subtotal, -lucro))
+    linhas.append((dia, item.produto.categoria_id, item.produto.marca,
+                   item.quantidade, item.subtotal_item, item.lucro_item))
+    _aplicar_itens(linhas)
+    return contribuicao_item(item)
+
+
+def remover_itens_do_banco(itens):
+    """Remove de ResumoVendas os itens de um queryset, agrupados no próprio banco."""
+    from .models import SUBTOTAL_ITEM, LUCRO_ITEM
+
+    agrupados = itens.annotate(dia=TruncDate('pedido__data_pedido')).values_list(
+        'dia', 'produto__categoria_id', 'produto__marca'
+    ).order_by().annotate(unidades=Sum('quantidade'), receita=Sum(SUBTOTAL_ITEM), lucro=Sum(LUCRO_ITEM))
+    _aplicar_itens(
+        (dia, categoria_id, marca, -unidades, -receita, -lucro)
+        for dia, categoria_id, marca, unidades, receita, lucro in agrupados
+    )
+
+
+def remover_categoria(categoria_id):
+    """
+    Soma as vendas de uma categoria que vai ser apagada nas linhas sem categoria, como
+    acontece com os produtos dela (SET_NULL), e apaga as linhas da categoria.
+    """
+    from .models import ResumoVendas
+
+    linhas = ResumoVendas.objects.filter(categoria_id=categoria_id)
+    _aplicar_itens(
+        (dia, None, marca, unidades, receita, lucro)
+        for dia, marca, unidades, receita, lucro in linhas.values_list('dia', 'marca', 'unidades', 'receita', 'lucro')
+    )
+    linhas.delete()
+
+
+def reconstruir_resumos():
+    """Apaga e recalcula todos os resumos a partir dos pedidos, em uma única transação."""
+    from .models import Pedido, PedidoProduto, ResumoVendas, ResumoPedidosDia, SUBTOTAL_ITEM, LUCRO_ITEM
+
+    vendas = PedidoProduto.objects.annotate(dia=TruncDate('pedido__data_pedido')).values(
+        'dia', categoria_id=F('produto__categoria_id'), marca=F('produto__marca')
+    ).order_by().annotate(unidades=Sum('quantidade'), receita=Sum(SUBTOTAL_ITEM), lucro=Sum(LUCRO_ITEM))
+
+    pedidos = Pedido.objects.annotate(dia=TruncDate('data_pedido')).values('dia').order_by().annotate(
+        quantidade_pedidos=Count('id'),
+        pedidos_pagos=Count('id', filter=Q(status_pagamento='pago')),
+        pedidos_entregues=Count('id', filter=Q(status_entrega='entregue')),
+        pedidos_fechados=Count('id', filter=Q(em_aberto=False)),
+        valor_total_venda=Sum('valor_total_venda'),
+        lucro_final=Sum('lucro_final'),
+    )
+
+    with transaction.atomic():
+        ResumoVendas.objects.all().delete()
+        ResumoPedidosDia.objects.all().delete()
+        ResumoVendas.objects.bulk_create([ResumoVendas(**linha) for linha in vendas], batch_size=1000)
+        ResumoPedidosDia.objects.bulk_create([ResumoPedidosDia(**linha) for linha in pedidos], batch_size=1000)
+        registrar_escrita('relatorios')
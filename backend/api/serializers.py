@@ -1,19 +1,26 @@
 from rest_framework import serializers
 from django.db import transaction
-from django.db.models import F
+from django.db.models import Case, F, Q, When
 from decimal import Decimal
 
 # Importa os modelos e a função utilitária
-from .models import Categoria, Produto, Cliente, Pedido, PedidoProduto
+from .models import Categoria, Produto, Cliente, Pedido, PedidoProduto, CotacaoDolar, MovimentoEstoque, Parcela
 from .utils import get_cotacao_dolar_com_encargos
+from .precificacao import calcular_custo_real
+from .campos import CamposSelecionaveisMixin
+from .metricas import SerializacaoMedidaMixin
+from .banco import transacao_com_repeticao
+from . import estoque, parcelas, resumos
 
-class CategoriaSerializer(serializers.ModelSerializer):
+class CategoriaSerializer(SerializacaoMedidaMixin, CamposSelecionaveisMixin, serializers.ModelSerializer):
     class Meta:
         model = Categoria
         fields = ['id', 'nome']
 
-class ProdutoSerializer(serializers.ModelSerializer):
+class ProdutoSerializer(SerializacaoMedidaMixin, CamposSelecionaveisMixin, serializers.ModelSerializer):
     quantidade_vendas = serializers.IntegerField(read_only=True)
+    # Presente apenas na listagem com ?top=N (ranking dentro da categoria)
+    posicao_categoria = serializers.IntegerField(read_only=True)
     categoria = serializers.CharField(source='categoria.nome', read_only=True)
     categoria_id = serializers.IntegerField(write_only=True)
     adicionar_estoque = serializers.IntegerField(write_only=True, required=False, default=0, min_value=0)
@@ -25,7 +32,7 @@ class ProdutoSerializer(serializers.ModelSerializer):
         model = Produto
         fields = [
             'id', 'nome', 'categoria', 'marca', 'preco_dolar', 
-            'quantidade_vendas', 'quantidade_estoque', 
+            'quantidade_vendas', 'posicao_categoria', 'quantidade_estoque', 
             'categoria_id', 'adicionar_estoque',
             'preco_real_custo_atual'
         ]
@@ -33,17 +40,12 @@ class ProdutoSerializer(serializers.ModelSerializer):
     
     def get_preco_real_custo_atual(self, obj):
         """
-        Calcula o custo em tempo real para exibição na lista de produtos,
-        incluindo todos os encargos e taxas.
+        Custo em reais, com todos os encargos e taxas, para exibição na lista de produtos.
+        Vem da coluna mantida por api.precificacao; só é calculado se ainda não foi gravado.
         """
-        cotacao_do_dia_com_encargos = get_cotacao_dolar_com_encargos()
-        
-        TAXA_FLORIDA_PERCENTUAL = Decimal('0.065')
-        FATOR_FLORIDA = 1 + TAXA_FLORIDA_PERCENTUAL
-        
-        custo_base_reais = obj.preco_dolar * cotacao_do_dia_com_encargos
-        custo_final_com_taxa = (custo_base_reais * FATOR_FLORIDA).quantize(Decimal('0.01'))
-        return custo_final_com_taxa
+        if obj.preco_real_custo is not None:
+            return obj.preco_real_custo
+        return calcular_custo_real(obj.preco_dolar)
 
     def create(self, validated_data):
         validated_data.pop('adicionar_estoque', None)
@@ -68,17 +70,22 @@ class ProdutoSerializer(serializers.ModelSerializer):
             categoria_instance = Categoria.objects.get(id=validated_data['categoria_id'])
             instance.categoria = categoria_instance
 
-        instance.save()
+        with transaction.atomic():
+            instance.save()
+            # A reposição entra no histórico do estoque na mesma transação (api.estoque)
+            estoque.registrar_movimentos([
+                MovimentoEstoque(produto=instance, tipo='entrada', quantidade=quantidade_a_adicionar)
+            ])
         instance.refresh_from_db()
         return instance
 
-class PedidoProdutoCreateSerializer(serializers.ModelSerializer):
+class PedidoProdutoCreateSerializer(SerializacaoMedidaMixin, serializers.ModelSerializer):
     produto_id = serializers.IntegerField()
     class Meta:
         model = PedidoProduto
         fields = ['produto_id', 'quantidade', 'margem_venda_unitaria']
 
-class PedidoCreateSerializer(serializers.ModelSerializer):
+class PedidoCreateSerializer(SerializacaoMedidaMixin, serializers.ModelSerializer):
     itens = PedidoProdutoCreateSerializer(many=True)
     cliente_id = serializers.IntegerField(write_only=True, required=True)
 
@@ -89,51 +96,98 @@ class PedidoCreateSerializer(serializers.ModelSerializer):
             'dia_vencimento_parcela', 'status_pagamento', 'valor_servico', 'itens'
         ]
 
+    def validate_itens(self, itens):
+        if not itens:
+            raise serializers.ValidationError("O pedido precisa ter pelo menos um item.")
+        produto_ids = [item['produto_id'] for item in itens]
+        if len(produto_ids) != len(set(produto_ids)):
+            raise serializers.ValidationError("Cada produto pode aparecer apenas uma vez no pedido.")
+        return itens
+
+    @transacao_com_repeticao
     def create(self, validated_data):
+        # Roda em uma transação refeita se o banco estiver bloqueado (api.banco), por isso
+        # os dados validados são copiados em vez de alterados
+        validated_data = dict(validated_data)
         itens_data = validated_data.pop('itens')
         cliente_id = validated_data.pop('cliente_id')
-        
+        quantidades = {item['produto_id']: item['quantidade'] for item in itens_data}
+
         try:
-            with transaction.atomic():
-                for item_data in itens_data:
-                    produto = Produto.objects.get(id=item_data['produto_id'])
-                    if produto.quantidade_estoque < item_data['quantidade']:
-                        # Retorna a mensagem de erro específica para o frontend
-                        raise serializers.ValidationError(
-                            f"Estoque insuficiente para '{produto.nome}'. "
-                            f"Disponível: {produto.quantidade_estoque}, Solicitado: {item_data['quantidade']}."
-                        )
-
-                cliente_instance = Cliente.objects.get(id=cliente_id)
-                pedido = Pedido.objects.create(cliente=cliente_instance, **validated_data)
-                
-                cotacao_do_dia_com_encargos = get_cotacao_dolar_com_encargos()
-                
-                for item_data in itens_data:
-                    produto_instance = Produto.objects.get(id=item_data.pop('produto_id'))
-                    
-                    produto_instance.quantidade_estoque -= item_data['quantidade']
-                    produto_instance.save()
-                    
-                    TAXA_FLORIDA_PERCENTUAL = Decimal('0.065')
-                    FATOR_FLORIDA = 1 + TAXA_FLORIDA_PERCENTUAL
-                    
-                    custo_base_reais = produto_instance.preco_dolar * cotacao_do_dia_com_encargos
-                    custo_final_com_taxa = (custo_base_reais * FATOR_FLORIDA).quantize(Decimal('0.01'))
-                    
-                    PedidoProduto.objects.create(
-                        pedido=pedido, 
-                        produto=produto_instance, 
-                        custo_real_item_unidade=custo_final_com_taxa,
-                        **item_data
+            # Busca (e bloqueia) todos os produtos do pedido em uma única consulta
+            produtos = Produto.objects.select_for_update().in_bulk(list(quantidades))
+            if len(produtos) != len(quantidades):
+                raise Produto.DoesNotExist
+            for produto_id, quantidade in quantidades.items():
+                produto = produtos[produto_id]
+                if produto.quantidade_estoque < quantidade:
+                    # Retorna a mensagem de erro específica para o frontend
+                    raise serializers.ValidationError(
+                        f"Estoque insuficiente para '{produto.nome}'. "
+                        f"Disponível: {produto.quantidade_estoque}, Solicitado: {quantidade}."
                     )
+
+            # Baixa o estoque de todos os produtos em um único UPDATE condicional: uma linha
+            # só é alterada se ainda tiver estoque suficiente no momento da escrita
+            filtro_estoque = Q()
+            for produto_id, quantidade in quantidades.items():
+                filtro_estoque |= Q(id=produto_id, quantidade_estoque__gte=quantidade)
+            atualizados = Produto.objects.filter(filtro_estoque).update(quantidade_estoque=Case(
+                *[When(id=produto_id, then=F('quantidade_estoque') - quantidade) for produto_id, quantidade in quantidades.items()],
+                default=F('quantidade_estoque')
+            ))
+            if atualizados != len(quantidades):
+                raise serializers.ValidationError(
+                    "O estoque de um dos produtos foi alterado por outro pedido. Tente novamente."
+                )
+
+            cliente_instance = Cliente.objects.get(id=cliente_id)
+            pedido = Pedido(cliente=cliente_instance, **validated_data)
+
+            cotacao_do_dia_com_encargos = get_cotacao_dolar_com_encargos()
+
+            itens = []
+            for item_data in itens_data:
+                item_data = dict(item_data)
+                produto_instance = produtos[item_data.pop('produto_id')]
+                custo_final_com_taxa = calcular_custo_real(produto_instance.preco_dolar, cotacao_do_dia_com_encargos)
+                itens.append(PedidoProduto(
+                    pedido=pedido,
+                    produto=produto_instance,
+                    custo_real_item_unidade=custo_final_com_taxa,
+                    **item_data
+                ))
+
+            # Os totais são calculados a partir dos itens em memória, sem reler o banco
+            pedido.subtotal_itens = sum((item.subtotal_item for item in itens), Decimal('0.00'))
+            pedido.lucro_itens = sum((item.lucro_item for item in itens), Decimal('0.00'))
+            pedido.save()
+            PedidoProduto.objects.bulk_create(itens)
+            # bulk_create não passa por PedidoProduto.save, então os resumos são somados aqui
+            resumos.registrar_itens(pedido, itens)
+            estoque.registrar_movimentos([
+                MovimentoEstoque(produto_id=produto_id, tipo='venda', quantidade=-quantidade, pedido=pedido)
+                for produto_id, quantidade in quantidades.items()
+            ])
+            parcelas.criar_parcelas([pedido])
             return pedido
         except Cliente.DoesNotExist:
             raise serializers.ValidationError({"cliente_id": f"Cliente com ID {cliente_id} não encontrado."})
         except Produto.DoesNotExist:
             raise serializers.ValidationError({"produto_id": "Um dos produtos do pedido não foi encontrado."})
 
-class PedidoProdutoSerializer(serializers.ModelSerializer):
+class AtualizacaoStatusEmMassaSerializer(SerializacaoMedidaMixin, serializers.Serializer):
+    # Entrada de PATCH /api/pedidos/atualizar-status/: os pedidos e os novos status
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+    status_pagamento = serializers.ChoiceField(choices=Pedido.STATUS_PAGAMENTO_CHOICES, required=False)
+    status_entrega = serializers.ChoiceField(choices=Pedido.STATUS_ENTREGA_CHOICES, required=False)
+
+    def validate(self, dados):
+        if 'status_pagamento' not in dados and 'status_entrega' not in dados:
+            raise serializers.ValidationError("Informe status_pagamento e/ou status_entrega.")
+        return dados
+
+class PedidoProdutoSerializer(SerializacaoMedidaMixin, CamposSelecionaveisMixin, serializers.ModelSerializer):
     produto = ProdutoSerializer(read_only=True)
     lucro_item = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     subtotal_item = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
@@ -147,7 +201,7 @@ class PedidoProdutoSerializer(serializers.ModelSerializer):
             'custo_dolar_item_total', 'lucro_dolar_item_total'
         ]
 
-class PedidoSerializer(serializers.ModelSerializer):
+class PedidoSerializer(SerializacaoMedidaMixin, CamposSelecionaveisMixin, serializers.ModelSerializer):
     itens = PedidoProdutoSerializer(many=True, read_only=True)
     status_pedido = serializers.CharField(read_only=True)
     lucro_final = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
@@ -164,15 +218,40 @@ class PedidoSerializer(serializers.ModelSerializer):
             'valor_total_venda', 'lucro_final', 'itens'
         ]
 
-class ClienteListSerializer(serializers.ModelSerializer):
+class ClienteListSerializer(SerializacaoMedidaMixin, CamposSelecionaveisMixin, serializers.ModelSerializer):
     total_gasto = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    # Campos anotados por ClienteQuerySet.com_totais(); omitidos quando o cliente acabou de ser criado
+    quantidade_pedidos = serializers.IntegerField(read_only=True)
+    pedidos_em_aberto = serializers.IntegerField(read_only=True)
+    ultimo_pedido = serializers.DateTimeField(read_only=True)
+    saldo_em_aberto = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
     class Meta:
         model = Cliente
-        fields = ['id', 'nome_completo', 'telefone', 'endereco', 'total_gasto']
+        fields = [
+            'id', 'nome_completo', 'telefone', 'endereco', 'total_gasto',
+            'quantidade_pedidos', 'pedidos_em_aberto', 'ultimo_pedido', 'saldo_em_aberto'
+        ]
 
-class ClienteDetailSerializer(serializers.ModelSerializer):
+class ClienteDetailSerializer(SerializacaoMedidaMixin, CamposSelecionaveisMixin, serializers.ModelSerializer):
     total_gasto = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
     pedidos = PedidoSerializer(many=True, read_only=True)
     class Meta:
         model = Cliente
-        fields = ['id', 'nome_completo', 'telefone', 'endereco', 'total_gasto', 'pedidos']
\ No newline at end of file
+        fields = ['id', 'nome_completo', 'telefone', 'endereco', 'total_gasto', 'pedidos']
+
+class CotacaoDolarSerializer(SerializacaoMedidaMixin, CamposSelecionaveisMixin, serializers.ModelSerializer):
+    class Meta:
+        model = CotacaoDolar
+        fields = ['id', 'valor', 'fonte', 'obtida_em']
+
+class MovimentoEstoqueSerializer(SerializacaoMedidaMixin, serializers.ModelSerializer):
+    class Meta:
+        model = MovimentoEstoque
+        fields = ['id', 'tipo', 'quantidade', 'pedido', 'observacao', 'criado_em']
+
+class ParcelaSerializer(SerializacaoMedidaMixin, CamposSelecionaveisMixin, serializers.ModelSerializer):
+    cliente = serializers.CharField(source='pedido.cliente.nome_completo', read_only=True)
+
+    class Meta:
+        model = Parcela
+        fields = ['id', 'pedido', 'cliente', 'numero', 'vencimento', 'valor', 'paga', 'paga_em', 'em_atraso']
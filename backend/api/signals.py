@@ -0,0 +1,50 @@
+from django.apps import apps
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import estoque, resumos
+from .banco import configurar_sqlite
+from .metricas import instalar_medicao
+from .cambio import cotacao_alterada
+from .models import Categoria, Pedido
+from .precificacao import recalcular_custos_catalogo
+from .versoes import RECURSOS_POR_MODEL, registrar_escrita
+
+
+connection_created.connect(configurar_sqlite, dispatch_uid='configurar_sqlite')
+connection_created.connect(instalar_medicao, dispatch_uid='instalar_medicao')
+
+
+@receiver(cotacao_alterada)
+def recalcular_custos_ao_mudar_cotacao(sender, valor, **kwargs):
+    # Chamado pela thread que atualiza a cotação, fora do caminho das requisições
+    recalcular_custos_catalogo(cotacao=valor)
+
+
+@receiver(pre_delete, sender=Categoria)
+def mover_categoria_nos_resumos(sender, instance, **kwargs):
+    resumos.remover_categoria(instance.pk)
+
+
+@receiver(pre_delete, sender=Pedido)
+def remover_pedido_dos_resumos(sender, instance, **kwargs):
+    # pre_delete também é enviado quando o pedido é apagado em cascata (ex.: com o cliente)
+    resumos.remover_itens_do_banco(instance.itens.all())
+    resumos.registrar_pedido(instance, sinal=-1)
+
+
+@receiver(pre_delete, sender=Pedido)
+def estornar_estoque_do_pedido(sender, instance, **kwargs):
+    # O pedido apagado deixa de ser uma venda, como nos resumos: os itens voltam ao estoque
+    estoque.estornar_pedido(instance)
+
+
+def registrar_escrita_do_model(sender, **kwargs):
+    registrar_escrita(*RECURSOS_POR_MODEL[sender.__name__])
+
+
+for nome_model in RECURSOS_POR_MODEL:
+    model = apps.get_model('api', nome_model)
+    post_save.connect(registrar_escrita_do_model, sender=model, dispatch_uid=f'versao_{nome_model}_save')
+    post_delete.connect(registrar_escrita_do_model, sender=model, dispatch_uid=f'versao_{nome_model}_delete')
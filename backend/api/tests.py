@@ -1,3 +1,1120 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import requests
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.db.models import F, Sum
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from . import estoque
+from .cambio import CacheCotacao, ProvedorCotacao, cotacao_alterada, redefinir_cache
+from .banco import transacao_com_repeticao
+from .campos import Selecao
+from .metricas import Medicao, _medicao_atual, medir_serializacao, registro as registro_metricas
+from .parcelas import calcular_vencimentos, marcar_atrasos
+from .models import (
+    Categoria, Produto, Cliente, Pedido, PedidoProduto, ResumoVendas, ResumoPedidosDia, MovimentoEstoque, SnapshotEstoque,
+    CotacaoDolar
+)
+from .precificacao import calcular_custo_real
+from .resumos import reconstruir_resumos
+from .serializers import PedidoCreateSerializer, PedidoSerializer, ProdutoSerializer
+from .utils import get_cotacao_dolar_com_encargos
+
+
+def criar_dados(quantidade_clientes=1, pedidos_por_cliente=2, itens_por_pedido=3, cliente=None):
+    """
+    Popula o banco com clientes, produtos e pedidos suficientes para que qualquer
+    consulta feita por item ou por pedido apareça na contagem de queries.
+    Quando `cliente` é informado, todos os pedidos são criados para ele.
+    """
+    categoria = Categoria.objects.create(nome=f'Categoria {Categoria.objects.count()}')
+    produtos = [
+        Produto.objects.create(
+            nome=f'Produto {i}', categoria=categoria, marca='Marca',
+            preco_dolar=Decimal('10.00'), quantidade_estoque=1000
+        )
+        for i in range(itens_por_pedido + 2)
+    ]
+    for c in range(quantidade_clientes):
+        if cliente is None or c > 0:
+            cliente = Cliente.objects.create(nome_completo=f'Cliente {c}', telefone='11999999999', endereco='Rua A')
+        for p in range(pedidos_por_cliente):
+            pedido = Pedido.objects.create(
+                cliente=cliente, metodo_pagamento='a_vista', status_pagamento='pago',
+                status_entrega='entregue' if p % 2 else 'nao_entregue'
+            )
+            for produto in produtos[:itens_por_pedido]:
+                PedidoProduto.objects.create(
+                    pedido=pedido, produto=produto, quantidade=2,
+                    margem_venda_unitaria=Decimal('5.00'), custo_real_item_unidade=Decimal('62.84')
+                )
+
+
+class OrcamentoDeConsultasTests(APITestCase):
+    """
+    Garante que as listagens e detalhes rodam em um número fixo de consultas,
+    independentemente de quantos pedidos, itens ou produtos existam.
+    """
+
+    def contar_consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        # Desconta a leitura da versão do recurso, feita em todo GET para o ETag (api.versoes)
+        return len(consultas) - 1
+
+    def assertConsultasConstantes(self, url, maximo):
+        criar_dados(quantidade_clientes=2)
+        consultas_poucos_dados = self.contar_consultas(url)
+        criar_dados(quantidade_clientes=10)
+        consultas_muitos_dados = self.contar_consultas(url)
+        self.assertEqual(consultas_poucos_dados, consultas_muitos_dados)
+        self.assertLessEqual(consultas_muitos_dados, maximo)
+
+    def test_lista_de_pedidos(self):
+        self.assertConsultasConstantes('/api/pedidos/', maximo=3)
+
+    def test_detalhe_de_pedido(self):
+        criar_dados(quantidade_clientes=1)
+        pedido = Pedido.objects.first()
+        self.assertLessEqual(self.contar_consultas(f'/api/pedidos/{pedido.id}/'), 3)
+
+    def test_detalhe_de_cliente(self):
+        cliente = Cliente.objects.create(nome_completo='Cliente', telefone='11999999999', endereco='Rua A')
+        url = f'/api/clientes/{cliente.id}/'
+        criar_dados(pedidos_por_cliente=2, cliente=cliente)
+        consultas_poucos_pedidos = self.contar_consultas(url)
+        criar_dados(pedidos_por_cliente=8, cliente=cliente)
+        consultas_muitos_pedidos = self.contar_consultas(url)
+        self.assertEqual(consultas_poucos_pedidos, consultas_muitos_pedidos)
+        self.assertLessEqual(consultas_muitos_pedidos, 5)
+
+    def test_lista_de_clientes(self):
+        self.assertConsultasConstantes('/api/clientes/?ordering=-total_gasto&saldo_em_aberto_min=0', maximo=1)
+
+    def test_lista_de_produtos(self):
+        self.assertConsultasConstantes('/api/produtos/', maximo=1)
+
+    def test_criacao_de_pedido_com_muitos_itens(self):
+        criar_dados(quantidade_clientes=1, itens_por_pedido=48)
+        cliente = Cliente.objects.get()
+        produtos = list(Produto.objects.all())
+        payload = {
+            'cliente_id': cliente.id, 'metodo_pagamento': 'a_vista', 'status_pagamento': 'pago',
+            'itens': [{'produto_id': p.id, 'quantidade': 1, 'margem_venda_unitaria': '5.00'} for p in produtos],
+        }
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.post('/api/pedidos/', payload, format='json')
+        self.assertEqual(resposta.status_code, 201)
+        # 8 consultas do pedido + 2 UPDATEs incrementais nos resumos de vendas
+        # + 1 UPDATE das versões dos recursos (api.versoes) + 1 INSERT dos movimentos de estoque
+        self.assertLessEqual(len(consultas), 12)
+        self.assertEqual(Produto.objects.get(id=produtos[0].id).quantidade_estoque, 999)
+
+    def test_dashboard(self):
+        self.assertConsultasConstantes('/api/dashboard/?agrupar=dia', maximo=3)
+
+
+def percorrer(client, url):
+    # Segue os links `next` da paginação por cursor e devolve os ids de todas as páginas
+    ids, proxima = [], url
+    while proxima:
+        dados = client.get(proxima).json()
+        ids += [item['id'] for item in dados['results']]
+        proxima = dados['next']
+    return ids
+
+
+class TotaisPedidoTests(APITestCase):
+    def setUp(self):
+        criar_dados(pedidos_por_cliente=3, itens_por_pedido=2)
+
+    def totais_esperados(self, pedido):
+        itens = list(pedido.itens.all())
+        subtotal = sum((item.subtotal_item for item in itens), Decimal('0.00'))
+        lucro = sum((item.lucro_item for item in itens), Decimal('0.00'))
+        return {
+            'subtotal_itens': subtotal, 'lucro_itens': lucro,
+            'valor_total_venda': subtotal + pedido.valor_servico, 'lucro_final': lucro + pedido.valor_servico,
+        }
+
+    def assertTotaisCorretos(self, pedido):
+        pedido = Pedido.objects.get(pk=pedido.pk)
+        self.assertEqual({campo: getattr(pedido, campo) for campo in Pedido.CAMPOS_TOTAIS}, self.totais_esperados(pedido))
+
+    def test_totais_mantidos_a_cada_gravacao(self):
+        pedido = Pedido.objects.order_by('id').first()
+        self.assertTotaisCorretos(pedido)
+        self.assertEqual(pedido.valor_total_venda, Decimal('271.36'))
+
+        item = PedidoProduto.objects.create(
+            pedido=pedido, produto=Produto.objects.order_by('-id').first(), quantidade=1,
+            margem_venda_unitaria=Decimal('7.50'), custo_real_item_unidade=Decimal('62.84')
+        )
+        self.assertTotaisCorretos(pedido)
+        item.quantidade = 4
+        item.save()
+        self.assertTotaisCorretos(pedido)
+        item.delete()
+        self.assertTotaisCorretos(pedido)
+
+        pedido.valor_servico = Decimal('15.00')
+        pedido.save(update_fields=['valor_servico'])
+        self.assertTotaisCorretos(pedido)
+        self.assertEqual(Pedido.objects.get(pk=pedido.pk).lucro_final, Decimal('35.00'))
+
+        # O dashboard soma as colunas gravadas
+        dashboard = self.client.get('/api/dashboard/').json()
+        self.assertEqual(
+            Decimal(str(dashboard['gastos_do_periodo'])),
+            sum(self.totais_esperados(p)['valor_total_venda'] for p in Pedido.objects.all())
+        )
+
+    def test_comando_verifica_e_corrige_os_totais(self):
+        call_command('recalcular_totais_pedidos', verificar=True, stdout=io.StringIO())
+        corrompidos = list(Pedido.objects.order_by('id').values_list('id', flat=True)[:2])
+        Pedido.objects.filter(id__in=corrompidos).update(valor_total_venda=Decimal('0.00'), lucro_itens=Decimal('1.00'))
+
+        saida = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '2 pedido(s) com totais divergentes'):
+            call_command('recalcular_totais_pedidos', verificar=True, stdout=saida)
+        self.assertEqual(saida.getvalue().splitlines(), [f"Pedido {id}: totais divergentes." for id in corrompidos])
+        # A verificação não grava nada
+        self.assertEqual(Pedido.objects.filter(id__in=corrompidos, valor_total_venda=Decimal('0.00')).count(), 2)
+
+        saida = io.StringIO()
+        call_command('recalcular_totais_pedidos', lote=1, stdout=saida)
+        self.assertIn('2 pedido(s) recalculado(s)', saida.getvalue())
+        for pedido in Pedido.objects.all():
+            self.assertTotaisCorretos(pedido)
+        call_command('recalcular_totais_pedidos', verificar=True, stdout=io.StringIO())
+        # Os resumos diários foram refeitos com os totais corrigidos
+        self.assertEqual(
+            ResumoPedidosDia.objects.aggregate(total=Sum('valor_total_venda'))['total'],
+            Pedido.objects.aggregate(total=Sum('valor_total_venda'))['total']
+        )
+
+
+class DashboardPorPeriodoTests(APITestCase):
+    def setUp(self):
+        # Quatro pedidos iguais (6 unidades, R$ 407,04 de venda e R$ 30,00 de lucro cada)
+        criar_dados(pedidos_por_cliente=4)
+        datas = [datetime(2025, 1, 10, 9), datetime(2025, 1, 10, 18), datetime(2025, 2, 3, 12), datetime(2026, 3, 1, 12)]
+        for pedido, data in zip(Pedido.objects.order_by('id'), datas):
+            Pedido.objects.filter(pk=pedido.pk).update(data_pedido=timezone.make_aware(data))
+        # Um pedido com taxa de serviço, que entra no lucro e nas vendas
+        pedido = Pedido.objects.order_by('id').last()
+        pedido.valor_servico = Decimal('10.00')
+        pedido.save()
+
+    def por_periodo(self, parametros):
+        resposta = self.client.get(f'/api/dashboard/?{parametros}')
+        self.assertEqual(resposta.status_code, 200)
+        return [
+            (linha['periodo'][:10], Decimal(str(linha['lucro'])), Decimal(str(linha['gastos'])), linha['quantidade_pedidos'])
+            for linha in resposta.json()['por_periodo']
+        ]
+
+    def test_totais_de_cada_periodo(self):
+        esperado = {
+            'dia': [
+                ('2025-01-10', Decimal('60.00'), Decimal('814.08'), 2),
+                ('2025-02-03', Decimal('30.00'), Decimal('407.04'), 1),
+                ('2026-03-01', Decimal('40.00'), Decimal('417.04'), 1),
+            ],
+            'mes': [
+                ('2025-01-01', Decimal('60.00'), Decimal('814.08'), 2),
+                ('2025-02-01', Decimal('30.00'), Decimal('407.04'), 1),
+                ('2026-03-01', Decimal('40.00'), Decimal('417.04'), 1),
+            ],
+            'ano': [
+                ('2025-01-01', Decimal('90.00'), Decimal('1221.12'), 3),
+                ('2026-01-01', Decimal('40.00'), Decimal('417.04'), 1),
+            ],
+        }
+        for agrupar, linhas in esperado.items():
+            with self.subTest(agrupar=agrupar):
+                self.assertEqual(self.por_periodo(f'agrupar={agrupar}'), linhas)
+
+    def test_intervalo_limita_os_periodos_e_os_totais(self):
+        self.assertEqual(
+            self.por_periodo('agrupar=mes&inicio=2025-01-11&fim=2026-02-28'),
+            [('2025-02-01', Decimal('30.00'), Decimal('407.04'), 1)]
+        )
+        dashboard = self.client.get('/api/dashboard/?inicio=2025-01-01&fim=2025-12-31').json()
+        self.assertEqual(Decimal(str(dashboard['lucro_do_periodo'])), Decimal('90.00'))
+        self.assertEqual(Decimal(str(dashboard['gastos_do_periodo'])), Decimal('1221.12'))
+        self.assertNotIn('por_periodo', dashboard)
+
+
+class PaginacaoPorCursorTests(APITestCase):
+    def test_percorre_todas_as_paginas_sem_repetir(self):
+        criar_dados(quantidade_clientes=6)
+        Pedido.objects.filter(id__in=[2, 5, 7]).update(status_pagamento='nao_pago')
+        for url in ['/api/pedidos/', '/api/clientes/?ordering=-ultimo_pedido', '/api/produtos/']:
+            with self.subTest(url=url):
+                todos = [item['id'] for item in self.client.get(url).json()['results']]
+                self.assertEqual(percorrer(self.client, url + ('&' if '?' in url else '?') + 'page_size=2'), todos)
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.client.get('/api/pedidos/?cursor=invalido').status_code, 404)
+
+
+class ImportacaoTests(APITestCase):
+    def test_importa_produtos_csv_com_relatorio_de_erros(self):
+        Categoria.objects.create(nome='Perfumes')
+        conteudo = (
+            "nome,marca,preco_dolar,categoria,quantidade_estoque\n"
+            "Perfume A,Marca,10.50,perfumes,3\n"
+            "Perfume B,Marca,abc,Perfumes,1\n"
+            "Perfume C,Marca,7.00,Inexistente,1\n"
+        )
+        resposta = self.client.post('/api/importacao/produtos/', {
+            'arquivo': SimpleUploadedFile('produtos.csv', conteudo.encode())
+        })
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['criados'], 1)
+        self.assertEqual([erro['linha'] for erro in resposta.data['erros']], [3, 4])
+        self.assertEqual(Produto.objects.get().quantidade_estoque, 3)
+
+    def test_atualiza_clientes_ndjson_pelo_id(self):
+        cliente = Cliente.objects.create(nome_completo='Antigo', telefone='1', endereco='Rua A')
+        conteudo = f'{{"id": {cliente.id}, "nome_completo": "Novo", "telefone": "2", "endereco": "Rua B"}}\n'
+        resposta = self.client.post('/api/importacao/clientes/', {
+            'arquivo': SimpleUploadedFile('clientes.ndjson', conteudo.encode())
+        })
+        self.assertEqual(resposta.data['atualizados'], 1)
+        cliente.refresh_from_db()
+        self.assertEqual(cliente.nome_completo, 'Novo')
+
+
+class PrecificacaoTests(APITestCase):
+    def test_custo_em_reais_gravado_e_recalculado_quando_a_cotacao_muda(self):
+        categoria = Categoria.objects.create(nome='Perfumes')
+        produto = Produto.objects.create(
+            nome='Perfume', categoria=categoria, marca='Marca', preco_dolar=Decimal('10.00'), quantidade_estoque=1
+        )
+        self.assertEqual(produto.preco_real_custo, calcular_custo_real(Decimal('10.00')))
+
+        cotacao_alterada.send(sender=None, valor=Decimal('6.00'), anterior=Decimal('5.90'))
+        produto.refresh_from_db()
+        self.assertEqual(produto.preco_real_custo, Decimal('63.90'))
+
+
+class RankingProdutosTests(APITestCase):
+    def setUp(self):
+        # Duas categorias, cada uma com 3 produtos vendidos (2 unidades por pedido) e 2 sem vendas
+        criar_dados()
+        criar_dados(cliente=Cliente.objects.get())
+
+    def vendas(self, parametros):
+        resposta = self.client.get(f'/api/produtos/?{parametros}')
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json()
+
+    def test_parametros_invalidos(self):
+        for parametros in [
+            'top=0', 'top=-1', 'top=abc', 'top=101', 'top=99999999999999999999999',
+            'periodo=30', 'periodo=d', 'periodo=-1d', 'periodo=0d', 'periodo=3651d', 'periodo=99999999999d',
+        ]:
+            with self.subTest(parametros=parametros):
+                resposta = self.client.get(f'/api/produtos/?{parametros}')
+                self.assertEqual(resposta.status_code, 400)
+                self.assertIn(parametros.split('=')[0], resposta.json())
+
+    def test_top_por_categoria(self):
+        ranking = self.vendas('top=2')
+        self.assertEqual(len(ranking), 4)
+        for categoria in Categoria.objects.values_list('nome', flat=True):
+            produtos = [produto for produto in ranking if produto['categoria'] == categoria]
+            self.assertEqual([produto['posicao_categoria'] for produto in produtos], [1, 2])
+            self.assertEqual([produto['quantidade_vendas'] for produto in produtos], [4, 4])
+
+    def test_periodo_conta_so_as_vendas_recentes(self):
+        antigo = Pedido.objects.order_by('id').first()
+        Pedido.objects.filter(pk=antigo.pk).update(data_pedido=timezone.now() - timedelta(days=60))
+        vendidos = set(antigo.itens.values_list('produto_id', flat=True))
+        for parametros, esperado in [('periodo=30d', 2), ('periodo=90d', 4)]:
+            with self.subTest(parametros=parametros):
+                produtos = self.vendas(parametros)['results']
+                self.assertEqual({p['quantidade_vendas'] for p in produtos if p['id'] in vendidos}, {esperado})
+
+
+class ProvedorFalso(ProvedorCotacao):
+    """Devolve os valores da lista em ordem; exceções da lista são levantadas."""
+    nome = 'falso'
+
+    def __init__(self, valores=(), registrar_historico=False, **opcoes):
+        super().__init__(**opcoes)
+        self.valores = list(valores)
+        self.registrar_historico = registrar_historico
+        self.liberar = threading.Event()
+        self.liberar.set()
+        self.chamadas = 0
+
+    def obter(self):
+        self.chamadas += 1
+        self.liberar.wait(5)
+        valor = self.valores.pop(0)
+        if isinstance(valor, Exception):
+            raise valor
+        return Decimal(valor)
+
+
+class ProvedorForaDoAr(ProvedorCotacao):
+    nome = 'fora_do_ar'
+
+    def obter(self):
+        raise requests.Timeout('tempo esgotado')
+
+
+class CacheCotacaoTests(APITestCase):
+    def setUp(self):
+        # Relógio do módulo controlado pelo teste; o resto do processo usa o verdadeiro
+        self.agora = 1000.0
+        relogio = mock.patch('api.cambio.time', SimpleNamespace(monotonic=lambda: self.agora))
+        relogio.start()
+        self.addCleanup(relogio.stop)
+
+    def esperar_atualizacao(self, cache):
+        for _ in range(500):
+            if not cache._atualizando:
+                return
+            threading.Event().wait(0.01)
+        self.fail('A atualização em segundo plano não terminou')
+
+    def test_dentro_do_ttl_nao_consulta_o_provedor(self):
+        provedor = ProvedorFalso(['5.00'])
+        cache = CacheCotacao(provedor, ttl=60)
+        self.assertEqual(cache.get(), Decimal('5.00'))
+        self.agora += 59
+        self.assertEqual(cache.get(), Decimal('5.00'))
+        self.assertEqual(provedor.chamadas, 1)
+
+    def test_vencido_devolve_o_antigo_enquanto_atualiza(self):
+        provedor = ProvedorFalso(['5.00', '5.20'])
+        cache = CacheCotacao(provedor, ttl=60)
+        cache.get()
+        self.agora += 61
+        provedor.liberar.clear()
+        # Sem os receptores de cotacao_alterada, que gravariam no banco a partir da thread
+        with mock.patch('api.cambio.cotacao_alterada'):
+            # A requisição não espera pelo provedor: recebe o valor antigo
+            self.assertEqual(cache.get(), Decimal('5.00'))
+            provedor.liberar.set()
+            self.esperar_atualizacao(cache)
+        self.assertEqual(cache.get(), Decimal('5.20'))
+        self.assertEqual(provedor.chamadas, 2)
+
+    def test_falha_mantem_a_ultima_e_espera_antes_de_tentar_de_novo(self):
+        provedor = ProvedorFalso(['5.00', requests.Timeout('tempo esgotado'), '5.30'])
+        cache = CacheCotacao(provedor, ttl=60, espera=30)
+        cache.get()
+        self.agora += 61
+        with self.assertLogs('api.cambio', 'WARNING'):
+            self.assertFalse(cache.atualizar())
+        self.assertEqual(cache.valor, Decimal('5.00'))
+
+        with mock.patch.object(cache, '_agendar_atualizacao') as agendar:
+            self.agora += 29
+            self.assertEqual(cache.get(), Decimal('5.00'))
+            agendar.assert_not_called()
+            self.agora += 2
+            cache.get()
+            agendar.assert_called_once()
+
+        self.assertTrue(cache.atualizar())
+        self.assertEqual(cache.get(), Decimal('5.30'))
+
+    @override_settings(COTACAO_DOLAR={'PROVEDOR': 'api.tests.ProvedorForaDoAr', 'RESERVA': '6.25'})
+    def test_sem_cotacao_alguma_usa_a_reserva_configurada(self):
+        with self.assertLogs('api.cambio', 'WARNING'):
+            self.assertEqual(get_cotacao_dolar_com_encargos(), Decimal('6.25'))
+
+    def test_registra_o_historico_so_quando_o_valor_muda(self):
+        provedor = ProvedorFalso(['5.00', '5.00', '5.40'], registrar_historico=True)
+        cache = CacheCotacao(provedor, ttl=60)
+        alteracoes = []
+
+        def receber(valor, anterior, **kwargs):
+            alteracoes.append((anterior, valor))
+
+        cotacao_alterada.connect(receber)
+        self.addCleanup(cotacao_alterada.disconnect, receber)
+        for _ in range(3):
+            cache.atualizar()
+        self.assertEqual(
+            list(CotacaoDolar.objects.order_by('id').values_list('valor', 'fonte')),
+            [(Decimal('5.0000'), 'falso'), (Decimal('5.4000'), 'falso')]
+        )
+        self.assertEqual(alteracoes, [(Decimal('5.00'), Decimal('5.40'))])
+
+        # Um processo novo começa pela última cotação gravada
+        novo = CacheCotacao(ProvedorFalso(['5.50'], registrar_historico=True), ttl=60)
+        with mock.patch.object(novo, '_agendar_atualizacao'):
+            self.assertEqual(novo.get(), Decimal('5.4000'))
+
+
+class ExportacaoTests(APITestCase):
+    def test_exporta_itens_em_csv_e_ndjson_com_filtros(self):
+        criar_dados(quantidade_clientes=1, pedidos_por_cliente=2, itens_por_pedido=3)
+
+        resposta = self.client.get('/api/pedidos/exportar/?status_entrega=entregue')
+        self.assertEqual(resposta.status_code, 200)
+        linhas = list(csv.DictReader(io.StringIO(b''.join(resposta.streaming_content).decode())))
+        self.assertEqual(len(linhas), 3)
+        self.assertEqual({linha['status_entrega'] for linha in linhas}, {'entregue'})
+        self.assertEqual(linhas[0]['subtotal_item'], '135.68')
+
+        resposta = self.client.get('/api/pedidos/exportar/?formato=ndjson')
+        registros = [json.loads(linha) for linha in b''.join(resposta.streaming_content).splitlines()]
+        self.assertEqual(len(registros), 6)
+
+    def test_filtro_invalido(self):
+        self.assertEqual(self.client.get('/api/pedidos/exportar/?status_pagamento=talvez').status_code, 400)
+
+
+class ResumosTests(APITestCase):
+    def resumos(self):
+        return (
+            list(ResumoVendas.objects.filter(unidades__gt=0).order_by('dia', 'categoria', 'marca')
+                 .values('dia', 'categoria', 'marca', 'unidades', 'receita', 'lucro')),
+            list(ResumoPedidosDia.objects.filter(quantidade_pedidos__gt=0).order_by('dia')
+                 .values_list('dia', 'quantidade_pedidos', 'pedidos_pagos', 'pedidos_entregues',
+                              'pedidos_fechados', 'valor_total_venda', 'lucro_final')),
+        )
+
+    def test_atualizacao_incremental_igual_a_reconstrucao(self):
+        criar_dados(quantidade_clientes=2, pedidos_por_cliente=3, itens_por_pedido=3)
+        produto = Produto.objects.first()
+        self.client.post('/api/pedidos/', {
+            'cliente_id': Cliente.objects.first().id, 'metodo_pagamento': 'a_vista', 'status_pagamento': 'nao_pago',
+            'itens': [{'produto_id': produto.id, 'quantidade': 4, 'margem_venda_unitaria': '7.00'}],
+        }, format='json')
+        pedido = Pedido.objects.first()
+        self.client.patch(f'/api/pedidos/{pedido.id}/atualizar-status/', {'status_entrega': 'entregue'}, format='json')
+        item = PedidoProduto.objects.last()
+        item.quantidade = 5
+        item.save()
+        PedidoProduto.objects.first().delete()
+        Pedido.objects.last().delete()
+
+        incrementais = self.resumos()
+        reconstruir_resumos()
+        self.assertEqual(incrementais, self.resumos())
+
+    def test_categorias_apagadas_somam_na_mesma_linha(self):
+        # Cada chamada cria uma categoria nova, com produtos da mesma marca vendidos no mesmo dia
+        criar_dados(pedidos_por_cliente=1, itens_por_pedido=1)
+        criar_dados(pedidos_por_cliente=1, itens_por_pedido=1, cliente=Cliente.objects.get())
+        for categoria in Categoria.objects.all():
+            categoria.delete()
+        item = PedidoProduto.objects.first()
+        item.quantidade = 3
+        item.save()
+
+        incrementais = self.resumos()
+        self.assertEqual([(linha['categoria'], linha['unidades']) for linha in incrementais[0]], [(None, 5)])
+        reconstruir_resumos()
+        self.assertEqual(incrementais, self.resumos())
+
+    def test_relatorio_por_categoria(self):
+        criar_dados(quantidade_clientes=1, pedidos_por_cliente=2, itens_por_pedido=3)
+        resposta = self.client.get('/api/relatorios/?agrupar=dia&por=categoria')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['vendas'][0]['unidades'], 12)
+        self.assertEqual(resposta.data['pedidos'][0]['quantidade_pedidos'], 2)
+        self.assertEqual(self.client.get('/api/relatorios/?por=cor').status_code, 400)
+
+
+class BuscaTextoTests(APITestCase):
+    def buscar(self, url):
+        return [item['id'] for item in self.client.get(url).json()['results']]
+
+    def test_busca_por_prefixo_sem_acentos(self):
+        categoria = Categoria.objects.create(nome='Perfumes')
+        chanel = Produto.objects.create(nome='Perfume Chanel Nº5', categoria=categoria, marca='Chanel', preco_dolar=Decimal('90'))
+        Produto.objects.create(nome='Creme', categoria=categoria, marca='Nívea', preco_dolar=Decimal('5'))
+        jose = Cliente.objects.create(nome_completo='José Conceição', telefone='11999999999', endereco='Rua A')
+        Cliente.objects.create(nome_completo='Maria', telefone='11888888888', endereco='Rua B')
+
+        self.assertEqual(self.buscar('/api/produtos/?search=perf chan'), [chanel.id])
+        self.assertEqual(self.buscar('/api/clientes/?search=jose concei'), [jose.id])
+
+        categoria.nome = 'Fragrâncias'
+        categoria.save()
+        self.assertEqual(self.buscar('/api/produtos/?search=fragrancia chanel'), [chanel.id])
+
+        pedido = Pedido.objects.create(cliente=jose, metodo_pagamento='a_vista', status_pagamento='pago')
+        self.assertEqual(self.buscar('/api/pedidos/?search=José'), [pedido.id])
+
+    def test_resultados_ordenados_por_relevancia(self):
+        categoria = Categoria.objects.create(nome='Cosméticos')
+        menos = Produto.objects.create(nome='Batom', categoria=categoria, marca='Dior', preco_dolar=Decimal('30'))
+        mais = Produto.objects.create(nome='Dior Dior Sauvage', categoria=categoria, marca='Dior', preco_dolar=Decimal('80'))
+        self.assertEqual(self.buscar('/api/produtos/?search=dior'), [mais.id, menos.id])
+        self.assertEqual(percorrer(self.client, '/api/produtos/?search=dior&page_size=1'), [mais.id, menos.id])
+
+
+class PedidosEmAbertoTests(APITestCase):
+    def test_mesma_definicao_em_todas_as_telas(self):
+        cliente = Cliente.objects.create(nome_completo='Cliente', telefone='1', endereco='Rua A')
+        fechado = Pedido.objects.create(
+            cliente=cliente, metodo_pagamento='parcelado', status_pagamento='em_dia', status_entrega='entregue'
+        )
+        aberto = Pedido.objects.create(
+            cliente=cliente, metodo_pagamento='a_vista', status_pagamento='pago', status_entrega='nao_entregue'
+        )
+
+        self.assertEqual(self.client.get('/api/dashboard/').data['pedidos_em_aberto'], 1)
+        self.assertEqual(self.client.get('/api/clientes/').data['results'][0]['pedidos_em_aberto'], 1)
+        pedidos = self.client.get('/api/pedidos/').data['results']
+        self.assertEqual([p['id'] for p in pedidos], [aberto.id, fechado.id])
+        self.assertEqual([p['status_pedido'] for p in pedidos], ['em_aberto', 'fechado'])
+
+
+class GetCondicionalTests(APITestCase):
+    def test_304_ate_a_proxima_escrita(self):
+        criar_dados(quantidade_clientes=1)
+        resposta = self.client.get('/api/pedidos/')
+        etag = resposta['ETag']
+
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get('/api/pedidos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+        self.assertEqual(len(consultas), 1)
+
+        pedido = Pedido.objects.first()
+        self.client.patch(f'/api/pedidos/{pedido.id}/atualizar-status/', {'status_entrega': 'entregue'}, format='json')
+        self.assertEqual(self.client.get('/api/pedidos/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CacheDeRespostasTests(APITestCase):
+    def setUp(self):
+        caches['respostas'].clear()
+
+    def test_acerta_ate_a_proxima_escrita(self):
+        criar_dados(quantidade_clientes=1)
+        self.client.get('/api/produtos/')
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get('/api/produtos/')
+        self.assertEqual(len(consultas), 1)
+        self.assertEqual(len(resposta.data['results']), 5)
+
+        produto = Produto.objects.first()
+        produto.nome = 'Renomeado'
+        produto.save()
+        nomes = [item['nome'] for item in self.client.get('/api/produtos/').data['results']]
+        self.assertIn('Renomeado', nomes)
+        self.assertEqual(self.client.get('/api/cache/').data['produtos'], {'acertos': 1, 'falhas': 2})
+
+
+class LeituraRapidaTests(APITestCase):
+    def renderizar(self, dados):
+        return json.loads(JSONRenderer().render(dados))
+
+    def test_mesmo_formato_dos_serializers(self):
+        criar_dados(quantidade_clientes=2, itens_por_pedido=3)
+        Produto.objects.create(nome='Sem categoria', marca='Marca', preco_dolar=Decimal('3.33'), quantidade_estoque=2)
+        PedidoProduto.objects.filter(id=1).update(custo_real_item_unidade=None)
+
+        pedidos = Pedido.objects.com_itens().order_by('-em_aberto', '-id')
+        self.assertEqual(
+            self.client.get('/api/pedidos/').json()['results'],
+            self.renderizar(PedidoSerializer(pedidos, many=True).data)
+        )
+        produtos = Produto.objects.select_related('categoria').com_vendas().order_by('-quantidade_vendas', 'id')
+        self.assertEqual(
+            self.client.get('/api/produtos/').json()['results'],
+            self.renderizar(ProdutoSerializer(produtos, many=True).data)
+        )
+        ranking = produtos.com_ranking_por_categoria().filter(posicao_categoria__lte=2)
+        self.assertEqual(
+            self.client.get('/api/produtos/?top=2').json(),
+            self.renderizar(ProdutoSerializer(ranking, many=True).data)
+        )
+
+
+class CamposSelecionaveisTests(APITestCase):
+    def setUp(self):
+        criar_dados(quantidade_clientes=2, itens_por_pedido=3)
+
+    def test_fields_limita_os_campos_e_as_consultas(self):
+        with CaptureQueriesContext(connection) as completo:
+            self.client.get('/api/pedidos/')
+        with CaptureQueriesContext(connection) as enxuto:
+            pedidos = self.client.get('/api/pedidos/?fields=id,status_pedido').json()['results']
+        self.assertEqual(set(pedidos[0]), {'id', 'status_pedido'})
+        # Sem itens na resposta, itens e produtos não são consultados
+        self.assertEqual(len(enxuto), len(completo) - 2)
+
+    def test_aninhados_so_quando_expandidos(self):
+        pedido = self.client.get('/api/pedidos/?fields=id,itens').json()['results'][0]
+        self.assertEqual(pedido['itens'], list(Pedido.objects.get(id=pedido['id']).itens.order_by('id').values_list('id', flat=True)))
+
+        url = '/api/pedidos/?fields=id,itens.quantidade,itens.produto&expand=itens.produto'
+        item = self.client.get(url).json()['results'][0]['itens'][0]
+        self.assertEqual(set(item), {'quantidade', 'produto'})
+        self.assertIn('quantidade_vendas', item['produto'])
+
+    def test_caminho_rapido_igual_ao_serializer(self):
+        for parametros in ('fields=id,itens', 'expand=itens', 'fields=cliente,itens.id,itens.produto.nome'):
+            resposta = self.client.get(f'/api/pedidos/?{parametros}')
+            requisicao = resposta.wsgi_request
+            contexto = {'selecao': Selecao(*[
+                {c for c in requisicao.GET.get(nome, '').split(',') if c} for nome in ('fields', 'expand')
+            ])}
+            pedidos = Pedido.objects.com_itens().order_by('-em_aberto', '-id')
+            esperado = json.loads(JSONRenderer().render(PedidoSerializer(pedidos, many=True, context=contexto).data))
+            self.assertEqual(resposta.json()['results'], esperado, parametros)
+
+    def test_detalhe_do_cliente_sem_pedidos_expandidos(self):
+        cliente = Cliente.objects.first()
+        dados = self.client.get(f'/api/clientes/{cliente.id}/?fields=id,nome_completo,pedidos').json()
+        self.assertEqual(dados['pedidos'], list(cliente.pedidos.values_list('id', flat=True)))
+
+        with CaptureQueriesContext(connection) as consultas:
+            dados = self.client.get(f'/api/clientes/{cliente.id}/?fields=id,total_gasto').json()
+        self.assertEqual(set(dados), {'id', 'total_gasto'})
+        # Versão do recurso + o cliente: os pedidos nem são buscados
+        self.assertEqual(len(consultas), 2)
+
+
+class MetricasTests(APITestCase):
+    def setUp(self):
+        registro_metricas.limpar()
+        criar_dados()
+
+    def test_server_timing(self):
+        resposta = self.client.get('/api/pedidos/')
+        self.assertRegex(resposta['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ consultas", app;dur=[\d.]+, serializer;dur=[\d.]+, render;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_endpoint_no_formato_do_prometheus(self):
+        self.client.get('/api/pedidos/')
+        self.client.get('/api/pedidos/')
+        resposta = self.client.get('/api/metrics/')
+        self.assertTrue(resposta['Content-Type'].startswith('text/plain'))
+        texto = resposta.content.decode()
+        self.assertIn('sistemaloja_requisicoes_total{view="pedido-list",metodo="GET",status="200"} 2', texto)
+        self.assertIn('sistemaloja_consultas_bucket{view="pedido-list",metodo="GET",le="+Inf"} 2', texto)
+        self.assertIn('# TYPE sistemaloja_requisicao_segundos histogram', texto)
+        self.assertIn('sistemaloja_serializacao_segundos_count{view="pedido-list",metodo="GET"} 2', texto)
+
+    def test_serializacao_sem_as_consultas(self):
+        # Blocos aninhados contam uma vez, e o SQL feito dentro deles fica só no banco
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        try:
+            with mock.patch('api.metricas.time.perf_counter', side_effect=[10.0, 11.0]):
+                with medir_serializacao():
+                    with medir_serializacao():
+                        medicao.registrar_consulta('SELECT 1', 0.25)
+        finally:
+            _medicao_atual.reset(token)
+        self.assertEqual((medicao.tempo_serializacao, medicao.tempo_sql), (0.75, 0.25))
+
+    def test_serializer_medido(self):
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        try:
+            PedidoSerializer(Pedido.objects.all(), many=True).data
+        finally:
+            _medicao_atual.reset(token)
+        self.assertGreater(medicao.tempo_serializacao, 0)
+
+    def test_log_acima_do_limite(self):
+        with override_settings(METRICAS={'CONSULTAS': 1}), self.assertLogs('api.metricas', 'WARNING') as log:
+            self.client.get('/api/pedidos/')
+        self.assertIn('GET /api/pedidos/ (pedido-list) acima do limite', log.output[0])
+
+
+class PopularDadosTests(APITestCase):
+    def popular(self, **opcoes):
+        call_command(
+            'popular_dados', categorias=3, produtos=20, clientes=10, pedidos=50, lote=20,
+            stdout=io.StringIO(), **opcoes
+        )
+
+    def test_dados_reprodutiveis_e_consistentes(self):
+        self.popular()
+        self.assertEqual((Categoria.objects.count(), Produto.objects.count(), Cliente.objects.count()), (3, 20, 10))
+        self.assertEqual(Pedido.objects.count(), 50)
+        # Datas espalhadas no passado e crescentes com o id
+        datas = list(Pedido.objects.order_by('id').values_list('data_pedido', flat=True))
+        self.assertEqual(datas, sorted(datas))
+        self.assertLess(datas[0], datas[-1])
+        call_command('recalcular_totais_pedidos', verificar=True, stdout=io.StringIO())
+        self.assertEqual(
+            ResumoPedidosDia.objects.aggregate(total=Sum('quantidade_pedidos'))['total'], 50
+        )
+
+        primeira = list(PedidoProduto.objects.order_by('id').values_list('produto__nome', 'quantidade', 'margem_venda_unitaria'))
+        for model in (Pedido, Cliente, Produto, Categoria):
+            model.objects.all().delete()
+        self.popular()
+        segunda = list(PedidoProduto.objects.order_by('id').values_list('produto__nome', 'quantidade', 'margem_venda_unitaria'))
+        self.assertEqual(primeira, segunda)
+
+    def test_recusa_banco_com_dados(self):
+        criar_dados()
+        with self.assertRaises(CommandError):
+            self.popular()
+
+    def test_benchmark_com_referencia(self):
+        self.popular()
+        referencia = os.path.join(tempfile.mkdtemp(), 'referencia.json')
+        rotas = (
+            'pedidos-lista,pedidos-criar,pedidos-atualizar-status,pedidos-atualizar-status-em-massa,dashboard,'
+            'parcelas-lista,produtos-estoque,importacao-produtos,async-pedidos-lista,async-produtos-detalhe'
+        )
+        call_command('benchmark_api', repeticoes=2, rotas=rotas, salvar=referencia, stdout=io.StringIO())
+        with open(referencia) as arquivo:
+            resultados = json.load(arquivo)
+        self.assertEqual(list(resultados), rotas.split(','))
+        self.assertEqual(set(resultados['dashboard']), {'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'consultas', 'memoria_kb'})
+        # As gravações do benchmark são desfeitas
+        self.assertEqual(Pedido.objects.count(), 50)
+
+        resultados['pedidos-lista']['consultas'] -= 1
+        with open(referencia, 'w') as arquivo:
+            json.dump(resultados, arquivo)
+        with self.assertRaisesMessage(CommandError, 'regressão'):
+            call_command('benchmark_api', repeticoes=2, rotas='pedidos-lista', comparar=referencia, tolerancia=100, stdout=io.StringIO())
+
+
+@skipUnless(settings.SQLITE_PRODUCAO, 'escritas concorrentes dependem do perfil de produção do SQLite')
+class EscritasConcorrentesTests(TransactionTestCase):
+    def test_pragmas_de_producao(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_pedidos_criados_em_paralelo(self):
+        criar_dados(pedidos_por_cliente=0, itens_por_pedido=2)
+        cliente = Cliente.objects.get()
+        produto_ids = list(Produto.objects.order_by('id').values_list('id', flat=True)[:2])
+        escritores, pedidos_por_escritor = 8, 5
+        criados, erros = [], []
+
+        def escrever():
+            try:
+                for _ in range(pedidos_por_escritor):
+                    serializer = PedidoCreateSerializer(data={
+                        'cliente_id': cliente.id, 'metodo_pagamento': 'a_vista', 'status_pagamento': 'pago',
+                        'itens': [{'produto_id': i, 'quantidade': 1, 'margem_venda_unitaria': '5.00'} for i in produto_ids],
+                    })
+                    serializer.is_valid(raise_exception=True)
+                    pedido = serializer.save()
+                    pedido.status_entrega = 'entregue'
+                    transacao_com_repeticao(pedido.save)()
+                    criados.append(pedido.id)
+            except Exception as erro:
+                erros.append(erro)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=escrever) for _ in range(escritores)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        total = escritores * pedidos_por_escritor
+        self.assertEqual(erros, [])
+        self.assertEqual(len(criados), total)
+        self.assertEqual(
+            list(Produto.objects.filter(id__in=produto_ids).values_list('quantidade_estoque', flat=True)),
+            [1000 - total] * 2
+        )
+        self.assertEqual(ResumoPedidosDia.objects.aggregate(fechados=Sum('pedidos_fechados'))['fechados'], total)
+
+    def test_repete_quando_o_banco_esta_bloqueado(self):
+        chamadas = []
+
+        @transacao_com_repeticao(espera_inicial=0)
+        def gravar():
+            chamadas.append(1)
+            if len(chamadas) < 3:
+                raise OperationalError('database is locked')
+            return 'ok'
+
+        self.assertEqual(gravar(), 'ok')
+        self.assertEqual(len(chamadas), 3)
+
+        @transacao_com_repeticao(espera_inicial=0)
+        def falhar():
+            chamadas.append(1)
+            raise OperationalError('no such table: x')
+
+        with self.assertRaises(OperationalError):
+            falhar()
+        self.assertEqual(len(chamadas), 4)
+
+
+class LeiturasAssincronasTests(TransactionTestCase):
+    """As rotas de /api/async/ respondem o mesmo que as síncronas."""
+    def setUp(self):
+        caches['respostas'].clear()
+        criar_dados(quantidade_clientes=2, pedidos_por_cliente=3)
+
+    def assertMesmaResposta(self, caminho):
+        sincrona = self.client.get(f'/api{caminho}')
+        assincrona = self.client.get(f'/api/async{caminho}')
+        self.assertEqual(assincrona.status_code, 200)
+        self.assertEqual(assincrona.json(), sincrona.json())
+        return assincrona
+
+    def test_mesmas_respostas_das_views_sincronas(self):
+        pedido = Pedido.objects.order_by('id').first()
+        produto = Produto.objects.order_by('id').first()
+        for caminho in [
+            '/dashboard/', '/dashboard/?agrupar=mes',
+            '/pedidos/', '/pedidos/?search=Cliente 1', '/pedidos/?fields=id,cliente', f'/pedidos/{pedido.id}/',
+            '/produtos/', '/produtos/?top=2', f'/produtos/{produto.id}/?fields=id,nome',
+        ]:
+            with self.subTest(caminho=caminho):
+                self.assertMesmaResposta(caminho)
+
+    @override_settings(COTACAO_DOLAR={
+        'PROVEDOR': 'api.tests.ProvedorFalso', 'OPCOES': {'valores': ['5.90'], 'registrar_historico': True},
+    })
+    def test_custo_sem_valor_gravado_consulta_a_cotacao_fora_do_loop(self):
+        # Sem preco_real_custo o custo é calculado com a cotação, que o cache ainda vazio busca no banco
+        Produto.objects.update(preco_real_custo=None)
+        produto = Produto.objects.order_by('id').first()
+        for caminho in ['/produtos/', f'/produtos/{produto.id}/']:
+            with self.subTest(caminho=caminho):
+                redefinir_cache()
+                assincrona = self.client.get(f'/api/async{caminho}')
+                self.assertEqual(assincrona.status_code, 200)
+                self.assertEqual(assincrona.json(), self.client.get(f'/api{caminho}').json())
+
+    def test_paginacao_por_cursor(self):
+        primeira = self.client.get('/api/async/pedidos/?page_size=4').json()
+        self.assertEqual(len(primeira['results']), 4)
+        self.assertIn('/api/async/pedidos/', primeira['next'])
+        segunda = self.client.get(primeira['next']).json()
+        self.assertIsNone(segunda['next'])
+        ids = [p['id'] for p in primeira['results'] + segunda['results']]
+        self.assertEqual(ids, list(Pedido.objects.order_by('-em_aberto', '-id').values_list('id', flat=True)))
+
+    def test_get_condicional_e_erros(self):
+        resposta = self.client.get('/api/async/dashboard/')
+        self.assertEqual(self.client.get('/api/async/dashboard/', HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/api/async/pedidos/0/').status_code, 404)
+        self.assertEqual(self.client.get('/api/async/dashboard/?agrupar=hora').status_code, 400)
+
+    def test_periodo_sem_get_condicional(self):
+        # As vendas de ?periodo= mudam com o tempo, sem escritas: nenhuma das duas views manda ETag
+        sincrona = self.client.get('/api/produtos/?periodo=30d')
+        assincrona = self.assertMesmaResposta('/produtos/?periodo=30d')
+        self.assertNotIn('ETag', sincrona)
+        self.assertNotIn('ETag', assincrona)
+        self.assertNotIn('Last-Modified', assincrona)
+        self.assertIn('ETag', self.client.get('/api/async/produtos/'))
+
+    def test_consultas_do_dashboard_entram_na_medicao(self):
+        # As consultas rodam em threads do pool, e ainda assim aparecem no Server-Timing
+        resposta = self.client.get('/api/async/dashboard/?agrupar=dia')
+        consultas = int(re.search(r'"(\d+) consultas"', resposta['Server-Timing']).group(1))
+        self.assertGreaterEqual(consultas, 3)
+
+
+class HistoricoEstoqueTests(APITestCase):
+    def setUp(self):
+        criar_dados(pedidos_por_cliente=0, itens_por_pedido=1)
+        self.produto = Produto.objects.order_by('id').first()
+
+    def movimentos(self):
+        return list(MovimentoEstoque.objects.filter(produto=self.produto).order_by('id').values_list('tipo', 'quantidade'))
+
+    def test_cada_alteracao_grava_um_movimento(self):
+        self.client.patch(f'/api/produtos/{self.produto.id}/', {'adicionar_estoque': 10}, format='json')
+        self.client.post('/api/pedidos/', {
+            'cliente_id': Cliente.objects.get().id, 'metodo_pagamento': 'a_vista', 'status_pagamento': 'pago',
+            'itens': [{'produto_id': self.produto.id, 'quantidade': 3, 'margem_venda_unitaria': '5.00'}],
+        }, format='json')
+        pedido_id = Pedido.objects.get().id
+        self.client.delete(f'/api/pedidos/{pedido_id}/')
+
+        self.assertEqual(self.movimentos(), [('entrada', 1000), ('entrada', 10), ('venda', -3), ('estorno', 3)])
+        self.assertEqual(Produto.objects.get(id=self.produto.id).quantidade_estoque, 1010)
+        self.assertEqual(MovimentoEstoque.objects.filter(tipo='estorno').get().pedido_id, pedido_id)
+
+    def test_estoque_em_uma_data_parte_do_ultimo_snapshot(self):
+        agora = timezone.now()
+        MovimentoEstoque.objects.update(criado_em=agora - timedelta(days=10))
+        estoque.gravar_snapshots()
+        # Um snapshot diferente da soma do razão mostra que o cálculo parte dele
+        SnapshotEstoque.objects.filter(produto=self.produto).update(data=agora - timedelta(days=5), quantidade=900)
+        estoque.movimentar({self.produto.id: -30}, 'venda')
+        MovimentoEstoque.objects.filter(tipo='venda').update(criado_em=agora - timedelta(days=2))
+
+        def em(dias):
+            return estoque.estoque_em(agora - timedelta(days=dias), [self.produto.id])[self.produto.id]
+
+        self.assertEqual([em(20), em(7), em(3), em(1)], [0, 1000, 900, 870])
+
+        data = timezone.localdate(agora - timedelta(days=3)).isoformat()
+        resposta = self.client.get(f'/api/produtos/{self.produto.id}/estoque/?data={data}')
+        self.assertEqual(resposta.json()['quantidade_estoque'], 900)
+        resposta = self.client.get(f'/api/produtos/{self.produto.id}/movimentos-estoque/')
+        self.assertEqual([m['tipo'] for m in resposta.json()['results']], ['venda', 'entrada'])
+
+    def test_snapshot_ajusta_divergencias(self):
+        Produto.objects.filter(id=self.produto.id).update(quantidade_estoque=F('quantidade_estoque') + 7)
+        saida = io.StringIO()
+        call_command('snapshot_estoque', stdout=saida)
+        self.assertIn('1000 no razão, 1007 em estoque; ajuste de +7', saida.getvalue())
+        self.assertEqual(self.movimentos()[-1], ('ajuste', 7))
+        self.assertEqual(SnapshotEstoque.objects.get(produto=self.produto).quantidade, 1007)
+
+        call_command('snapshot_estoque', stdout=saida)
+        self.assertIn('0 divergência(s)', saida.getvalue())
+        self.assertEqual(estoque.estoque_em(timezone.now())[self.produto.id], 1007)
+
+
+class ParcelasTests(APITestCase):
+    def setUp(self):
+        criar_dados(pedidos_por_cliente=0, itens_por_pedido=1)
+        self.client.post('/api/pedidos/', {
+            'cliente_id': Cliente.objects.get().id, 'metodo_pagamento': 'parcelado', 'quantidade_parcelas': 3,
+            'dia_vencimento_parcela': 10, 'status_pagamento': 'em_dia', 'valor_servico': '0.01',
+            'itens': [{'produto_id': Produto.objects.first().id, 'quantidade': 1, 'margem_venda_unitaria': '5.00'}],
+        }, format='json')
+        self.pedido = Pedido.objects.get()
+
+    def resumo_do_dia(self):
+        return list(ResumoPedidosDia.objects.values_list('dia', 'pedidos_pagos', 'pedidos_fechados'))
+
+    def test_parcelas_geradas_na_criacao(self):
+        parcelas = list(self.pedido.parcelas.order_by('numero'))
+        self.assertEqual(len(parcelas), 3)
+        self.assertEqual(sum(p.valor for p in parcelas), self.pedido.valor_total_venda)
+        self.assertLessEqual(parcelas[0].valor - parcelas[1].valor, Decimal('0.02'))
+        self.assertEqual([p.vencimento.day for p in parcelas], [10, 10, 10])
+        self.assertEqual(
+            calcular_vencimentos(date(2026, 11, 30), 4),
+            [date(2026, 12, 30), date(2027, 1, 30), date(2027, 2, 28), date(2027, 3, 30)]
+        )
+
+    def test_varredura_marca_atrasos_e_corrige_os_resumos(self):
+        self.client.patch(f'/api/pedidos/{self.pedido.id}/atualizar-status/', {'status_entrega': 'entregue'}, format='json')
+        segundo_vencimento = self.pedido.parcelas.get(numero=2).vencimento
+        saida = io.StringIO()
+        call_command('marcar_atrasos', '--data', segundo_vencimento.isoformat(), stdout=saida)
+
+        self.assertIn("1 parcela(s) marcada(s) em atraso; 1 pedido(s)", saida.getvalue())
+        self.assertEqual(list(self.pedido.parcelas.order_by('numero').values_list('em_atraso', flat=True)), [True, False, False])
+        self.assertEqual(Pedido.objects.get().status_pagamento, 'em_atraso')
+        # O pedido deixou de ser fechado: o resumo incremental bate com o recalculado do zero
+        incremental = self.resumo_do_dia()
+        reconstruir_resumos()
+        self.assertEqual(incremental, self.resumo_do_dia())
+        self.assertEqual(incremental[0][2], 0)
+
+        self.assertEqual(len(self.client.get('/api/parcelas/?em_atraso=true').json()['results']), 1)
+        self.assertEqual(len(self.client.get('/api/parcelas/?em_aberto=true').json()['results']), 3)
+
+    def test_pagamento_das_parcelas(self):
+        ids = list(self.pedido.parcelas.order_by('numero').values_list('id', flat=True))
+        for parcela_id in ids:
+            resposta = self.client.post(f'/api/parcelas/{parcela_id}/pagar/', {'paga_em': '2026-01-05'}, format='json')
+            self.assertTrue(resposta.json()['paga'])
+        self.assertEqual(Pedido.objects.get().status_pagamento, 'pago')
+        self.assertEqual(self.resumo_do_dia()[0][1], 1)
+        self.assertEqual(self.client.post(f'/api/parcelas/{ids[0]}/pagar/').status_code, 400)
+        self.assertEqual(self.client.get('/api/parcelas/?em_aberto=true').json()['results'], [])
+
+    def assertQuitadoSemAtrasos(self):
+        self.assertFalse(self.pedido.parcelas.filter(paga=False).exists())
+        ultimo_vencimento = self.pedido.parcelas.get(numero=3).vencimento
+        saida = io.StringIO()
+        call_command('marcar_atrasos', '--data', (ultimo_vencimento + timedelta(days=1)).isoformat(), stdout=saida)
+        self.assertIn("0 parcela(s) marcada(s) em atraso; 0 pedido(s)", saida.getvalue())
+        self.assertEqual(Pedido.objects.get().status_pagamento, 'pago')
+
+    def test_pedido_pago_quita_as_parcelas(self):
+        self.client.patch(f'/api/pedidos/{self.pedido.id}/atualizar-status/', {'status_pagamento': 'pago'}, format='json')
+        self.assertQuitadoSemAtrasos()
+
+    def test_pedidos_pagos_em_massa_quitam_as_parcelas(self):
+        self.client.patch('/api/pedidos/atualizar-status/', {'ids': [self.pedido.id], 'status_pagamento': 'pago'}, format='json')
+        self.assertQuitadoSemAtrasos()
+
+    def test_varredura_ignora_parcelas_de_pedidos_pagos(self):
+        # Pedido marcado como pago por fora, sem passar pelos caminhos que quitam as parcelas
+        Pedido.objects.update(status_pagamento='pago')
+        ultimo_vencimento = self.pedido.parcelas.get(numero=3).vencimento
+        self.assertEqual(marcar_atrasos(ultimo_vencimento + timedelta(days=1)), (0, 0))
+        self.assertFalse(self.pedido.parcelas.filter(em_atraso=True).exists())
+
+
+class AtualizacaoStatusEmMassaTests(APITestCase):
+    def setUp(self):
+        criar_dados(quantidade_clientes=2, pedidos_por_cliente=3)
+        self.ids = list(Pedido.objects.order_by('id').values_list('id', flat=True))
+        # Um pedido por dia, para que a correção dos resumos cubra vários dias
+        agora = timezone.now()
+        for dias, id in enumerate(self.ids):
+            Pedido.objects.filter(id=id).update(data_pedido=agora - timedelta(days=dias))
+        reconstruir_resumos()
+
+    def assertResumosCorretos(self):
+        incremental = list(ResumoPedidosDia.objects.values_list('dia', 'pedidos_pagos', 'pedidos_entregues', 'pedidos_fechados'))
+        reconstruir_resumos()
+        self.assertEqual(incremental, list(ResumoPedidosDia.objects.values_list(
+            'dia', 'pedidos_pagos', 'pedidos_entregues', 'pedidos_fechados'
+        )))
+
+    def test_atualiza_em_um_update_e_devolve_o_resumo(self):
+        nao_entregues = list(Pedido.objects.filter(status_entrega='nao_entregue').order_by('id').values_list('id', flat=True))
+        # Número fixo de consultas, qualquer que seja a quantidade de pedidos ou de dias: status
+        # atuais, contagem por dia, UPDATE dos pedidos, UPDATE dos resumos, versões dos recursos
+        # e o savepoint da transação
+        with self.assertNumQueries(7):
+            resposta = self.client.patch(
+                '/api/pedidos/atualizar-status/', {'ids': self.ids + [999999], 'status_entrega': 'entregue'}, format='json'
+            )
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['atualizados'], nao_entregues)
+        self.assertEqual(resposta.json()['nao_encontrados'], [999999])
+        self.assertEqual(len(resposta.json()['inalterados']), len(self.ids) - len(nao_entregues))
+        self.assertFalse(Pedido.objects.exclude(status_entrega='entregue').exists())
+        self.assertResumosCorretos()
+
+    def test_pagamento_e_entrega_juntos(self):
+        self.client.patch(
+            '/api/pedidos/atualizar-status/',
+            {'ids': self.ids[:4], 'status_pagamento': 'em_dia', 'status_entrega': 'entregue'}, format='json'
+        )
+        self.assertEqual(Pedido.objects.filter(id__in=self.ids[:4], em_aberto=False).count(), 4)
+        self.assertResumosCorretos()
+
+    def test_valida_a_entrada(self):
+        for dados in [{'ids': self.ids}, {'ids': [], 'status_entrega': 'entregue'}, {'ids': self.ids, 'status_entrega': 'perdido'}]:
+            with self.subTest(dados=dados):
+                self.assertEqual(self.client.patch('/api/pedidos/atualizar-status/', dados, format='json').status_code, 400)
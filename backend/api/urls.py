@@ -1,18 +1,32 @@
 # api/urls.py
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     CategoriaViewSet, ProdutoViewSet, 
-    ClienteViewSet, PedidoViewSet, DashboardView
+    ClienteViewSet, PedidoViewSet, ParcelaViewSet, CotacaoDolarViewSet, DashboardView, ImportacaoView,
+    RelatorioVendasView, EstatisticasCacheView, MetricasView
 )
+from .assincrono import DashboardAsyncView, PedidosAsyncView, ProdutosAsyncView
 
 router = DefaultRouter()
 router.register(r'categorias', CategoriaViewSet)
 router.register(r'produtos', ProdutoViewSet)
 router.register(r'clientes', ClienteViewSet)
 router.register(r'pedidos', PedidoViewSet)
+router.register(r'parcelas', ParcelaViewSet)
+router.register(r'cotacoes', CotacaoDolarViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('relatorios/', RelatorioVendasView.as_view(), name='relatorios'),
+    path('cache/', EstatisticasCacheView.as_view(), name='estatisticas-cache'),
+    path('metrics/', MetricasView.as_view(), name='metricas'),
+    # Leituras assíncronas (api.assincrono), para quando o app roda sob ASGI
+    path('async/dashboard/', DashboardAsyncView.as_view(), name='dashboard-async'),
+    path('async/pedidos/', PedidosAsyncView.as_view(), name='pedido-list-async'),
+    path('async/pedidos/<int:pk>/', PedidosAsyncView.as_view(), name='pedido-detail-async'),
+    path('async/produtos/', ProdutosAsyncView.as_view(), name='produto-list-async'),
+    path('async/produtos/<int:pk>/', ProdutosAsyncView.as_view(), name='produto-detail-async'),
+    re_path(r'^importacao/(?P<recurso>produtos|clientes)/$', ImportacaoView.as_view(), name='importacao'),
 ]
\ No newline at end of file
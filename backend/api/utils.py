@@ -1,8 +1,50 @@
-from decimal import Decimal
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .cambio import get_cache
 
 def get_cotacao_dolar_com_encargos():
     """
-    Retorna a cotação fixa e final do dólar a ser usada em todo o sistema.
+    Retorna a cotação final do dólar a ser usada em todo o sistema.
+    """
+    # Vem do cache do processo; o provedor é configurado em settings.COTACAO_DOLAR
+    return get_cache().get()
+
+def get_data(params, nome):
+    """Lê o parâmetro `nome` (AAAA-MM-DD) como date, ou None quando não é informado."""
+    valor = params.get(nome)
+    if not valor:
+        return None
+    try:
+        data = parse_date(valor)
+    except ValueError:
+        data = None
+    if data is None:
+        raise ValidationError({nome: f"Data inválida: '{valor}'. Use o formato AAAA-MM-DD."})
+    return data
+
+
+def get_intervalo_datas(params):
+    """
+    Lê os parâmetros `inicio` e `fim` (AAAA-MM-DD) e devolve um par de datetimes
+    (início inclusivo, fim exclusivo) para filtrar `data_pedido` por intervalo.
+    Qualquer um dos dois pode ser None quando o parâmetro não é informado.
     """
-    # Retorna diretamente o valor Decimal fixo.
-    return Decimal('5.90')
\ No newline at end of file
+    intervalo = []
+    for nome in ('inicio', 'fim'):
+        data = get_data(params, nome)
+        if data is None:
+            intervalo.append(None)
+            continue
+        if nome == 'fim':
+            # O dia final é inclusivo, então o limite é o início do dia seguinte
+            data += timedelta(days=1)
+        intervalo.append(timezone.make_aware(datetime.combine(data, time.min)))
+
+    inicio, fim = intervalo
+    if inicio and fim and inicio >= fim:
+        raise ValidationError({'fim': "A data final deve ser igual ou posterior à data inicial."})
+    return inicio, fim
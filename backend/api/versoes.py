@@ -0,0 +1,169 @@
+"""
+Versões dos recursos da API, usadas para responder GETs condicionais (ETag/Last-Modified)
+e como chave do cache de respostas.
+
+Cada gravação incrementa a versão de todos os recursos cujas respostas ela pode alterar
+(um pedido novo muda a lista de pedidos, os totais dos clientes, as vendas dos produtos
+e o dashboard). Os sinais de api.signals cobrem save()/delete(); caminhos em massa
+(bulk_create, bulk_update, queryset.update) chamam registrar_escrita() diretamente.
+"""
+import datetime
+import hashlib
+
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+# Recursos afetados pela gravação de cada model
+RECURSOS_POR_MODEL = {
+    'Categoria': ['categorias', 'produtos', 'pedidos', 'clientes', 'relatorios'],
+    'Produto': ['produtos', 'pedidos', 'clientes'],
+    'Cliente': ['clientes', 'pedidos'],
+    'Pedido': ['pedidos', 'clientes', 'produtos', 'dashboard', 'relatorios'],
+    'PedidoProduto': ['pedidos', 'clientes', 'produtos', 'dashboard', 'relatorios'],
+    'CotacaoDolar': ['cotacoes', 'dashboard'],
+    'Parcela': ['parcelas'],
+}
+
+INICIO = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Alias em settings.CACHES usado para guardar respostas e os contadores de acerto/falha
+CACHE_RESPOSTAS = 'respostas'
+
+
+def registrar_escrita(*recursos):
+    """
+    Incrementa a versão dos recursos na mesma transação da escrita: a versão nova só fica
+    visível junto com os dados novos, então nada guardado sob ela traz dados antigos.
+    """
+    from .models import VersaoRecurso
+
+    recursos = set(recursos)
+    agora = timezone.now()
+    atualizados = VersaoRecurso.objects.filter(recurso__in=recursos).update(versao=F('versao') + 1, atualizado_em=agora)
+    if atualizados < len(recursos):
+        # Primeira escrita de um recurso: cria a linha (outra transação pode ter criado antes)
+        VersaoRecurso.objects.bulk_create(
+            [VersaoRecurso(recurso=recurso, versao=1, atualizado_em=agora) for recurso in recursos],
+            ignore_conflicts=True
+        )
+
+
+def _consulta_versoes(recursos):
+    from .models import VersaoRecurso
+
+    return VersaoRecurso.objects.filter(recurso__in=recursos).values_list('recurso', 'versao', 'atualizado_em')
+
+
+def _montar_versoes(recursos, linhas):
+    gravadas = {recurso: (versao, atualizado_em) for recurso, versao, atualizado_em in linhas}
+    versoes = [gravadas.get(recurso, (0, INICIO)) for recurso in recursos]
+    return [versao for versao, _ in versoes], max(atualizado_em for _, atualizado_em in versoes)
+
+
+def get_versoes(recursos):
+    """Devolve (versões na ordem de `recursos`, data da última alteração) em uma consulta."""
+    return _montar_versoes(recursos, _consulta_versoes(recursos))
+
+
+async def aget_versoes(recursos):
+    return _montar_versoes(recursos, [linha async for linha in _consulta_versoes(recursos)])
+
+
+def montar_etag(versoes, formato, extra=''):
+    # O formato entra no ETag: JSON e a API navegável são representações diferentes
+    partes = [str(versao) for versao in versoes] + [formato]
+    if extra:
+        partes.append(extra)
+    return quote_etag('-'.join(partes))
+
+
+def contar_acesso_ao_cache(nome, acerto):
+    cache = caches[CACHE_RESPOSTAS]
+    chave = f'estatisticas:{nome}:{"acertos" if acerto else "falhas"}'
+    cache.add(chave, 0, timeout=None)
+    try:
+        cache.incr(chave)
+    except ValueError:
+        # O contador foi descartado pelo backend entre o add e o incr
+        cache.set(chave, 1, timeout=None)
+
+
+def get_estatisticas_cache(nomes):
+    cache = caches[CACHE_RESPOSTAS]
+    return {
+        nome: {
+            'acertos': cache.get(f'estatisticas:{nome}:acertos', 0),
+            'falhas': cache.get(f'estatisticas:{nome}:falhas', 0),
+        }
+        for nome in nomes
+    }
+
+
+class GetCondicionalMixin:
+    """
+    Acrescenta ETag e Last-Modified às respostas de GET e responde 304 quando o cliente
+    já tem a versão atual, sem consultar os dados nem rodar o serializer.
+
+    A view declara os recursos de que a resposta depende em `recursos_versao` e pode
+    acrescentar ao ETag valores que não vêm do banco em get_etag_extra().
+
+    Com `cache_respostas = True`, os dados das respostas de listagem ficam no cache
+    CACHE_RESPOSTAS, com a URL completa e as versões na chave: qualquer escrita que
+    altere um dos recursos muda a chave, e a entrada antiga apenas expira.
+    """
+    recursos_versao = []
+    cache_respostas = False
+
+    def usa_get_condicional(self, request):
+        return True
+
+    def get_etag_extra(self, request):
+        return ''
+
+    def responder_condicional(self, request, gerar_resposta):
+        if request.method not in ('GET', 'HEAD') or not self.usa_get_condicional(request):
+            return gerar_resposta()
+
+        versoes, ultima_alteracao = get_versoes(self.recursos_versao)
+        etag = montar_etag(versoes, request.accepted_renderer.format, self.get_etag_extra(request))
+        segundos = int(ultima_alteracao.timestamp())
+
+        resposta = get_conditional_response(request, etag=etag, last_modified=segundos)
+        if resposta is None:
+            resposta = self.gerar_resposta_em_cache(request, etag, ultima_alteracao, gerar_resposta)
+        if resposta.status_code in (200, 304):
+            resposta['ETag'] = etag
+            resposta['Last-Modified'] = http_date(segundos)
+            # Sempre revalida com o servidor, que responde 304 enquanto nada mudar
+            resposta['Cache-Control'] = 'no-cache'
+        return resposta
+
+    def gerar_resposta_em_cache(self, request, etag, ultima_alteracao, gerar_resposta):
+        if not self.cache_respostas or getattr(self, 'action', 'list') != 'list':
+            return gerar_resposta()
+
+        # O instante exato da última escrita distingue estados do banco com as mesmas versões
+        # (por exemplo, depois de um rollback que as fez voltar)
+        assinatura = f'{request.get_full_path()}|{etag}|{ultima_alteracao.isoformat()}'
+        chave = 'resposta:' + hashlib.sha1(assinatura.encode()).hexdigest()
+        nome = self.recursos_versao[0]
+        cache = caches[CACHE_RESPOSTAS]
+
+        dados = cache.get(chave)
+        contar_acesso_ao_cache(nome, acerto=dados is not None)
+        if dados is not None:
+            return Response(dados)
+        resposta = gerar_resposta()
+        if resposta.status_code == 200:
+            cache.set(chave, resposta.data)
+        return resposta
+
+    def list(self, request, *args, **kwargs):
+        return self.responder_condicional(request, lambda: super(GetCondicionalMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.responder_condicional(request, lambda: super(GetCondicionalMixin, self).retrieve(request, *args, **kwargs))
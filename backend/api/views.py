@@ -1,42 +1,159 @@
-import requests
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 from rest_framework import viewsets, views, response, status
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import OrderingFilter
+from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import action
-from django.db.models import Count, Q
+from rest_framework.parsers import MultiPartParser
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.db.models import Count, Prefetch, Sum, Value
+from django.utils import timezone
+from django.db.models.fields import DecimalField
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncYear
 
 # Importa os modelos
-from .models import Categoria, Produto, Cliente, Pedido
+from .models import (
+    Categoria, Produto, Cliente, Pedido, CotacaoDolar, MovimentoEstoque, Parcela, ResumoVendas, ResumoPedidosDia
+)
 
 # Importa os serializers
 from .serializers import (
-    CategoriaSerializer, ProdutoSerializer, 
-    ClienteListSerializer, ClienteDetailSerializer, PedidoSerializer, PedidoCreateSerializer
+    CategoriaSerializer, ProdutoSerializer, CotacaoDolarSerializer,
+    ClienteListSerializer, ClienteDetailSerializer, PedidoSerializer, PedidoCreateSerializer,
+    MovimentoEstoqueSerializer, ParcelaSerializer, AtualizacaoStatusEmMassaSerializer
 )
 
 # Importa a função utilitária para a cotação do dólar
-from .utils import get_cotacao_dolar_com_encargos
+from .utils import get_cotacao_dolar_com_encargos, get_data, get_intervalo_datas
+
+from .importacao import ImportadorProdutos, ImportadorClientes
+from .banco import transacao_com_repeticao
+from .busca import BuscaTextoFilter
+from .campos import CamposSelecionaveisViewMixin, carregamento_pedidos
+from .versoes import GetCondicionalMixin, get_estatisticas_cache
+from .metricas import registro as registro_metricas
+from .renderers import PrometheusRenderer
+from . import estoque, leitura, parcelas
+from .exportacao import FORMATOS as FORMATOS_EXPORTACAO, filtrar_itens, gerar_exportacao
 
-class CategoriaViewSet(viewsets.ModelViewSet):
-    queryset = Categoria.objects.all()
+class CategoriaViewSet(CamposSelecionaveisViewMixin, GetCondicionalMixin, viewsets.ModelViewSet):
+    recursos_versao = ['categorias']
+    queryset = Categoria.objects.order_by('nome')
     serializer_class = CategoriaSerializer
 
-class ProdutoViewSet(viewsets.ModelViewSet):
+class ProdutoViewSet(CamposSelecionaveisViewMixin, GetCondicionalMixin, viewsets.ModelViewSet):
+    recursos_versao = ['produtos']
+    # Limites de ?top= e ?periodo=; acima deles os números estouram no banco ou no datetime
+    MAXIMO_TOP = 100
+    MAXIMO_DIAS_PERIODO = 3650
+    cache_respostas = True
     queryset = Produto.objects.all()
     serializer_class = ProdutoSerializer
-    filter_backends = [SearchFilter]
+    filter_backends = [BuscaTextoFilter]
     search_fields = ['nome', 'marca', 'categoria__nome']
+    busca_tabela = 'api_busca_produto'
 
     def get_queryset(self):
-        # Anota cada produto com a contagem de vendas e ordena por ela
-        return Produto.objects.annotate(
-            vendas_count=Count('itens_pedido')
-        ).order_by('-vendas_count')
+        # Anota cada produto com as unidades vendidas e ordena por elas
+        queryset = Produto.objects.select_related('categoria').com_vendas(
+            desde=self.get_inicio_periodo()
+        ).order_by('-quantidade_vendas', 'id')
+
+        top = self.request.query_params.get('top')
+        if top:
+            if not top.isdigit() or not 1 <= int(top) <= self.MAXIMO_TOP:
+                raise ValidationError({'top': f"Informe um número inteiro entre 1 e {self.MAXIMO_TOP}."})
+            queryset = queryset.com_ranking_por_categoria().filter(posicao_categoria__lte=int(top))
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        # O ranking por categoria já é limitado a N produtos por categoria e não é paginado:
+        # um filtro de cursor mudaria o conjunto sobre o qual a janela ROW_NUMBER é calculada
+        if self.request.query_params.get('top'):
+            return None
+        return super().paginate_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        # Caminho rápido (api.leitura): mesmo formato do ProdutoSerializer, sem instanciar models
+        return self.responder_condicional(request, lambda: self.listar(request))
+
+    def listar(self, request):
+        linhas = self.get_linhas()
+        pagina = self.paginate_queryset(linhas)
+        if pagina is None:
+            return response.Response(leitura.listar_produtos(linhas, self.get_selecao()))
+        return self.get_paginated_response(leitura.listar_produtos(pagina, self.get_selecao()))
+
+    def get_linhas(self):
+        # Linhas values() da listagem, também usadas pela versão assíncrona (api.assincrono)
+        queryset = self.filter_queryset(self.get_queryset())
+        selecao = self.get_selecao()
+        campos = leitura.CAMPOS_PRODUTO
+        if selecao is not None and not selecao.pede('', 'categoria'):
+            # Sem o nome da categoria na resposta, a junção com api_categoria é pulada
+            campos = [campo for campo in campos if campo != 'categoria__nome']
+        return queryset.values(*dict.fromkeys(campos + list(queryset.query.annotations)))
+
+    @action(detail=True, methods=['get'], url_path='estoque')
+    def estoque_na_data(self, request, pk=None):
+        """
+        Estoque do produto no fim do dia ?data=AAAA-MM-DD (sem a data, agora), a partir
+        do último snapshot até a data e dos movimentos seguintes (api.estoque).
+        """
+        produto = get_object_or_404(Produto.objects.only('id'), pk=pk)
+        data = get_data(request.query_params, 'data')
+        instante = timezone.now()
+        if data is not None:
+            instante = min(instante, timezone.make_aware(datetime.combine(data, time.max)))
+        return response.Response({
+            'produto': produto.id,
+            'data': instante,
+            'quantidade_estoque': estoque.estoque_em(instante, [produto.id]).get(produto.id, 0),
+        })
+
+    @action(detail=True, methods=['get'], url_path='movimentos-estoque')
+    def movimentos_estoque(self, request, pk=None):
+        # Razão do estoque do produto, do movimento mais recente para o mais antigo, com ?inicio e ?fim
+        produto = get_object_or_404(Produto.objects.only('id'), pk=pk)
+        movimentos = MovimentoEstoque.objects.filter(produto=produto).order_by('-criado_em', '-id')
+        inicio, fim = get_intervalo_datas(request.query_params)
+        if inicio:
+            movimentos = movimentos.filter(criado_em__gte=inicio)
+        if fim:
+            movimentos = movimentos.filter(criado_em__lt=fim)
+        pagina = self.paginator.paginate_queryset(movimentos, request, view=self)
+        return self.get_paginated_response(MovimentoEstoqueSerializer(pagina, many=True).data)
 
-class ClienteViewSet(viewsets.ModelViewSet):
+    def usa_get_condicional(self, request):
+        # Com ?periodo= as vendas mudam com o passar do tempo, mesmo sem novas escritas
+        return not request.query_params.get('periodo')
+
+    def get_inicio_periodo(self):
+        # Converte ?periodo=30d no instante a partir do qual as vendas são contadas
+        periodo = self.request.query_params.get('periodo')
+        if not periodo:
+            return None
+        if not periodo.endswith('d') or not periodo[:-1].isdigit():
+            raise ValidationError({'periodo': "Use o formato <dias>d, por exemplo 30d."})
+        if not 1 <= int(periodo[:-1]) <= self.MAXIMO_DIAS_PERIODO:
+            raise ValidationError({'periodo': f"O período vai de 1d a {self.MAXIMO_DIAS_PERIODO}d."})
+        return timezone.now() - timedelta(days=int(periodo[:-1]))
+
+class ClienteViewSet(CamposSelecionaveisViewMixin, GetCondicionalMixin, viewsets.ModelViewSet):
+    recursos_versao = ['clientes']
     queryset = Cliente.objects.all()
-    filter_backends = [SearchFilter]
+    # A busca vem depois da ordenação para poder priorizar os resultados mais relevantes
+    filter_backends = [OrderingFilter, BuscaTextoFilter]
     search_fields = ['nome_completo', 'telefone', 'endereco']
+    busca_tabela = 'api_busca_cliente'
+    ordering_fields = [
+        'nome_completo', 'total_gasto', 'quantidade_pedidos',
+        'pedidos_em_aberto', 'ultimo_pedido', 'saldo_em_aberto'
+    ]
+    ordering = ['-pedidos_em_aberto', 'id']
+    # Filtros de faixa aceitos como ?<campo>_min= e ?<campo>_max=
+    filtros_faixa = ['total_gasto', 'saldo_em_aberto', 'quantidade_pedidos', 'pedidos_em_aberto']
 
     def get_serializer_class(self):
         # Usa um serializer diferente para a lista e para o detalhe
@@ -45,17 +162,41 @@ class ClienteViewSet(viewsets.ModelViewSet):
         return ClienteListSerializer
 
     def get_queryset(self):
-        # Prioriza clientes com pedidos em aberto
-        filtro_pedidos_abertos = Q(pedidos__status_entrega='nao_entregue') | Q(pedidos__status_pagamento__in=['nao_pago', 'em_atraso'])
-        return Cliente.objects.annotate(
-            pedidos_em_aberto=Count('pedidos', filter=filtro_pedidos_abertos)
-        ).order_by('-pedidos_em_aberto')
+        # Prioriza clientes com pedidos em aberto; os totais vêm anotados na mesma consulta
+        queryset = Cliente.objects.com_totais().order_by('-pedidos_em_aberto', 'id')
+        for campo in self.filtros_faixa:
+            for sufixo, lookup in (('_min', 'gte'), ('_max', 'lte')):
+                valor = self.request.query_params.get(campo + sufixo)
+                if valor:
+                    queryset = queryset.filter(**{f'{campo}__{lookup}': self.get_valor_numerico(campo + sufixo, valor)})
+        if self.action == 'retrieve':
+            selecao = self.get_selecao()
+            if selecao is None or selecao.expandir('pedidos'):
+                pedidos = Pedido.objects.com_itens(**carregamento_pedidos(selecao, 'pedidos'))
+            else:
+                pedidos = Pedido.objects.only('id', 'cliente_id')
+            if selecao is None or selecao.pede('', 'pedidos'):
+                queryset = queryset.prefetch_related(Prefetch('pedidos', queryset=pedidos))
+        return queryset
 
-class PedidoViewSet(viewsets.ModelViewSet):
+    def get_valor_numerico(self, parametro, valor):
+        try:
+            numero = Decimal(valor)
+        except ArithmeticError:
+            numero = None
+        if numero is None or not numero.is_finite():
+            raise ValidationError({parametro: f"Valor numérico inválido: '{valor}'."})
+        return numero
+
+class PedidoViewSet(CamposSelecionaveisViewMixin, GetCondicionalMixin, viewsets.ModelViewSet):
+    recursos_versao = ['pedidos']
     queryset = Pedido.objects.all()
     serializer_class = PedidoSerializer
-    filter_backends = [SearchFilter]
+    filter_backends = [BuscaTextoFilter]
     search_fields = ['cliente__nome_completo']
+    # Pedidos são encontrados pelo índice dos clientes
+    busca_tabela = 'api_busca_cliente'
+    busca_coluna = 'cliente'
 
     def get_serializer_class(self):
         # Usa um serializer diferente para criar um pedido
@@ -69,14 +210,14 @@ class PedidoViewSet(viewsets.ModelViewSet):
         novo_status_pagamento = request.data.get('status_pagamento')
         novo_status_entrega = request.data.get('status_entrega')
         alterado = False
-        if novo_status_pagamento and novo_status_pagamento in [c[0] for c in Pedido.STATUS_PAGAMENTO_CHOICES]:
+        if novo_status_pagamento in Pedido.CODIGOS_STATUS_PAGAMENTO:
             pedido.status_pagamento = novo_status_pagamento
             alterado = True
-        if novo_status_entrega and novo_status_entrega in [c[0] for c in Pedido.STATUS_ENTREGA_CHOICES]:
+        if novo_status_entrega in Pedido.CODIGOS_STATUS_ENTREGA:
             pedido.status_entrega = novo_status_entrega
             alterado = True
         if alterado:
-            pedido.save()
+            transacao_com_repeticao(pedido.save)()
             serializer = self.get_serializer(pedido)
             return response.Response(serializer.data)
         else:
@@ -85,30 +226,297 @@ class PedidoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-    def get_queryset(self):
-        # Prioriza pedidos em aberto na listagem
-        return Pedido.objects.all().extra(
-           select={'is_aberto': "status_entrega <> 'entregue' OR status_pagamento <> 'pago'"},
-           order_by=['-is_aberto']
+    @action(detail=False, methods=['patch'], url_path='atualizar-status')
+    def atualizar_status_em_massa(self, request):
+        """
+        Aplica os mesmos status a vários pedidos ({"ids": [...], "status_entrega": ...}) com
+        um único UPDATE e devolve só os ids: atualizados, já com esses status e não encontrados.
+        """
+        entrada = AtualizacaoStatusEmMassaSerializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        dados = entrada.validated_data
+        return response.Response(self.aplicar_status(
+            list(dict.fromkeys(dados['ids'])), dados.get('status_pagamento'), dados.get('status_entrega')
+        ))
+
+    @transacao_com_repeticao
+    def aplicar_status(self, ids, status_pagamento, status_entrega):
+        atuais = {
+            id: (pagamento, entrega) for id, pagamento, entrega in
+            Pedido.objects.filter(id__in=ids).values_list('id', 'status_pagamento', 'status_entrega')
+        }
+        resumo = {'atualizados': [], 'inalterados': [], 'nao_encontrados': []}
+        for id in ids:
+            if id not in atuais:
+                resumo['nao_encontrados'].append(id)
+            elif (status_pagamento or atuais[id][0], status_entrega or atuais[id][1]) != atuais[id]:
+                resumo['atualizados'].append(id)
+            else:
+                resumo['inalterados'].append(id)
+        # Os resumos por dia são corrigidos junto com o UPDATE (PedidoQuerySet.atualizar_status)
+        Pedido.objects.filter(id__in=resumo['atualizados']).atualizar_status(
+            status_pagamento=status_pagamento, status_entrega=status_entrega
         )
+        return resumo
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """
+        Exporta os itens de pedido (uma linha por item, com os dados do pedido) em CSV ou
+        NDJSON, filtrando por ?inicio, ?fim, ?status_pagamento e ?status_entrega.
+        A resposta é gerada em streaming, sem montar o arquivo inteiro na memória.
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS_EXPORTACAO:
+            return response.Response(
+                {"detail": "Formato inválido. Use ?formato=csv ou ?formato=ndjson."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        itens = filtrar_itens(request.query_params)
+        resposta = StreamingHttpResponse(gerar_exportacao(itens, formato), content_type=FORMATOS_EXPORTACAO[formato])
+        resposta['Content-Disposition'] = f'attachment; filename="pedidos.{formato}"'
+        return resposta
+
+    def get_queryset(self):
+        # Prioriza pedidos em aberto na listagem; o id desempata para a paginação por cursor
+        return Pedido.objects.com_itens(**carregamento_pedidos(self.get_selecao())).order_by('-em_aberto', '-id')
+
+    def list(self, request, *args, **kwargs):
+        # Caminho rápido (api.leitura): mesmo formato do PedidoSerializer, com itens e
+        # produtos da página inteira em duas consultas e sem os campos do DRF
+        return self.responder_condicional(request, lambda: self.listar(request))
+
+    def listar(self, request):
+        pagina = self.paginate_queryset(self.get_linhas())
+        return self.get_paginated_response(leitura.listar_pedidos(pagina, self.get_selecao()))
+
+    def get_linhas(self):
+        # Linhas values() da listagem, também usadas pela versão assíncrona (api.assincrono)
+        queryset = self.filter_queryset(Pedido.objects.order_by('-em_aberto', '-id'))
+        return queryset.values(*leitura.CAMPOS_PEDIDO, *queryset.query.annotations)
+
+class ParcelaViewSet(CamposSelecionaveisViewMixin, GetCondicionalMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Contas a receber: parcelas por vencimento, filtradas por ?em_aberto, ?em_atraso,
+    ?pedido e pelo intervalo ?vencimento_de / ?vencimento_ate (AAAA-MM-DD).
+    """
+    recursos_versao = ['parcelas', 'clientes']
+    queryset = Parcela.objects.all()
+    serializer_class = ParcelaSerializer
+
+    def get_queryset(self):
+        # Com ?em_aberto=true a consulta percorre só o índice parcial das parcelas em aberto
+        queryset = Parcela.objects.select_related('pedido__cliente').order_by('vencimento', 'id')
+        params = self.request.query_params
+        em_aberto = self.get_booleano('em_aberto')
+        if em_aberto is not None:
+            queryset = queryset.filter(paga=not em_aberto)
+        em_atraso = self.get_booleano('em_atraso')
+        if em_atraso is not None:
+            queryset = queryset.filter(em_atraso=em_atraso)
+        if params.get('pedido'):
+            if not params['pedido'].isdigit():
+                raise ValidationError({'pedido': "Informe o id do pedido."})
+            queryset = queryset.filter(pedido_id=params['pedido'])
+        for parametro, lookup in (('vencimento_de', 'gte'), ('vencimento_ate', 'lte')):
+            data = get_data(params, parametro)
+            if data:
+                queryset = queryset.filter(**{f'vencimento__{lookup}': data})
+        return queryset
+
+    def get_booleano(self, parametro):
+        valor = self.request.query_params.get(parametro)
+        if not valor:
+            return None
+        if valor not in ('true', 'false'):
+            raise ValidationError({parametro: "Use true ou false."})
+        return valor == 'true'
+
+    @action(detail=True, methods=['post'])
+    def pagar(self, request, pk=None):
+        # Baixa da parcela em ?paga_em (ou hoje); o status do pedido é recalculado em api.parcelas
+        parcela = get_object_or_404(Parcela.objects.select_related('pedido__cliente'), pk=pk)
+        if parcela.paga:
+            return response.Response({"detail": "A parcela já está paga."}, status=status.HTTP_400_BAD_REQUEST)
+        parcelas.pagar_parcela(parcela, get_data(request.data, 'paga_em'))
+        return response.Response(self.get_serializer(parcela).data)
+
+class CotacaoDolarViewSet(CamposSelecionaveisViewMixin, GetCondicionalMixin, viewsets.ReadOnlyModelViewSet):
+    recursos_versao = ['cotacoes']
+    # Histórico das cotações obtidas, da mais recente para a mais antiga
+    queryset = CotacaoDolar.objects.order_by('-obtida_em', '-id')
+    serializer_class = CotacaoDolarSerializer
+
+class DashboardView(GetCondicionalMixin, views.APIView):
+    # Funções de truncamento aceitas no parâmetro `agrupar`
+    AGRUPAMENTOS = {'dia': TruncDay, 'mes': TruncMonth, 'ano': TruncYear}
+    recursos_versao = ['dashboard']
+    cache_respostas = True
+
+    def get_etag_extra(self, request):
+        # A cotação do dia faz parte da resposta e pode mudar sem nenhuma escrita no banco
+        return str(get_cotacao_dolar_com_encargos())
 
-class DashboardView(views.APIView):
     def get(self, request, *args, **kwargs):
+        return self.responder_condicional(request, lambda: self.get_dashboard(request))
+
+    def get_dashboard(self, request):
         # Usa a função utilitária para buscar a cotação do dia
         cotacao_dolar_atual = get_cotacao_dolar_com_encargos()
-        
-        pedidos_abertos = Pedido.objects.filter(
-            Q(status_entrega='nao_entregue') | ~Q(status_pagamento='pago')
-        ).distinct().count()
-        
-        # Estes cálculos agora usam as propriedades atualizadas dos modelos
-        lucro_total = sum(p.lucro_final for p in Pedido.objects.all())
-        gastos_totais = sum(p.valor_total_venda for p in Pedido.objects.all())
 
+        agrupar = request.query_params.get('agrupar')
+        if agrupar and agrupar not in self.AGRUPAMENTOS:
+            return response.Response(
+                {"detail": f"Agrupamento inválido. Use um de: {', '.join(self.AGRUPAMENTOS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        resultados = {nome: consulta() for nome, consulta in self.get_consultas(request.query_params).items()}
+        return response.Response(self.montar_dashboard(cotacao_dolar_atual, resultados))
+
+    def get_consultas(self, params):
+        """
+        Consultas do dashboard como funções sem argumentos. Elas são independentes entre
+        si, e a versão assíncrona (api.assincrono) as executa ao mesmo tempo.
+        """
+        inicio, fim = get_intervalo_datas(params)
+        pedidos = Pedido.objects.all()
+        if inicio:
+            pedidos = pedidos.filter(data_pedido__gte=inicio)
+        if fim:
+            pedidos = pedidos.filter(data_pedido__lt=fim)
+
+        consultas = {
+            'pedidos_em_aberto': Pedido.objects.abertos().count,
+            # Os totais gravados em cada pedido são somados no banco em uma única consulta
+            'totais': lambda: pedidos.aggregate(lucro=_soma('lucro_final'), gastos=_soma('valor_total_venda')),
+        }
+        agrupar = params.get('agrupar')
+        if agrupar:
+            consultas['por_periodo'] = lambda: self.get_totais_por_periodo(pedidos, self.AGRUPAMENTOS[agrupar])
+        return consultas
+
+    def montar_dashboard(self, cotacao_dolar_atual, resultados):
         data = {
-            'lucro_do_periodo': lucro_total,
-            'gastos_do_periodo': gastos_totais,
+            'lucro_do_periodo': resultados['totais']['lucro'],
+            'gastos_do_periodo': resultados['totais']['gastos'],
             'cotacao_dolar_dia': cotacao_dolar_atual,
-            'pedidos_em_aberto': pedidos_abertos
+            'pedidos_em_aberto': resultados['pedidos_em_aberto']
         }
-        return response.Response(data)
\ No newline at end of file
+        if 'por_periodo' in resultados:
+            data['por_periodo'] = resultados['por_periodo']
+        return data
+
+    def get_totais_por_periodo(self, pedidos, truncar):
+        """
+        Quebra lucro e vendas por dia, mês ou ano com uma consulta agrupada,
+        independentemente da quantidade de pedidos no intervalo.
+        """
+        linhas = (
+            pedidos.annotate(periodo=truncar('data_pedido')).values('periodo')
+            .annotate(lucro=_soma('lucro_final'), gastos=_soma('valor_total_venda'), quantidade_pedidos=Count('id'))
+            .order_by('periodo')
+        )
+        return list(linhas)
+
+
+class RelatorioVendasView(GetCondicionalMixin, views.APIView):
+    """
+    Relatório de vendas por período lido das tabelas de resumo (api.resumos), que têm
+    uma linha por dia x categoria x marca: o custo não depende do tamanho do histórico.
+    Parâmetros: inicio/fim (AAAA-MM-DD), agrupar=dia|mes|ano e por=categoria,marca.
+    """
+    AGRUPAMENTOS = {'dia': TruncDay, 'mes': TruncMonth, 'ano': TruncYear}
+    DIMENSOES = {'categoria': ['categoria_id', 'categoria__nome'], 'marca': ['marca']}
+    recursos_versao = ['relatorios']
+
+    def get(self, request, *args, **kwargs):
+        return self.responder_condicional(request, lambda: self.get_relatorio(request))
+
+    def get_relatorio(self, request):
+        agrupar = request.query_params.get('agrupar', 'mes')
+        if agrupar not in self.AGRUPAMENTOS:
+            raise ValidationError({'agrupar': f"Use um de: {', '.join(self.AGRUPAMENTOS)}."})
+        dimensoes = [d for d in request.query_params.get('por', '').split(',') if d]
+        invalidas = [d for d in dimensoes if d not in self.DIMENSOES]
+        if invalidas:
+            raise ValidationError({'por': f"Use um ou mais de: {', '.join(self.DIMENSOES)}."})
+
+        # Os resumos são por dia: o intervalo de datetimes vira um intervalo de datas
+        inicio, fim = get_intervalo_datas(request.query_params)
+        vendas, pedidos = ResumoVendas.objects.all(), ResumoPedidosDia.objects.all()
+        if inicio:
+            vendas, pedidos = vendas.filter(dia__gte=inicio.date()), pedidos.filter(dia__gte=inicio.date())
+        if fim:
+            vendas, pedidos = vendas.filter(dia__lt=fim.date()), pedidos.filter(dia__lt=fim.date())
+
+        truncar = self.AGRUPAMENTOS[agrupar]
+        campos = ['periodo'] + [campo for d in dimensoes for campo in self.DIMENSOES[d]]
+        vendas = vendas.annotate(periodo=truncar('dia')).values(*campos).annotate(
+            unidades=Sum('unidades'), receita=_soma('receita'), lucro=_soma('lucro')
+        ).order_by(*campos)
+        pedidos = pedidos.annotate(periodo=truncar('dia')).values('periodo').annotate(
+            quantidade_pedidos=Sum('quantidade_pedidos'), pedidos_pagos=Sum('pedidos_pagos'),
+            pedidos_entregues=Sum('pedidos_entregues'), pedidos_fechados=Sum('pedidos_fechados'),
+            valor_total_venda=_soma('valor_total_venda'), lucro_final=_soma('lucro_final'),
+        ).order_by('periodo')
+        return response.Response({'vendas': list(vendas), 'pedidos': list(pedidos)})
+
+
+class EstatisticasCacheView(views.APIView):
+    # Acertos e falhas do cache de respostas por recurso, desde que o cache foi iniciado
+    def get(self, request, *args, **kwargs):
+        return response.Response(get_estatisticas_cache(['produtos', 'dashboard']))
+
+
+class MetricasView(views.APIView):
+    # Histogramas de tempo e de consultas por view (api.metricas), no formato do Prometheus
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request, *args, **kwargs):
+        return response.Response(registro_metricas.exportar())
+
+
+class ImportacaoView(views.APIView):
+    """
+    Importação em massa de produtos ou clientes a partir de um arquivo CSV ou NDJSON
+    enviado no campo `arquivo`. Linhas com `id` atualizam o registro existente.
+    """
+    parser_classes = [MultiPartParser]
+    FORMATOS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+    def post(self, request, recurso, *args, **kwargs):
+        arquivo = request.FILES.get('arquivo')
+        if arquivo is None:
+            return response.Response({"detail": "Envie o arquivo no campo 'arquivo'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        formato = request.query_params.get('formato')
+        if not formato:
+            extensao = arquivo.name[arquivo.name.rfind('.'):].lower() if '.' in arquivo.name else ''
+            formato = self.FORMATOS.get(extensao)
+        if formato not in ('csv', 'ndjson'):
+            return response.Response(
+                {"detail": "Formato não reconhecido. Use ?formato=csv ou ?formato=ndjson."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if recurso == 'produtos':
+            criar_categorias = request.query_params.get('criar_categorias') in ('1', 'true')
+            importador = ImportadorProdutos(criar_categorias=criar_categorias)
+        else:
+            importador = ImportadorClientes()
+
+        try:
+            relatorio = importador.importar(arquivo, formato)
+        except UnicodeDecodeError:
+            return response.Response({"detail": "O arquivo deve estar em UTF-8."}, status=status.HTTP_400_BAD_REQUEST)
+        return response.Response(relatorio)
+
+
+def _soma(expressao):
+    # Soma decimal que devolve 0.00 (e não None) quando não há linhas
+    return Coalesce(
+        Sum(expressao, output_field=DecimalField(max_digits=14, decimal_places=2)),
+        Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
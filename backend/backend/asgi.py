@@ -3,6 +3,16 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Para servir a API por ASGI (as leituras assíncronas de /api/async/ só liberam o
+processo enquanto esperam o banco quando rodam assim):
+
+    pip install uvicorn
+    uvicorn backend.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+As views síncronas continuam funcionando: o Django as executa em threads, e o
+MetricasMiddleware aceita os dois modos. Sob WSGI (runserver, gunicorn) as rotas de
+/api/async/ também respondem, só que sem o ganho de concorrência.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
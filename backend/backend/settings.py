@@ -4,6 +4,8 @@ Django settings for backend project.
 Generated by 'django-admin startproject' using Django 5.2.4.
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,6 +42,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     # O CorsMiddleware DEVE ser o primeiro da lista.
     'corsheaders.middleware.CorsMiddleware', 
+    # Consultas e tempos de cada requisição: Server-Timing, log e /api/metrics/ (api.metricas)
+    'api.metricas.MetricasMiddleware',
     
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -70,13 +74,49 @@ TEMPLATES = [
 WSGI_APPLICATION = 'backend.wsgi.application'
 
 # Database
+# Perfil de produção do SQLite: WAL e demais PRAGMAs, conexões reaproveitadas e transações
+# IMMEDIATE. Ligado por padrão porque este arquivo é o do servidor publicado e os testes de
+# escrita concorrente dependem dele; SISTEMALOJA_SQLITE_PRODUCAO=0 volta aos padrões do Django
+# (útil para abrir o banco com ferramentas que não entendem WAL ou em bancos de rede).
+SQLITE_PRODUCAO = os.environ.get('SISTEMALOJA_SQLITE_PRODUCAO', '1') != '0'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Arquivo (e não memória) nos testes, para que várias conexões escrevam ao mesmo tempo;
+        # fica no diretório temporário, junto com os arquivos -wal e -shm do WAL, com o PID no
+        # nome para que execuções simultâneas da suíte não usem o mesmo arquivo
+        'TEST': {'NAME': Path(tempfile.gettempdir()) / f'sistemaloja_test_db_{os.getpid()}.sqlite3'},
     }
 }
 
+if SQLITE_PRODUCAO:
+    DATABASES['default'].update({
+        # Conexões reaproveitadas entre requisições (verificadas antes do reuso)
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # A transação pega o lock de escrita já no BEGIN: com DEFERRED, uma leitura que
+            # depois tenta escrever falha na hora com "database is locked", sem esperar o busy_timeout
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+
+# Aplicados a cada conexão nova do SQLite (api.banco)
+SQLITE_PRAGMAS = {
+    # Leitores não bloqueiam o escritor, e vice-versa
+    'journal_mode': 'WAL',
+    # Com WAL, NORMAL só arrisca perder as últimas transações numa queda de energia, não corromper o banco
+    'synchronous': 'NORMAL',
+    # Espera até 5 s pelo lock de escrita antes de "database is locked"
+    'busy_timeout': 5000,
+    # 20 MB de cache de páginas (valor negativo = KiB) e 128 MB lidos via mmap
+    'cache_size': -20000,
+    'mmap_size': 134217728,
+    'temp_store': 'MEMORY',
+} if SQLITE_PRODUCAO else {}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -94,6 +134,63 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = 'static/'
 
+# Django REST Framework
+# O cache `respostas` guarda os dados do dashboard e da lista de produtos (api.versoes).
+# Em desenvolvimento fica na memória de cada processo; em produção, com vários workers,
+# aponte para um backend compartilhado, por exemplo:
+#   'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'
+# ou 'django.core.cache.backends.filebased.FileBasedCache' com um diretório em LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'respostas': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'respostas',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+REST_FRAMEWORK = {
+    # Todas as listagens são paginadas por cursor, na ordenação definida por cada viewset
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    # JSON gerado com orjson quando instalado (api.renderers), com a mesma saída do DRF
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.JSONRapidoRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Cotação do dólar (api.cambio). O provedor fixo mantém o valor usado até hoje;
+# para cotação ao vivo, por exemplo:
+# COTACAO_DOLAR = {
+#     'PROVEDOR': 'api.cambio.ProvedorHTTP',
+#     'OPCOES': {
+#         'url': 'https://economia.awesomeapi.com.br/json/last/USD-BRL',
+#         'campo': 'USDBRL.ask',
+#         'fator_encargos': '1.1',
+#     },
+#     'TTL': 600,
+#     'TIMEOUT': 3,
+#     'ESPERA_APOS_FALHA': 60,
+#     'RESERVA': '5.90',  # usada se o provedor falhar antes de haver alguma cotação
+# }
+COTACAO_DOLAR = {
+    'PROVEDOR': 'api.cambio.ProvedorFixo',
+    'OPCOES': {'valor': '5.90'},
+}
+
+# Imposto da Flórida sobre o custo em reais (api.precificacao). Depois de alterar,
+# rode `python manage.py recalcular_precos` para atualizar o catálogo.
+TAXA_FLORIDA_PERCENTUAL = '0.065'
+
+# Requisições acima destes limites vão para o log 'api.metricas' com as consultas repetidas
+METRICAS = {
+    'TEMPO_MS': 500,
+    'CONSULTAS': 30,
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
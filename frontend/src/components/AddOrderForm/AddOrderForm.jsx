@@ -1,12 +1,78 @@
 import React, { useState, useEffect } from 'react';
 import Button from '../Button/Button';
-import api from '../../services/api';
+import api, { getPage } from '../../services/api';
 import './AddOrderForm.css';
 
 // Constante APENAS para a taxa da Flórida, pois a cotação já virá com encargos de câmbio
 const TAXA_FLORIDA_PERCENTUAL = 0.065;
 const FATOR_FLORIDA = 1 + TAXA_FLORIDA_PERCENTUAL;
 
+// Só os campos do produto que o formulário usa
+const CAMPOS_PRODUTO = 'id,nome,preco_dolar,quantidade_estoque';
+
+// Seletor de produto que busca no servidor (?search=) conforme o usuário digita,
+// em vez de carregar o catálogo inteiro ao abrir o formulário
+const ProductSearchSelect = ({ selected, onSelect }) => {
+    const [query, setQuery] = useState('');
+    const [options, setOptions] = useState([]);
+    const [searching, setSearching] = useState(false);
+
+    useEffect(() => {
+        if (!query.trim()) {
+            setOptions([]);
+            return;
+        }
+        let cancelled = false;
+        const timerId = setTimeout(async () => {
+            try {
+                setSearching(true);
+                const { items } = await getPage('/produtos/', {
+                    params: { search: query, fields: CAMPOS_PRODUTO, page_size: 20 }
+                });
+                if (!cancelled) setOptions(items);
+            } catch (error) {
+                console.error("Falha ao buscar produtos:", error);
+            } finally {
+                if (!cancelled) setSearching(false);
+            }
+        }, 300);
+        return () => {
+            cancelled = true;
+            clearTimeout(timerId);
+        };
+    }, [query]);
+
+    // O produto escolhido continua na lista mesmo depois de uma nova busca
+    const visibleOptions = selected && !options.some(p => p.id === selected.id) ? [selected, ...options] : options;
+
+    let placeholder = "Digite para buscar um produto";
+    if (searching) placeholder = "Buscando...";
+    else if (query.trim()) placeholder = options.length > 0 ? "Selecione um produto" : "Nenhum produto encontrado";
+
+    return (
+        <div className="product-search">
+            <input
+                type="text"
+                placeholder="Pesquise por nome, categoria ou marca"
+                value={query}
+                onChange={(e) => setQuery(e.target.value)}
+            />
+            <select
+                value={selected ? selected.id : ''}
+                onChange={(e) => onSelect(visibleOptions.find(p => p.id.toString() === e.target.value) || null)}
+                className="product-select"
+            >
+                <option value="">{placeholder}</option>
+                {visibleOptions.map(p => (
+                    <option key={p.id} value={p.id} disabled={p.quantidade_estoque <= 0}>
+                        {p.nome} {p.quantidade_estoque <= 0 ? "(Sem Estoque)" : `(${p.quantidade_estoque} em estoque)`}
+                    </option>
+                ))}
+            </select>
+        </div>
+    );
+};
+
 const AddOrderForm = ({ onClose, onOrderAdded, clientId }) => {
     // Estados para os dados principais do pedido
     const [metodoPagamento, setMetodoPagamento] = useState('a_vista');
@@ -18,24 +84,14 @@ const AddOrderForm = ({ onClose, onOrderAdded, clientId }) => {
         { id: Date.now(), produto_id: '', quantidade: 1, margem_venda_unitaria: '', productDetails: null }
     ]);
     
-    // Estado para a lista de produtos disponíveis
-    const [availableProducts, setAvailableProducts] = useState([]);
-    const [loading, setLoading] = useState(true);
-    
     // Estado para a cotação do dia
     const [cotacaoDoDia, setCotacaoDoDia] = useState(null);
 
-    // Efeito para buscar dados iniciais (produtos e cotação do dia)
+    // Efeito para buscar a cotação do dia; os produtos são buscados em cada linha
     useEffect(() => {
         const fetchData = async () => {
             try {
-                // Busca os produtos e a cotação em paralelo para mais performance
-                const [productsResponse, dashboardResponse] = await Promise.all([
-                    api.get('/produtos/'),
-                    api.get('/dashboard/')
-                ]);
-                
-                setAvailableProducts(productsResponse.data);
+                const dashboardResponse = await api.get('/dashboard/');
                 // Armazenamos a cotação do dia JÁ COM ENCARGOS, vinda do backend
                 setCotacaoDoDia(dashboardResponse.data.cotacao_dolar_dia);
 
@@ -43,8 +99,6 @@ const AddOrderForm = ({ onClose, onOrderAdded, clientId }) => {
                 console.error("Erro ao buscar dados para o formulário:", error);
                 // Define uma cotação padrão em caso de falha para não quebrar o formulário
                 setCotacaoDoDia('5.80'); 
-            } finally {
-                setLoading(false);
             }
         };
         fetchData();
@@ -62,11 +116,14 @@ const AddOrderForm = ({ onClose, onOrderAdded, clientId }) => {
     const handleItemChange = (index, field, value) => {
         const updatedItems = [...orderItems];
         updatedItems[index][field] = value;
+        setOrderItems(updatedItems);
+    };
 
-        if (field === 'produto_id') {
-            const product = availableProducts.find(p => p.id.toString() === value);
-            updatedItems[index].productDetails = product || null;
-        }
+    // Guarda o produto escolhido na busca da linha
+    const handleProductSelect = (index, product) => {
+        const updatedItems = [...orderItems];
+        updatedItems[index].produto_id = product ? product.id.toString() : '';
+        updatedItems[index].productDetails = product;
         setOrderItems(updatedItems);
     };
 
@@ -159,18 +216,10 @@ const AddOrderForm = ({ onClose, onOrderAdded, clientId }) => {
 
                     return (
                         <div key={item.id} className="product-input-row">
-                            <select 
-                                value={item.produto_id} 
-                                onChange={(e) => handleItemChange(index, 'produto_id', e.target.value)}
-                                className="product-select"
-                            >
-                                <option value="">{loading ? "Carregando..." : "Selecione um produto"}</option>
-                                {availableProducts.map(p => (
-                                    <option key={p.id} value={p.id} disabled={p.quantidade_estoque <= 0}>
-                                        {p.nome} {p.quantidade_estoque <= 0 ? "(Sem Estoque)" : `(${p.quantidade_estoque} em estoque)`}
-                                    </option>
-                                ))}
-                            </select>
+                            <ProductSearchSelect
+                                selected={productDetails}
+                                onSelect={(product) => handleProductSelect(index, product)}
+                            />
                             <input 
                                 type="number" 
                                 min="1" 
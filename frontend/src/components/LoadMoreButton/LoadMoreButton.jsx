@@ -0,0 +1,18 @@
+// src/components/LoadMoreButton/LoadMoreButton.jsx
+import React from 'react';
+import Button from '../Button/Button';
+import './LoadMoreButton.css';
+
+// Botão no fim das listas paginadas; some quando não há mais páginas
+const LoadMoreButton = ({ hasMore, loading, onClick }) => {
+    if (!hasMore) return null;
+    return (
+        <div className="load-more">
+            <Button variant="secondary-outline" onClick={onClick}>
+                {loading ? 'Carregando...' : 'Carregar mais'}
+            </Button>
+        </div>
+    );
+};
+
+export default LoadMoreButton;
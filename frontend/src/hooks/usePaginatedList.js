@@ -0,0 +1,58 @@
+// src/hooks/usePaginatedList.js
+import { useState, useEffect } from 'react';
+import { getPage } from '../services/api';
+
+// Lista paginada com busca: a cada nova busca (com debounce) carrega só a primeira
+// página; as seguintes vêm sob demanda, com loadMore().
+const usePaginatedList = (url, searchQuery, delay = 500) => {
+    const [items, setItems] = useState([]);
+    const [next, setNext] = useState(null);
+    const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [reloadCount, setReloadCount] = useState(0);
+
+    useEffect(() => {
+        let cancelled = false;
+        const timerId = setTimeout(async () => {
+            try {
+                setLoading(true);
+                const page = await getPage(url, { params: { search: searchQuery } });
+                if (!cancelled) {
+                    setItems(page.items);
+                    setNext(page.next);
+                }
+            } catch (error) {
+                console.error(`Falha ao buscar ${url}:`, error);
+            } finally {
+                if (!cancelled) setLoading(false);
+            }
+        }, delay); // Aguarda o usuário parar de digitar
+
+        // Descarta a resposta de uma busca que já foi substituída por outra
+        return () => {
+            cancelled = true;
+            clearTimeout(timerId);
+        };
+    }, [url, searchQuery, delay, reloadCount]);
+
+    const loadMore = async () => {
+        if (!next || loadingMore) return;
+        try {
+            setLoadingMore(true);
+            const page = await getPage(next);
+            setItems(prevItems => [...prevItems, ...page.items]);
+            setNext(page.next);
+        } catch (error) {
+            console.error(`Falha ao buscar mais itens de ${url}:`, error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
+    // Recarrega a partir da primeira página (depois de criar ou editar um item)
+    const reload = () => setReloadCount(count => count + 1);
+
+    return { items, setItems, loading, loadingMore, hasMore: Boolean(next), loadMore, reload };
+};
+
+export default usePaginatedList;
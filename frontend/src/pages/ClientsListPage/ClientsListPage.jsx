@@ -1,10 +1,11 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { FaPlus, FaSearch } from 'react-icons/fa';
 
 // Componentes e Serviços
 import Button from '../../components/Button/Button';
-import api from '../../services/api';
+import LoadMoreButton from '../../components/LoadMoreButton/LoadMoreButton';
+import usePaginatedList from '../../hooks/usePaginatedList';
 
 // Estilos
 import './ClientsListPage.css';
@@ -18,32 +19,9 @@ const formatCurrency = (value) => {
 
 const ClientsListPage = () => {
     const navigate = useNavigate();
-    const [clients, setClients] = useState([]);
-    const [loading, setLoading] = useState(true);
     const [searchQuery, setSearchQuery] = useState('');
-
-    // useEffect para buscar os clientes com base na pesquisa (com debounce)
-    useEffect(() => {
-        const fetchClients = async (query) => {
-            try {
-                setLoading(true);
-                const response = await api.get('/clientes/', {
-                    params: { search: query }
-                });
-                setClients(response.data);
-            } catch (error) {
-                console.error("Falha ao buscar clientes:", error);
-            } finally {
-                setLoading(false);
-            }
-        };
-
-        const timerId = setTimeout(() => {
-            fetchClients(searchQuery);
-        }, 500); // Aguarda 500ms após o usuário parar de digitar
-
-        return () => clearTimeout(timerId); // Limpa o timer anterior a cada nova digitação
-    }, [searchQuery]); // Roda sempre que a searchQuery mudar
+    // Uma página por vez, recarregada a cada busca (com debounce)
+    const { items: clients, loading, loadingMore, hasMore, loadMore } = usePaginatedList('/clientes/', searchQuery);
 
     return (
         <main className="main-content">
@@ -92,6 +70,7 @@ const ClientsListPage = () => {
                     </tbody>
                 </table>
             </div>
+            <LoadMoreButton hasMore={!loading && hasMore} loading={loadingMore} onClick={loadMore} />
         </main>
     );
 };
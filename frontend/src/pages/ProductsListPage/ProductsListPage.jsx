@@ -7,9 +7,11 @@ import Modal from '../../components/Modal/Modal';
 import AddProductForm from '../../components/AddProductForm/AddProductForm';
 import EditProductForm from '../../components/EditProductForm/EditProductForm';
 import AddCategoryForm from '../../components/AddCategoryForm/AddCategoryForm';
+import LoadMoreButton from '../../components/LoadMoreButton/LoadMoreButton';
 
 // Serviços e Estilos
-import api from '../../services/api';
+import api, { getPage } from '../../services/api';
+import usePaginatedList from '../../hooks/usePaginatedList';
 import './ProductsListPage.css';
 import '../../styles/table.css';
 
@@ -19,33 +21,24 @@ const formatCurrency = (value) => {
 };
 
 const ProductsListPage = () => {
-    const [products, setProducts] = useState([]);
-    const [loadingProducts, setLoadingProducts] = useState(true);
     const [categories, setCategories] = useState([]);
     const [loadingCategories, setLoadingCategories] = useState(true);
     const [isAddModalOpen, setIsAddModalOpen] = useState(false);
     const [isCategoryModalOpen, setIsCategoryModalOpen] = useState(false);
     const [searchQuery, setSearchQuery] = useState('');
+    // Uma página por vez, recarregada a cada busca (com debounce)
+    const {
+        items: products, setItems: setProducts, loading: loadingProducts, loadingMore, hasMore, loadMore, reload: reloadProducts
+    } = usePaginatedList('/produtos/', searchQuery);
     const [isEditModalOpen, setIsEditModalOpen] = useState(false);
     const [editingProduct, setEditingProduct] = useState(null);
 
-    const fetchProducts = async (query = '') => {
-        try {
-            setLoadingProducts(true);
-            const response = await api.get('/produtos/', { params: { search: query } });
-            setProducts(response.data);
-        } catch (error) {
-            console.error("Falha ao buscar produtos:", error);
-        } finally {
-            setLoadingProducts(false);
-        }
-    };
-
     const fetchCategories = async () => {
         try {
             setLoadingCategories(true);
-            const response = await api.get('/categorias/');
-            setCategories(response.data);
+            // As categorias são poucas e todas aparecem nos formulários: uma página grande basta
+            const { items } = await getPage('/categorias/', { params: { page_size: 500 } });
+            setCategories(items);
         } catch (error) {
             console.error("Falha ao buscar categorias:", error);
         } finally {
@@ -57,13 +50,6 @@ const ProductsListPage = () => {
         fetchCategories(); 
     }, []);
 
-    useEffect(() => {
-        const timerId = setTimeout(() => {
-            fetchProducts(searchQuery);
-        }, 500);
-        return () => clearTimeout(timerId);
-    }, [searchQuery]);
-
     const handleDeleteProduct = async (productId) => {
         if (window.confirm('Tem certeza que deseja apagar este produto?')) {
             try {
@@ -85,13 +71,13 @@ const ProductsListPage = () => {
     const handleProductUpdated = () => {
         setIsEditModalOpen(false);
         setEditingProduct(null);
-        fetchProducts(searchQuery);
+        reloadProducts();
     };
 
     const handleProductAdded = () => {
         setIsAddModalOpen(false);
         setSearchQuery('');
-        fetchProducts('');
+        reloadProducts();
     };
     
     const handleCategoryAdded = () => {
@@ -148,6 +134,7 @@ const ProductsListPage = () => {
                         </tbody>
                     </table>
                 </div>
+                <LoadMoreButton hasMore={!loadingProducts && hasMore} loading={loadingMore} onClick={loadMore} />
             </main>
 
             <Modal isOpen={isAddModalOpen} onClose={() => setIsAddModalOpen(false)} title="Formulário para adicionar produto:">
@@ -1,18 +1,19 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { FaSearch } from 'react-icons/fa';
 
 // Componentes e Serviços
 import StatusPill from '../../components/StatusPill/StatusPill';
-import api from '../../services/api';
+import LoadMoreButton from '../../components/LoadMoreButton/LoadMoreButton';
+import usePaginatedList from '../../hooks/usePaginatedList';
 
 // Estilos
 import './SalesListPage.css';
 import '../../styles/table.css';
 
 const SalesListPage = () => {
-    const [sales, setSales] = useState([]);
-    const [loading, setLoading] = useState(true);
     const [searchQuery, setSearchQuery] = useState('');
+    // Uma página por vez, recarregada a cada busca (com debounce)
+    const { items: sales, loading, loadingMore, hasMore, loadMore } = usePaginatedList('/pedidos/', searchQuery);
 
     // Funções de formatação e lógica de cores
     const formatPaymentMethod = (method) => {
@@ -48,29 +49,6 @@ const SalesListPage = () => {
         return Number(value).toLocaleString('pt-BR', { style: 'currency', currency: 'BRL' });
     };
 
-    // useEffect para buscar os pedidos com base na pesquisa (com debounce)
-    useEffect(() => {
-        const fetchSales = async (query) => {
-            try {
-                setLoading(true);
-                const response = await api.get('/pedidos/', {
-                    params: { search: query }
-                });
-                setSales(response.data);
-            } catch (error) {
-                console.error("Falha ao buscar vendas:", error);
-            } finally {
-                setLoading(false);
-            }
-        };
-
-        const timerId = setTimeout(() => {
-            fetchSales(searchQuery);
-        }, 500);
-
-        return () => clearTimeout(timerId);
-    }, [searchQuery]);
-
     return (
         <main className="main-content">
             <div className="page-header">
@@ -121,6 +99,7 @@ const SalesListPage = () => {
                     </tbody>
                 </table>
             </div>
+            <LoadMoreButton hasMore={!loading && hasMore} loading={loadingMore} onClick={loadMore} />
         </main>
     );
 };
@@ -5,4 +5,11 @@ const api = axios.create({
   baseURL: import.meta.env.VITE_API_URL || 'http://localhost:8000/api/',// A URL base da nossa API Django
 });
 
-export default api;
\ No newline at end of file
+// As listagens da API são paginadas por cursor ({ next, results }).
+// Busca uma página só; `next` é a URL da seguinte (null na última).
+export const getPage = async (url, config = {}) => {
+  const response = await api.get(url, config);
+  return { items: response.data.results, next: response.data.next };
+};
+
+export default api;